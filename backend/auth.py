@@ -1,3 +1,4 @@
+import os
 from datetime import datetime, timedelta
 from typing import Union, Optional
 from jose import JWTError, jwt
@@ -8,11 +9,25 @@ SECRET_KEY = "tu_clave_secreta_super_segura_taller_luis"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 horas de sesión
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Costo de bcrypt (2^rounds). Con min = max = rounds, si se cambia el costo los hashes
+# viejos quedan "por actualizar" y se rehacen solos en el siguiente login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update(plain_password, hashed_password):
+    """(es_valida, hash_nuevo): hash_nuevo trae algo solo si la contraseña es buena y el hash tiene otro costo."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
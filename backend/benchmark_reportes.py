@@ -0,0 +1,147 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Aseguramos que Python encuentre los módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# ---------------------------------------------------------
+# ⏱️ BENCHMARK: /reportes/financiero vs MOTOR NUMPY
+# Crea una BD SQLite temporal con N movimientos y mide lo mismo de dos formas:
+#   1) La consulta de /reportes/financiero (periodo actual y anterior) y una
+#      sola pasada en Python para sacar las mismas cuentas que el motor
+#   2) motor_reportes: columnas a NumPy y cuentas vectorizadas
+# La carpeta temporal se borra al terminar.
+#
+#   python benchmark_reportes.py --filas 1000000
+# ---------------------------------------------------------
+
+# database, models y motor_reportes se importan dentro de cada función: la URL
+# de la BD temporal se fija en el bloque principal, antes de la primera importación.
+
+METODOS = ["Efectivo", "Tarjeta", "Transferencia"]
+
+def poblar(filas, dias):
+    from sqlalchemy import insert
+
+    from database import engine
+    import models
+
+    models.Base.metadata.create_all(bind=engine)
+    inicio = datetime.now() - timedelta(days=dias)
+    aleatorio = random.Random(42)
+    # En la vida real los movimientos se insertan en orden de fecha
+    segundos = sorted(aleatorio.randrange(dias * 86400) for _ in range(filas))
+    lote = []
+    with engine.begin() as conexion:
+        for segundo in segundos:
+            es_gasto = aleatorio.random() < 0.1
+            lote.append({
+                "tipo": "EGRESO" if es_gasto else "INGRESO",
+                "monto": round(aleatorio.uniform(50, 5000), 2),
+                "metodo_pago": aleatorio.choice(METODOS),
+                "descripcion": "benchmark",
+                "fecha": inicio + timedelta(seconds=segundo),
+                "usuario_id": 1,
+            })
+            if len(lote) == 50_000:
+                conexion.execute(insert(models.MovimientoCaja.__table__), lote)
+                lote = []
+        if lote:
+            conexion.execute(insert(models.MovimientoCaja.__table__), lote)
+
+def reporte_financiero(desde, hasta):
+    """
+    La misma consulta que /reportes/financiero, una vez por periodo (como la
+    pediría quien compara contra el periodo anterior), y UNA pasada por los
+    movimientos para sacar ingresos, gastos, por método y percentiles.
+    """
+    from database import SessionLocal
+    import models
+
+    M = models.MovimientoCaja
+
+    def consultar(inicio, fin):
+        # Igual que el endpoint: fin del día incluido y orden por fecha descendente
+        return db.query(M).filter(M.fecha >= inicio, M.fecha <= fin).order_by(M.fecha.desc()).all()
+
+    def resumen(movimientos, con_percentiles=True):
+        ingresos, gastos, por_metodo = [], 0.0, dict.fromkeys(METODOS, 0.0)
+        for m in movimientos:
+            if m.tipo == "INGRESO":
+                ingresos.append(m.monto)
+                por_metodo[m.metodo_pago] = por_metodo.get(m.metodo_pago, 0.0) + m.monto
+            elif m.tipo == "EGRESO":
+                gastos += m.monto
+        datos = {"ingresos": sum(ingresos), "gastos": gastos, "por_metodo": por_metodo}
+        if con_percentiles:
+            ingresos.sort()
+            datos["percentiles"] = [ingresos[int(len(ingresos) * p / 100)] if ingresos else 0 for p in (50, 90, 99)]
+        return datos
+
+    db = SessionLocal()
+    try:
+        inicio = datetime.combine(desde, datetime.min.time())
+        fin = datetime.combine(hasta, datetime.min.time()).replace(hour=23, minute=59, second=59)
+        inicio_anterior = inicio - (fin - inicio) - timedelta(seconds=1)
+        actual = resumen(consultar(inicio, fin))
+        # El motor tampoco calcula percentiles del periodo anterior
+        anterior = resumen(consultar(inicio_anterior, inicio - timedelta(microseconds=1)), con_percentiles=False)
+        return {"actual": actual, "anterior": anterior}
+    finally:
+        db.close()
+
+def reporte_motor(desde, hasta):
+    from database import engine
+    import motor_reportes
+
+    with engine.connect() as conexion:
+        return motor_reportes.analizar(conexion, desde, hasta, "metodo_pago", "mes")
+
+def medir(nombre, funcion, *argumentos):
+    inicio = time.perf_counter()
+    resultado = funcion(*argumentos)
+    segundos = time.perf_counter() - inicio
+    print(f"   {nombre:<22} {segundos:8.3f} s")
+    return resultado, segundos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el reporte con ORM contra el motor NumPy")
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--dias", type=int, default=365)
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp()
+    archivo = os.path.join(carpeta, "benchmark.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{archivo}"
+
+    import motor_reportes
+    if not motor_reportes.disponible():
+        shutil.rmtree(carpeta, ignore_errors=True)
+        sys.exit("❌ Instala numpy para correr el benchmark.")
+
+    try:
+        print(f"📦 Generando {args.filas:,} movimientos en {archivo} ...")
+        poblar(args.filas, args.dias)
+
+        # Mitad del rango: la otra mitad es el "periodo anterior" de la comparación
+        hasta = datetime.now().date()
+        desde = hasta - timedelta(days=args.dias // 2)
+        print(f"📊 Reporte del {desde} al {hasta}")
+
+        financiero, t_financiero = medir("/reportes/financiero", reporte_financiero, desde, hasta)
+        motor, t_motor = medir("motor NumPy", reporte_motor, desde, hasta)
+
+        diferencia = abs(financiero["actual"]["ingresos"] - motor["resumen"]["ingresos"])
+        print(f"   ingresos financiero={financiero['actual']['ingresos']:.2f}  motor={motor['resumen']['ingresos']:.2f}  (diferencia {diferencia:.2f})")
+        print(f"   periodo anterior financiero={financiero['anterior']['ingresos']:.2f}  motor={motor['periodo_anterior']['ingresos']:.2f}")
+        print(f"🚀 El motor fue {t_financiero / t_motor:.1f}x más rápido")
+    finally:
+        from database import engine
+        engine.dispose()  # Suelta el archivo antes de borrarlo
+        shutil.rmtree(carpeta, ignore_errors=True)
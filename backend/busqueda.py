@@ -0,0 +1,101 @@
+import re
+
+from sqlalchemy import case, func, inspect, or_, text
+
+import models
+
+# ---------------------------------------------------------
+# 🔍 BÚSQUEDA RÁPIDA DE CLIENTES Y VEHÍCULOS (RECEPCIÓN)
+# En vez de bajar todos los clientes al navegador, el servidor busca por
+# nombre parcial, teléfono (con o sin el 52), placas o VIN y regresa el top-N.
+#   - SQLite:   tabla FTS5 con tokenizador trigram (migración 004)
+#   - Postgres: índices GIN pg_trgm sobre las mismas columnas (migración 004)
+# Si no hay índice especial se usa LIKE, que da lo mismo pero más lento.
+# ---------------------------------------------------------
+
+MINIMO_TRIGRAMA = 3  # FTS5 trigram no puede buscar textos más cortos
+
+# Qué índices especiales hay en esta BD (se revisa una vez por proceso)
+_capacidades = {}
+
+def normalizar_telefono(telefono):
+    """Solo dígitos; si son 10 (número nacional) se antepone el 52 como lo guarda crear_cliente."""
+    telefono_limpio = "".join(filter(str.isdigit, telefono or ""))
+    if len(telefono_limpio) == 10:
+        telefono_limpio = "52" + telefono_limpio
+    return telefono_limpio
+
+def _solo_digitos(texto):
+    """'55 1234-5678' -> '5512345678'; None si el texto no es un teléfono."""
+    compacto = re.sub(r"[\s\-\(\)\+\.]", "", texto)
+    return compacto if compacto.isdigit() else None
+
+def _terminos(q):
+    digitos = _solo_digitos(q)
+    if digitos:
+        return [digitos]
+    return [t for t in re.split(r"\s+", q.strip()) if t]
+
+def _fts_disponible(db):
+    if "fts" not in _capacidades:
+        _capacidades["fts"] = inspect(db.connection()).has_table("busqueda_fts")
+    return _capacidades["fts"]
+
+def _trgm_disponible(db):
+    if "trgm" not in _capacidades:
+        _capacidades["trgm"] = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    return _capacidades["trgm"]
+
+def _cargar_en_orden(db, modelo, ids):
+    if not ids:
+        return []
+    por_id = {obj.id: obj for obj in db.query(modelo).filter(modelo.id.in_(ids))}
+    return [por_id[i] for i in ids if i in por_id]
+
+def _buscar_fts(db, terminos, limite):
+    # rowid par = cliente (id*2), impar = vehículo (id*2+1); ver migración 004
+    consulta = " AND ".join('"' + t.replace('"', '""') + '"' for t in terminos)
+    filas = db.execute(text(
+        "SELECT rowid FROM busqueda_fts WHERE busqueda_fts MATCH :q ORDER BY bm25(busqueda_fts) LIMIT :n"
+    ), {"q": consulta, "n": limite}).all()
+    ids_clientes = [rowid // 2 for (rowid,) in filas if rowid % 2 == 0]
+    ids_vehiculos = [rowid // 2 for (rowid,) in filas if rowid % 2 == 1]
+    return _cargar_en_orden(db, models.Cliente, ids_clientes), _cargar_en_orden(db, models.Vehiculo, ids_vehiculos)
+
+def _buscar_like(db, q, limite, similitud=False):
+    """Mismas expresiones que los índices trigram de Postgres (lower/upper) para que los use."""
+    texto = q.strip()
+    digitos = _solo_digitos(texto)
+
+    nombre = func.lower(models.Cliente.nombre_completo)
+    condiciones_cliente = [nombre.like(f"%{texto.lower()}%")]
+    if digitos:
+        condiciones_cliente.append(models.Cliente.telefono.like(f"%{digitos}%"))
+    orden_cliente = [func.similarity(nombre, texto.lower()).desc()] if similitud else \
+        [case((nombre.like(f"{texto.lower()}%"), 0), else_=1), func.length(nombre)]
+
+    placas = func.upper(models.Vehiculo.placas)
+    placas_compactas = func.upper(func.replace(models.Vehiculo.placas, "-", ""))
+    compacto = texto.upper().replace("-", "").replace(" ", "")
+    condiciones_vehiculo = [
+        placas.like(f"%{texto.upper()}%"),
+        placas_compactas.like(f"%{compacto}%"),
+        func.upper(models.Vehiculo.vin).like(f"%{texto.upper()}%"),
+    ]
+    orden_vehiculo = [func.similarity(placas_compactas, compacto).desc()] if similitud else \
+        [case((placas_compactas.like(f"{compacto}%"), 0), else_=1), models.Vehiculo.id]
+
+    clientes = db.query(models.Cliente).filter(or_(*condiciones_cliente)).order_by(*orden_cliente).limit(limite).all()
+    vehiculos = db.query(models.Vehiculo).filter(or_(*condiciones_vehiculo)).order_by(*orden_vehiculo).limit(limite).all()
+    return clientes, vehiculos
+
+def buscar(db, q, limite=10):
+    """Regresa (clientes, vehiculos) ordenados del más parecido al menos parecido."""
+    dialecto = db.bind.dialect.name
+    terminos = _terminos(q)
+
+    if dialecto == "sqlite" and _fts_disponible(db) and all(len(t) >= MINIMO_TRIGRAMA for t in terminos):
+        return _buscar_fts(db, terminos, limite)
+    if dialecto == "postgresql":
+        return _buscar_like(db, q, limite, similitud=_trgm_disponible(db))
+    return _buscar_like(db, q, limite)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import threading
+import time
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from revisiones import coincide_etag
+import models, schemas
+
+# ---------------------------------------------------------
+# 🗃️ CACHÉ DE CATÁLOGOS EN MEMORIA
+# Los catálogos casi no cambian y se piden en cada pantalla. Se guardan ya
+# convertidos a JSON (bytes) y se sirven sin tocar la BD.
+#   - Un cambio hecho en ESTE worker invalida al confirmar el commit.
+#   - Un cambio hecho en OTRO worker se detecta comparando revisiones_tabla,
+#     como mucho cada INTERVALO_REVISION_SEG (una sola consulta por llave primaria).
+# Las consultas a la BD se hacen FUERA del candado de la caché: mientras un
+# hilo recarga un catálogo (uno a la vez por catálogo), los demás siguen
+# sirviendo los bytes y el ETag de la versión anterior en vez de esperarlo.
+# ---------------------------------------------------------
+
+INTERVALO_REVISION_SEG = 2.0
+
+class EntradaCatalogo:
+    def __init__(self, nombre, modelo, esquema=None, solo_activos=False):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.tabla = modelo.__tablename__
+        self.esquema = esquema
+        self.solo_activos = solo_activos
+
+    def consultar(self, db):
+        query = db.query(self.modelo)
+        if self.solo_activos:
+            query = query.filter(self.modelo.activo == True)
+        return query.order_by(self.modelo.id.asc()).all()
+
+    def serializar(self, filas):
+        if self.esquema is not None:
+            return [self.esquema.model_validate(f).model_dump(mode="json") for f in filas]
+        columnas = [c.key for c in self.modelo.__mapper__.column_attrs]
+        return jsonable_encoder([{c: getattr(f, c) for c in columnas} for f in filas])
+
+class CacheCatalogos:
+    def __init__(self, entradas):
+        self.entradas = {e.nombre: e for e in entradas}
+        self.tablas = sorted({e.tabla for e in entradas})
+        self._cargados = {}  # nombre -> (revision, datos, bytes, etag); revision None = invalidado
+        self._revisiones = None  # None = todavía no se leen
+        self._ultima_revision = 0.0
+        self._lock = threading.Lock()  # Solo para leer/cambiar los dicts, nunca durante una consulta
+        self._revisando = threading.Lock()
+        self._recargando = {e.nombre: threading.Lock() for e in entradas}
+
+    # --- Revisiones ---
+    def _revisar_versiones(self):
+        if self._revisiones is not None and time.monotonic() - self._ultima_revision < INTERVALO_REVISION_SEG:
+            return
+        # Si otro hilo ya está consultando, se usan las revisiones que hay (salvo la primera vez)
+        if not self._revisando.acquire(blocking=self._revisiones is None):
+            return
+        try:
+            with self._lock:
+                ahora = time.monotonic()
+                if self._revisiones is not None and ahora - self._ultima_revision < INTERVALO_REVISION_SEG:
+                    return
+                # Se anota ANTES de consultar: si un commit invalida mientras tanto, vuelve a 0 y se relee
+                self._ultima_revision = ahora
+            db = SessionLocal()
+            try:
+                revisiones = dict(
+                    db.query(models.RevisionTabla.tabla, models.RevisionTabla.revision)
+                    .filter(models.RevisionTabla.tabla.in_(self.tablas))
+                )
+            finally:
+                db.close()
+            with self._lock:
+                self._revisiones = revisiones
+        finally:
+            self._revisando.release()
+
+    def invalidar_tablas(self, tablas):
+        """Marca lo cargado de esas tablas como viejo y obliga a releer revisiones en la siguiente lectura."""
+        with self._lock:
+            for nombre, entrada in self.entradas.items():
+                cargado = self._cargados.get(nombre)
+                if entrada.tabla in tablas and cargado:
+                    # Se queda la versión anterior para servirla mientras alguien recarga
+                    self._cargados[nombre] = (None,) + cargado[1:]
+            self._ultima_revision = 0.0
+
+    # --- Lectura ---
+    def _cargar(self, nombre, revision):
+        entrada = self.entradas[nombre]
+        db = SessionLocal()
+        try:
+            datos = entrada.serializar(entrada.consultar(db))
+        finally:
+            db.close()
+        cuerpo = json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = 'W/"' + hashlib.sha1(f"{nombre}:{revision}".encode()).hexdigest()[:20] + '"'
+        return (revision, datos, cuerpo, etag)
+
+    def _obtener(self, nombre):
+        self._revisar_versiones()
+        with self._lock:
+            revision = self._revisiones.get(self.entradas[nombre].tabla, 0)
+            cargado = self._cargados.get(nombre)
+        if cargado and cargado[0] == revision:
+            return cargado
+
+        # Un solo hilo recarga; si ya hay una versión anterior, los demás no esperan
+        recargando = self._recargando[nombre]
+        if not recargando.acquire(blocking=cargado is None):
+            return cargado
+        try:
+            with self._lock:
+                cargado = self._cargados.get(nombre)
+            if cargado and cargado[0] == revision:
+                return cargado  # Otro hilo la dejó lista mientras esperábamos
+            cargado = self._cargar(nombre, revision)
+            with self._lock:
+                self._cargados[nombre] = cargado
+            return cargado
+        finally:
+            recargando.release()
+
+    def datos(self, nombre):
+        """Lista de dicts (no modificar: es la misma que se sirve a todos)."""
+        return self._obtener(nombre)[1]
+
+    def respuesta(self, nombre, request: Request):
+        """Response con el JSON ya armado; 304 si el navegador ya tiene esa versión."""
+        _, _, cuerpo, etag = self._obtener(nombre)
+        encabezados = {"ETag": etag, "Cache-Control": "no-cache"}
+        if coincide_etag(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=encabezados)
+        return Response(content=cuerpo, media_type="application/json", headers=encabezados)
+
+    def valor_configuracion(self, clave, por_defecto=None):
+        for fila in self.datos("configuracion"):
+            if fila["clave"] == clave:
+                return fila["valor"]
+        return por_defecto
+
+catalogos = CacheCatalogos([
+    EntradaCatalogo("servicios", models.Servicio, schemas.Servicio),
+    EntradaCatalogo("fallas_comunes", models.CatFalla, solo_activos=True),
+    EntradaCatalogo("sistemas", models.CatSistema, solo_activos=True),
+    EntradaCatalogo("configuracion", models.Configuracion, schemas.Configuracion),
+    EntradaCatalogo("metodos_pago", models.MetodoPago, solo_activos=True),
+    EntradaCatalogo("estados_orden", models.EstadoOrden),
+])
+
+# --- INVALIDACIÓN LOCAL AL HACER COMMIT ---
+
+def _anotar_tablas(session, tablas):
+    tablas = set(tablas) & set(catalogos.tablas)
+    if tablas:
+        session.info.setdefault("catalogos_tocados", set()).update(tablas)
+
+@event.listens_for(Session, "after_flush")
+def _anotar_por_flush(session, contexto):
+    _anotar_tablas(session, {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__table__")
+    })
+
+@event.listens_for(Session, "do_orm_execute")
+def _anotar_por_update_masivo(estado):
+    if (estado.is_update or estado.is_delete or estado.is_insert) and estado.bind_mapper is not None:
+        _anotar_tablas(estado.session, {estado.bind_mapper.local_table.name})
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_al_confirmar(session):
+    if session.in_nested_transaction():
+        return  # Un SAVEPOINT todavía se puede deshacer con la transacción de afuera
+    tablas = session.info.pop("catalogos_tocados", None)
+    if tablas:
+        catalogos.invalidar_tablas(tablas)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_anotaciones(session):
+    if session.in_nested_transaction():
+        return  # Invalidar de más no hace daño; lo de las otras operaciones sí debe invalidarse
+    session.info.pop("catalogos_tocados", None)
@@ -0,0 +1,168 @@
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+from logger import guardar_error_log
+from resumenes import insertar_o_sumar
+import models
+
+# ---------------------------------------------------------
+# 💵 CUENTAS DE CAJA EN SQL
+# Los totales del cierre salen de UN solo GROUP BY tipo, metodo_pago
+# en vez de traer cada movimiento como objeto y sumarlo en Python.
+# El cierre marca los movimientos con un UPDATE masivo.
+#
+# Además caja_acumulados lleva los totales de la caja abierta al día:
+# cada MovimientoCaja nuevo suma ahí en la misma transacción (listener),
+# y el cierre resta lo que cerró. Así /cierres/hoy no recorre movimientos.
+# ---------------------------------------------------------
+
+TOLERANCIA = 0.005  # Medio centavo, por el redondeo de Float
+
+METODOS_INGRESO = {
+    "Efectivo": "total_efectivo",
+    "Tarjeta": "total_tarjeta",
+    "Transferencia": "total_transferencia",
+}
+
+def totales_desde_grupos(grupos):
+    """grupos: filas (tipo, metodo_pago, monto). Regresa los totales con las reglas de siempre."""
+    totales = {campo: 0.0 for campo in METODOS_INGRESO.values()}
+    totales["total_gastos"] = 0.0
+    for tipo, metodo_pago, monto in grupos:
+        if tipo == "INGRESO" and metodo_pago in METODOS_INGRESO:
+            totales[METODOS_INGRESO[metodo_pago]] += monto or 0.0
+        elif tipo == "EGRESO":
+            totales["total_gastos"] += monto or 0.0
+    totales["total_ingresos"] = sum(totales[campo] for campo in METODOS_INGRESO.values())
+    totales["saldo_final"] = totales["total_ingresos"] - totales["total_gastos"]
+    return totales
+
+def grupos_caja(db, *filtros):
+    """Filas (tipo, metodo_pago, monto, movimientos, max_id) de los movimientos que cumplan `filtros`."""
+    M = models.MovimientoCaja
+    return db.query(
+        M.tipo, M.metodo_pago, func.sum(M.monto), func.count(M.id), func.max(M.id)
+    ).filter(*filtros).group_by(M.tipo, M.metodo_pago).all()
+
+def totales_de_grupos(filas):
+    """Totales de las filas de grupos_caja, más cuántos movimientos son y el id más alto."""
+    totales = totales_desde_grupos((tipo, metodo, monto) for tipo, metodo, monto, _, _ in filas)
+    totales["movimientos"] = sum(cantidad for *_, cantidad, _ in filas)
+    totales["max_id"] = max((maximo for *_, maximo in filas), default=None)
+    return totales
+
+def cerrar_movimientos(db, cierre_id, max_id):
+    """Marca con el cierre todo lo abierto hasta max_id. Regresa cuántos movimientos marcó."""
+    M = models.MovimientoCaja
+    resultado = db.execute(
+        update(M)
+        .where(M.cierre_diario_id == None, M.id <= max_id)
+        .values(cierre_diario_id=cierre_id)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount
+
+def ordenes_en_cierre(db, cierre_id):
+    """Órdenes distintas cobradas dentro de un cierre diario."""
+    M = models.MovimientoCaja
+    return db.query(func.count(func.distinct(M.orden_id))).filter(
+        M.cierre_diario_id == cierre_id, M.tipo == "INGRESO", M.orden_id != None
+    ).scalar() or 0
+
+# --- ROLLUP MENSUAL (sale de los cierres diarios, no de los movimientos) ---
+
+CAMPOS_ROLLUP = ("total_efectivo", "total_tarjeta", "total_transferencia", "total_ingresos", "total_gastos", "saldo_final", "ordenes_cobradas")
+
+def rango_mes(anio, mes):
+    inicio = datetime(anio, mes, 1)
+    fin = datetime(anio + 1, 1, 1) if mes == 12 else datetime(anio, mes + 1, 1)
+    return inicio, fin
+
+def resumen_mensual(db, anio, mes):
+    """Suma en una consulta los cierres diarios hechos en ese mes."""
+    C = models.CierreDiario
+    inicio, fin = rango_mes(anio, mes)
+    fila = db.query(
+        *[func.coalesce(func.sum(getattr(C, campo)), 0) for campo in CAMPOS_ROLLUP],
+        func.count(C.id),
+    ).filter(C.fecha_cierre >= inicio, C.fecha_cierre < fin).one()
+
+    resumen = dict(zip(CAMPOS_ROLLUP, fila[:-1]))
+    resumen["cierres_diarios"] = fila[-1]
+    ordenes = resumen["ordenes_cobradas"]
+    resumen["ticket_promedio"] = round(resumen["total_ingresos"] / ordenes, 2) if ordenes else 0.0
+    return resumen
+
+# --- ACUMULADOS DE LA CAJA ABIERTA ---
+
+def sumar_acumulado(conexion, tipo, metodo_pago, monto, movimientos):
+    """monto = monto + delta en un solo INSERT ... ON CONFLICT, para que dos cobros a la vez no se pisen."""
+    insertar_o_sumar(
+        conexion, models.CajaAcumulado.__table__,
+        {"tipo": tipo, "metodo_pago": metodo_pago or ""},
+        {"monto": monto, "movimientos": movimientos},
+    )
+
+@event.listens_for(Session, "after_flush")
+def _acumular_movimientos_nuevos(session, contexto):
+    # Cualquier MovimientoCaja nuevo (cobros, y egresos el día que existan) suma en la misma transacción
+    grupos = {}
+    for obj in session.new:
+        if isinstance(obj, models.MovimientoCaja) and obj.cierre_diario_id is None:
+            llave = (obj.tipo, obj.metodo_pago or "")
+            monto, cantidad = grupos.get(llave, (0.0, 0))
+            grupos[llave] = (monto + (obj.monto or 0.0), cantidad + 1)
+    for (tipo, metodo_pago), (monto, cantidad) in grupos.items():
+        sumar_acumulado(session.connection(), tipo, metodo_pago, monto, cantidad)
+
+def descontar_cerrados(db, grupos):
+    """Resta del acumulado lo que acaba de entrar a un cierre (lo que llegó después se queda)."""
+    for tipo, metodo_pago, monto, cantidad, _ in grupos:
+        sumar_acumulado(db.connection(), tipo, metodo_pago, -(monto or 0.0), -cantidad)
+
+def totales_acumulados(db):
+    """Totales de la caja abierta leyendo solo caja_acumulados (unas cuantas filas)."""
+    A = models.CajaAcumulado
+    filas = [(t, m, monto, cantidad, 0) for t, m, monto, cantidad in db.query(A.tipo, A.metodo_pago, A.monto, A.movimientos)]
+    totales = totales_de_grupos(filas)
+    del totales["max_id"]
+    return totales
+
+def reconstruir_acumulados(conexion):
+    """Vuelve a llenar caja_acumulados desde los movimientos abiertos (migración o reparación)."""
+    M = models.MovimientoCaja.__table__
+    conexion.execute(delete(models.CajaAcumulado.__table__))
+    filas = conexion.execute(
+        select(M.c.tipo, M.c.metodo_pago, func.sum(M.c.monto), func.count(M.c.id))
+        .where(M.c.cierre_diario_id == None).group_by(M.c.tipo, M.c.metodo_pago)
+    ).all()
+    for tipo, metodo_pago, monto, cantidad in filas:
+        sumar_acumulado(conexion, tipo, metodo_pago, monto or 0.0, cantidad)
+
+def verificar_acumulados(db):
+    """Compara el acumulado contra los movimientos reales. Regresa la lista de descuadres."""
+    reales = {}
+    for tipo, metodo_pago, monto, cantidad, _ in grupos_caja(db, models.MovimientoCaja.cierre_diario_id == None):
+        monto_previo, cantidad_previa = reales.get((tipo, metodo_pago or ""), (0.0, 0))
+        reales[(tipo, metodo_pago or "")] = (monto_previo + (monto or 0.0), cantidad_previa + cantidad)
+    A = models.CajaAcumulado
+    acumulados = {(t, m): (monto or 0.0, cantidad or 0) for t, m, monto, cantidad in db.query(A.tipo, A.metodo_pago, A.monto, A.movimientos)}
+
+    diferencias = []
+    for llave in sorted(set(reales) | set(acumulados), key=str):
+        monto_real, cantidad_real = reales.get(llave, (0.0, 0))
+        monto_acumulado, cantidad_acumulada = acumulados.get(llave, (0.0, 0))
+        if abs(monto_real - monto_acumulado) > TOLERANCIA or cantidad_real != cantidad_acumulada:
+            diferencias.append({
+                "tipo": llave[0],
+                "metodo_pago": llave[1],
+                "monto_real": monto_real,
+                "monto_acumulado": monto_acumulado,
+                "movimientos_reales": cantidad_real,
+                "movimientos_acumulados": cantidad_acumulada,
+            })
+    if diferencias:
+        guardar_error_log("Acumulados de caja", f"Descuadre contra movimientos: {diferencias}")
+    return diferencias
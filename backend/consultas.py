@@ -0,0 +1,59 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from totales_orden import REGLAS, cumple
+import models
+
+# ---------------------------------------------------------
+# 🔗 OPCIONES DE CARGA PARA LAS RESPUESTAS
+# OrdenResponse trae anidados cliente y vehículo. Si no se cargan antes,
+# Pydantic dispara 2 SELECT por cada orden (N+1). Con selectinload son
+# siempre 3 consultas: las órdenes + 1 para clientes + 1 para vehículos.
+# ---------------------------------------------------------
+
+OPCIONES_ORDEN_RESPONSE = (
+    selectinload(models.Orden.cliente),
+    selectinload(models.Orden.vehiculo),
+)
+
+def query_ordenes(db):
+    """Query base para cualquier endpoint que regrese OrdenResponse."""
+    return db.query(models.Orden).options(*OPCIONES_ORDEN_RESPONSE)
+
+# ---------------------------------------------------------
+# 📁 EXPEDIENTE DE UNA ORDEN (CAJA / DIAGNÓSTICO)
+# Una consulta trae orden + cliente + vehículo + inspección (JOIN por id)
+# y otra los detalles. Siempre 2 consultas, sin bajar catálogos completos.
+# ---------------------------------------------------------
+
+def calcular_subtotales(orden, detalles):
+    """Los montos son los que ya guarda la orden (totales_orden.py); aquí solo se cuentan líneas."""
+    return {
+        "mano_obra": orden.subtotal_mano_obra or 0.0,
+        "refacciones": orden.subtotal_refacciones or 0.0,
+        "aprobado": orden.subtotal_aprobado or 0.0,
+        "total": orden.total_detalles or 0.0,
+        "refacciones_cliente": sum(1 for d in detalles if d.tipo == "refaccion" and d.es_refaccion_cliente),
+        "tareas_pendientes": sum(1 for d in detalles if cumple(REGLAS["subtotal_pendiente"], d)),
+    }
+
+def cargar_expediente(db, orden_id):
+    orden = db.query(models.Orden).options(
+        joinedload(models.Orden.cliente),
+        joinedload(models.Orden.vehiculo),
+        joinedload(models.Orden.inspeccion),
+    ).filter(models.Orden.id == orden_id).first()
+    if not orden:
+        return None
+
+    detalles = db.query(models.OrdenDetalle).filter(
+        models.OrdenDetalle.orden_id == orden_id
+    ).order_by(models.OrdenDetalle.id.asc()).all()
+
+    return {
+        "orden": orden,
+        "cliente": orden.cliente,
+        "vehiculo": orden.vehiculo,
+        "inspeccion": orden.inspeccion,
+        "detalles": detalles,
+        "subtotales": calcular_subtotales(orden, detalles),
+    }
@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -18,13 +19,39 @@ else:
     # MODO NUBE (Postgres)
     engine = create_engine(DATABASE_URL)
 
+if engine.dialect.name == "sqlite":
+    # Receta de SQLAlchemy para pysqlite: el driver abre la transacción tarde (hasta
+    # el primer INSERT/UPDATE) y así un SAVEPOINT se confirma solo. Le quitamos el
+    # manejo de transacciones y mandamos nosotros el BEGIN, para que begin_nested()
+    # funcione igual que en Postgres.
+    #   - BEGIN normal: las lecturas (todos los GET) no toman el candado de
+    #     escritura y con WAL no se estorban entre ellas ni a quien escribe.
+    #   - escritura=True -> BEGIN IMMEDIATE: toma el candado al empezar. Con un
+    #     BEGIN normal, una transacción que leyó y luego escribe falla si otra
+    #     escribió en medio; así se forma y espera (timeout del driver).
+    @event.listens_for(engine, "connect")
+    def _conexion_sqlite(conexion_dbapi, registro):
+        conexion_dbapi.isolation_level = None
+        conexion_dbapi.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _iniciar_transaccion(conexion):
+        escritura = conexion.get_execution_options().get("escritura")
+        conexion.exec_driver_sql("BEGIN IMMEDIATE" if escritura else "BEGIN")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Para lo que lee y luego escribe (en Postgres es igual que engine / SessionLocal)
+engine_escritura = engine.execution_options(escritura=True)
+SessionEscritura = sessionmaker(autocommit=False, autoflush=False, bind=engine_escritura)
 
 Base = declarative_base()
 
 # --- ESTA PARTE FALTABA Y ES LA QUE DA EL ERROR ---
-def get_db():
-    db = SessionLocal()
+METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+def get_db(request: Request):
+    # Los GET solo leen; POST/PUT/DELETE leen y luego escriben: toman la escritura desde el BEGIN
+    db = SessionLocal() if request.method in METODOS_LECTURA else SessionEscritura()
     try:
         yield db
     finally:
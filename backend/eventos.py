@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import DATABASE_URL, engine
+from logger import guardar_error_log
+
+# ---------------------------------------------------------
+# 📡 EVENTOS EN VIVO PARA EL TABLERO (SSE)
+# Los endpoints registran el evento en la sesión de BD y se publica SOLO si el
+# commit sale bien. Cada pantalla abierta está suscrita por /taller/eventos.
+#
+# Brokers:
+#   - memoria:  un solo proceso (desarrollo / pruebas)
+#   - postgres: LISTEN/NOTIFY, para que todos los workers de uvicorn se enteren
+# ---------------------------------------------------------
+
+CANAL_POSTGRES = "taller_eventos"
+TAMANO_COLA = 100  # Si una pantalla se atrasa más que esto, se le tiran los eventos viejos
+
+class Suscripcion:
+    def __init__(self, loop):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=TAMANO_COLA)
+
+    def _entregar(self, evento):
+        # Corre dentro del loop del suscriptor
+        if self.cola.full():
+            self.cola.get_nowait()
+        self.cola.put_nowait(evento)
+
+class BrokerMemoria:
+    """Reparte los eventos entre los suscriptores de ESTE proceso."""
+
+    def __init__(self):
+        self._suscriptores = set()
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        pass
+
+    def detener(self):
+        pass
+
+    def suscribir(self):
+        suscripcion = Suscripcion(asyncio.get_running_loop())
+        with self._lock:
+            self._suscriptores.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscriptores.discard(suscripcion)
+
+    def entregar_local(self, evento):
+        # Los endpoints corren en el threadpool; call_soon_threadsafe pasa el evento a cada loop
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for suscripcion in suscriptores:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                self.cancelar(suscripcion)  # Su loop ya se cerró
+
+    def publicar(self, evento):
+        self.entregar_local(evento)
+
+class BrokerPostgres(BrokerMemoria):
+    """
+    Publica con NOTIFY y un hilo por worker escucha con LISTEN,
+    así un movimiento hecho en un worker llega a las pantallas conectadas a los demás.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._escuchar, name="broker-eventos", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+
+    def publicar(self, evento):
+        with engine.connect() as conexion:
+            conexion.execute(text("SELECT pg_notify(:canal, :datos)"),
+                             {"canal": CANAL_POSTGRES, "datos": json.dumps(evento, default=str)})
+            conexion.commit()
+
+    def _escuchar(self):
+        import psycopg2
+
+        while not self._detener.is_set():
+            conexion = None
+            try:
+                conexion = psycopg2.connect(self.url)
+                conexion.autocommit = True
+                conexion.cursor().execute(f"LISTEN {CANAL_POSTGRES};")
+                while not self._detener.is_set():
+                    if select.select([conexion], [], [], 5) == ([], [], []):
+                        continue
+                    conexion.poll()
+                    while conexion.notifies:
+                        aviso = conexion.notifies.pop(0)
+                        self.entregar_local(json.loads(aviso.payload))
+            except Exception as e:
+                guardar_error_log("Broker de eventos", str(e))
+                time.sleep(3)  # Reintentamos la conexión
+            finally:
+                if conexion is not None:
+                    conexion.close()
+
+def crear_broker():
+    tipo = os.getenv("EVENTOS_BROKER") or ("postgres" if DATABASE_URL.startswith("postgresql") else "memoria")
+    if tipo == "postgres":
+        return BrokerPostgres(DATABASE_URL)
+    return BrokerMemoria()
+
+broker = crear_broker()
+
+# --- PUBLICACIÓN LIGADA AL COMMIT ---
+
+def notificar(db, evento):
+    """Deja el evento pendiente en la sesión; se publica solo si el commit sale bien."""
+    db.info.setdefault("eventos_pendientes", []).append(evento)
+
+def notificar_orden(db, orden, accion):
+    notificar(db, {
+        "tipo": "orden",
+        "accion": accion,
+        "orden_id": orden.id,
+        "folio": orden.folio_visual,
+        "estado": orden.estado,
+        "mecanico_asignado": orden.mecanico_asignado,
+    })
+
+@event.listens_for(Session, "after_commit")
+def _publicar_pendientes(session):
+    if session.in_nested_transaction():
+        return  # Fue un SAVEPOINT (begin_nested): se publica hasta el commit de verdad
+    eventos = session.info.pop("eventos_pendientes", [])
+    for evento in eventos:
+        try:
+            broker.publicar(evento)
+        except Exception as e:
+            # El cambio ya quedó guardado; si falla el aviso, las pantallas lo verán en su siguiente carga
+            guardar_error_log("Publicar evento", str(e))
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    if session.in_nested_transaction():
+        return  # Solo se deshizo un SAVEPOINT; quien lo abrió quita sus propios eventos
+    session.info.pop("eventos_pendientes", None)
+
+def formato_sse(evento):
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento, default=str, ensure_ascii=False)}\n\n"
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+from itertools import groupby
+
+# Aseguramos que Python encuentre los módulos (también se corre como script)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, func, or_, select
+
+from database import SessionLocal
+from logger import guardar_error_log
+import models
+
+# --- PYARROW (OPCIONAL) ---
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+    print("⚠️ Advertencia: pyarrow no está instalado (la exportación a Parquet no estará disponible).")
+
+# ---------------------------------------------------------
+# 🧱 EXPORTACIÓN A PARQUET (PARTICIONADA POR DÍA)
+# Cada tabla se escribe en  <destino>/<tabla>/fecha=YYYY-MM-DD/datos.parquet
+# (comprimido, por columnas) para que el contador o una herramienta de BI lo lea
+# sin pegarle a la BD de producción.
+#
+# Incremental: un GROUP BY por tabla saca la "huella" de cada día (cuántas filas,
+# último id / última modificación). Solo se reescriben los días cuya huella
+# cambió desde la corrida anterior (_manifiesto.json); lo demás ni se lee.
+# Las filas se leen en bloques (yield_per = cursor del lado del servidor en
+# Postgres) y se escriben por row groups: la memoria no crece con la tabla.
+#
+#   python exportacion_parquet.py                  -> exporta lo nuevo o cambiado
+#   python exportacion_parquet.py --completo       -> reescribe todo
+# ---------------------------------------------------------
+
+DESTINO = os.getenv("EXPORTACION_PARQUET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exportaciones_parquet"))
+COMPRESION = os.getenv("EXPORTACION_PARQUET_COMPRESION", "zstd")
+FILAS_POR_BLOQUE = 10_000
+ARCHIVO_DATOS = "datos.parquet"
+MANIFIESTO = "_manifiesto.json"
+SIN_FECHA = "sin_fecha"
+
+def disponible():
+    return pa is not None
+
+class FuenteParquet:
+    """
+    Una tabla a exportar. `fecha` es la columna que decide la partición y
+    `huella` las agregaciones que cambian cuando algo del día cambia.
+    """
+    def __init__(self, modelo, fecha, huella, unir=None):
+        self.modelo = modelo
+        self.tabla = modelo.__table__
+        self.nombre = self.tabla.name
+        self.fecha = fecha
+        self.huella = huella
+        self.unir = unir
+
+    @property
+    def dia(self):
+        return func.date(self.fecha)
+
+    def origen(self, consulta):
+        return consulta.select_from(self.tabla.join(*self.unir, isouter=True)) if self.unir else consulta
+
+O = models.Orden.__table__
+
+FUENTES = {f.nombre: f for f in [
+    # El cierre diario marca cierre_diario_id después: por eso cuenta en la huella
+    FuenteParquet(
+        models.MovimientoCaja, models.MovimientoCaja.__table__.c.fecha,
+        lambda t: [func.count(t.c.id), func.max(t.c.id), func.count(t.c.cierre_diario_id)],
+    ),
+    FuenteParquet(
+        models.Orden, O.c.creado_en,
+        lambda t: [func.count(t.c.id), func.max(t.c.actualizado_en)],
+    ),
+    # Cualquier cambio a un detalle mueve actualizado_en de su orden (sincronizacion.py),
+    # así que los detalles van en la partición del día en que se creó su orden
+    FuenteParquet(
+        models.OrdenDetalle, O.c.creado_en,
+        lambda t: [func.count(t.c.id), func.max(O.c.actualizado_en)],
+        unir=(O, models.OrdenDetalle.__table__.c.orden_id == O.c.id),
+    ),
+    FuenteParquet(
+        models.Auditoria, models.Auditoria.__table__.c.fecha,
+        lambda t: [func.count(t.c.id), func.max(t.c.id)],
+    ),
+]}
+
+# --- ESQUEMA ---
+
+def tipo_arrow(columna):
+    tipo = columna.type
+    if isinstance(tipo, Boolean):
+        return pa.bool_()
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, Float):
+        return pa.float64()
+    if isinstance(tipo, DateTime):
+        # Las columnas con zona (server_default now()) vienen en UTC; SQLite las regresa sin zona
+        return pa.timestamp("us", tz="UTC") if tipo.timezone else pa.timestamp("us")
+    if isinstance(tipo, Date):
+        return pa.date32()
+    return pa.string()
+
+def esquema(fuente):
+    return pa.schema([pa.field(c.name, tipo_arrow(c)) for c in fuente.tabla.columns])
+
+# --- MANIFIESTO ---
+
+def _leer_manifiesto(carpeta):
+    try:
+        with open(os.path.join(carpeta, MANIFIESTO), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return {"columnas": [], "particiones": {}}
+
+def _guardar_manifiesto(carpeta, manifiesto):
+    ruta = os.path.join(carpeta, MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(ruta + ".tmp", ruta)
+
+def _texto_dia(dia):
+    # SQLite regresa 'YYYY-MM-DD' como texto y Postgres un date
+    return str(dia) if dia is not None else SIN_FECHA
+
+def huellas_por_dia(db, fuente):
+    """{dia: huella} de toda la tabla en una sola consulta agrupada."""
+    consulta = fuente.origen(select(fuente.dia, *fuente.huella(fuente.tabla))).group_by(fuente.dia)
+    return {_texto_dia(dia): [str(valor) for valor in huella] for dia, *huella in db.execute(consulta)}
+
+# --- ESCRITURA ---
+
+def _carpeta_particion(carpeta, dia):
+    return os.path.join(carpeta, f"fecha={dia}")
+
+def _escribir_particion(carpeta, dia, filas, schema):
+    """Escribe los bloques de filas de un día a un archivo temporal y lo pone en su lugar al final."""
+    destino = _carpeta_particion(carpeta, dia)
+    os.makedirs(destino, exist_ok=True)
+    ruta = os.path.join(destino, ARCHIVO_DATOS)
+    total = 0
+    with pq.ParquetWriter(ruta + ".tmp", schema, compression=COMPRESION) as escritor:
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) >= FILAS_POR_BLOQUE:
+                escritor.write_batch(_a_batch(bloque, schema))
+                total += len(bloque)
+                bloque = []
+        if bloque:
+            escritor.write_batch(_a_batch(bloque, schema))
+            total += len(bloque)
+    os.replace(ruta + ".tmp", ruta)
+    return total
+
+def _a_batch(filas, schema):
+    columnas = list(zip(*filas))
+    return pa.record_batch([pa.array(valores, type=campo.type) for valores, campo in zip(columnas, schema)], schema=schema)
+
+def exportar_tabla(db, fuente, destino, completo=False):
+    carpeta = os.path.join(destino, fuente.nombre)
+    os.makedirs(carpeta, exist_ok=True)
+    schema = esquema(fuente)
+    columnas = schema.names
+
+    manifiesto = _leer_manifiesto(carpeta)
+    if completo or manifiesto["columnas"] != columnas:
+        # Cambió el esquema (columna nueva por migración): todo se vuelve a escribir
+        manifiesto = {"columnas": columnas, "particiones": {}}
+    anteriores = manifiesto["particiones"]
+    huellas = huellas_por_dia(db, fuente)
+    cambiadas = sorted(dia for dia, huella in huellas.items() if anteriores.get(dia, {}).get("huella") != huella)
+    # Días que ya no tienen filas (se ve en disco, por si el manifiesto se reinició)
+    en_disco = {n[len("fecha="):] for n in os.listdir(carpeta) if n.startswith("fecha=")}
+    borradas = sorted((en_disco | set(anteriores)) - set(huellas))
+
+    resultado = {"escritas": [], "sin_cambios": len(huellas) - len(cambiadas), "borradas": borradas, "filas": 0}
+    try:
+        for dia in borradas:
+            shutil.rmtree(_carpeta_particion(carpeta, dia), ignore_errors=True)
+            anteriores.pop(dia, None)
+        if not cambiadas:
+            return resultado
+
+        filtros = [fuente.dia.in_([d for d in cambiadas if d != SIN_FECHA])]
+        if SIN_FECHA in cambiadas:
+            filtros.append(fuente.fecha == None)
+        consulta = fuente.origen(select(fuente.dia, *fuente.tabla.columns)) \
+            .where(or_(*filtros)) \
+            .order_by(fuente.dia, fuente.tabla.c.id) \
+            .execution_options(yield_per=FILAS_POR_BLOQUE)
+
+        # Las filas llegan ordenadas por día: cada grupo es una partición completa
+        for dia, filas in groupby(db.execute(consulta), key=lambda fila: _texto_dia(fila[0])):
+            total = _escribir_particion(carpeta, dia, (tuple(fila)[1:] for fila in filas), schema)
+            anteriores[dia] = {"huella": huellas[dia], "filas": total, "exportado_en": datetime.now().isoformat(timespec="seconds")}
+            resultado["escritas"].append(dia)
+            resultado["filas"] += total
+    finally:
+        # Lo que alcanzó a escribirse queda registrado aunque algo falle a la mitad
+        manifiesto["columnas"] = columnas
+        _guardar_manifiesto(carpeta, manifiesto)
+    return resultado
+
+# --- CORRIDA ---
+
+_corriendo = threading.Lock()
+ultima_corrida = {}
+
+def en_curso():
+    return _corriendo.locked()
+
+def exportar(destino=None, tablas=None, completo=False):
+    """Exporta las tablas pedidas (todas por defecto). Solo una corrida a la vez por proceso."""
+    if not disponible():
+        raise RuntimeError("pyarrow no está instalado")
+    if not _corriendo.acquire(blocking=False):
+        raise RuntimeError("Ya hay una exportación en curso")
+    destino = destino or DESTINO
+    inicio = datetime.now()
+    resultado = {"destino": destino, "iniciada": inicio.isoformat(timespec="seconds"), "tablas": {}}
+    db = SessionLocal()
+    try:
+        for nombre in tablas or FUENTES:
+            resultado["tablas"][nombre] = exportar_tabla(db, FUENTES[nombre], destino, completo)
+        resultado["segundos"] = round((datetime.now() - inicio).total_seconds(), 2)
+        resultado["estado"] = "ok"
+        return resultado
+    except Exception as e:
+        resultado["estado"] = "error"
+        resultado["error"] = str(e)
+        guardar_error_log("Exportación Parquet", str(e))
+        raise
+    finally:
+        db.close()
+        ultima_corrida.clear()
+        ultima_corrida.update(resultado)
+        _corriendo.release()
+
+def exportar_en_fondo(completo=False):
+    """Para BackgroundTasks: el error ya quedó en el log y en ultima_corrida."""
+    try:
+        exportar(completo=completo)
+    except Exception:
+        pass
+
+def particiones(destino=None):
+    """Lo que hay exportado según los manifiestos: {tabla: {dias, filas, ultimo_dia}}."""
+    destino = destino or DESTINO
+    resumen = {}
+    for nombre in FUENTES:
+        exportadas = _leer_manifiesto(os.path.join(destino, nombre))["particiones"]
+        dias = sorted(d for d in exportadas if d != SIN_FECHA)
+        resumen[nombre] = {
+            "particiones": len(exportadas),
+            "filas": sum(p["filas"] for p in exportadas.values()),
+            "primer_dia": dias[0] if dias else None,
+            "ultimo_dia": dias[-1] if dias else None,
+        }
+    return resumen
+
+def ruta_particion(tabla, dia, destino=None):
+    """Ruta del archivo de una partición, o None si no existe (tabla y día ya validados)."""
+    ruta = os.path.join(_carpeta_particion(os.path.join(destino or DESTINO, tabla), dia), ARCHIVO_DATOS)
+    return ruta if os.path.isfile(ruta) else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta movimientos, órdenes, detalles y auditoría a Parquet por día.")
+    parser.add_argument("--destino", default=None, help=f"Carpeta de salida (por defecto {DESTINO}).")
+    parser.add_argument("--tabla", action="append", choices=sorted(FUENTES), help="Solo esta tabla (se puede repetir).")
+    parser.add_argument("--completo", action="store_true", help="Reescribe todas las particiones.")
+    args = parser.parse_args()
+    if not disponible():
+        sys.exit("❌ Instala pyarrow para exportar a Parquet.")
+
+    resultado = exportar(args.destino, args.tabla, args.completo)
+    for nombre, tabla in resultado["tablas"].items():
+        print(f"🧱 {nombre:<18} escritas={len(tabla['escritas']):<5} sin cambios={tabla['sin_cambios']:<5} "
+              f"borradas={len(tabla['borradas']):<3} filas={tabla['filas']:,}")
+    print(f"✅ Listo en {resultado['segundos']} s -> {resultado['destino']}")
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from database import SessionLocal
+import models
+
+# ---------------------------------------------------------
+# 📤 EXPORTACIÓN EN STREAMING (CSV / NDJSON)
+# Las filas se leen de la BD en bloques (yield_per) y se van escribiendo en la
+# respuesta conforme llegan: la memoria no crece con el rango de fechas.
+# ---------------------------------------------------------
+
+FILAS_POR_BLOQUE = 1000
+
+COLUMNAS_MOVIMIENTO = [
+    models.MovimientoCaja.id,
+    models.MovimientoCaja.fecha,
+    models.MovimientoCaja.tipo,
+    models.MovimientoCaja.monto,
+    models.MovimientoCaja.metodo_pago,
+    models.MovimientoCaja.referencia,
+    models.MovimientoCaja.descripcion,
+    models.MovimientoCaja.usuario_id,
+    models.MovimientoCaja.orden_id,
+    models.MovimientoCaja.cierre_diario_id,
+]
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+def _filas(filtros):
+    """
+    Abre SU PROPIA sesión: el generador sigue corriendo después de que el endpoint
+    regresó, así que no puede depender de la sesión del request.
+    """
+    db = SessionLocal()
+    try:
+        consulta = select(*COLUMNAS_MOVIMIENTO).where(*filtros) \
+            .order_by(models.MovimientoCaja.fecha.desc()) \
+            .execution_options(yield_per=FILAS_POR_BLOQUE)
+        for fila in db.execute(consulta):
+            yield fila
+    finally:
+        db.close()
+
+def stream_movimientos(filtros, formato):
+    """Generador de texto (CSV o NDJSON) para StreamingResponse."""
+    nombres = [columna.key for columna in COLUMNAS_MOVIMIENTO]
+    buffer = io.StringIO()
+
+    if formato == "csv":
+        escritor = csv.writer(buffer)
+        escritor.writerow(nombres)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    pendientes = 0
+    for fila in _filas(filtros):
+        if formato == "csv":
+            escritor.writerow(fila)
+        else:
+            buffer.write(json.dumps({k: _valor_json(v) for k, v in zip(nombres, fila)}, ensure_ascii=False))
+            buffer.write("\n")
+        pendientes += 1
+        if pendientes >= FILAS_POR_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pendientes = 0
+
+    if pendientes:
+        yield buffer.getvalue()
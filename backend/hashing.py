@@ -0,0 +1,150 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+from logger import guardar_error_log
+import auth
+
+# ---------------------------------------------------------
+# 🔐 BCRYPT EN UN POOL DE PROCESOS CON LÍMITE
+# Cada hash de bcrypt son cientos de ms de CPU. Hechos dentro del threadpool de
+# FastAPI, un cambio de turno (todos entrando a la vez) deja sin hilos al resto
+# de la API. Aquí se mandan a HASH_PROCESOS procesos aparte y los endpoints
+# (async) esperan el resultado sin ocupar ningún hilo. Como mucho
+# HASH_MAX_PENDIENTES pueden estar en cola: si no hay cupo se responde 503 con
+# Retry-After AL MOMENTO en vez de encolar sin fin.
+#
+#   HASH_PROCESOS=0  -> sin procesos aparte (en el threadpool, para pruebas)
+#   GET /seguridad/hashing -> métricas de la cola
+# ---------------------------------------------------------
+
+PROCESOS = int(os.getenv("HASH_PROCESOS", "2"))
+MAX_PENDIENTES = int(os.getenv("HASH_MAX_PENDIENTES", str(max(PROCESOS, 1) * 8)))
+REINTENTAR_SEG = int(os.getenv("HASH_REINTENTAR_SEG", "2"))
+
+# --- Lo que corre dentro de cada proceso (debe ser de nivel módulo para poder mandarse) ---
+
+def _hashear(password):
+    return auth.get_password_hash(password)
+
+def _verificar(password, password_hash):
+    return auth.verify_and_update(password, password_hash)
+
+class PoolHashing:
+    def __init__(self, procesos=PROCESOS, max_pendientes=MAX_PENDIENTES, reintentar=REINTENTAR_SEG):
+        self.procesos = procesos
+        self.max_pendientes = max_pendientes
+        self.reintentar = reintentar
+        self._lock = threading.Lock()
+        self._executor = None
+        self._metricas = {
+            "pendientes": 0,
+            "maximo_pendientes": 0,
+            "completadas": 0,
+            "rechazadas": 0,
+            "errores": 0,
+            "segundos_total": 0.0,
+            "segundos_maximo": 0.0,
+        }
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: los workers no heredan los hilos ni las conexiones del servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.procesos, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _reiniciar_pool(self, roto):
+        with self._lock:
+            if self._executor is roto:
+                self._executor = None
+        roto.shutdown(wait=False, cancel_futures=True)
+
+    async def _correr(self, funcion, *args):
+        if self.procesos <= 0:
+            return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
+        pool = self._pool()
+        try:
+            return await asyncio.wrap_future(pool.submit(funcion, *args))
+        except BrokenProcessPool:
+            # Un worker se murió (OOM, kill): se levanta un pool nuevo y se intenta una vez más
+            guardar_error_log("Pool de hashing", "Pool roto, se reinicia")
+            self._reiniciar_pool(pool)
+            return await asyncio.wrap_future(self._pool().submit(funcion, *args))
+
+    def _admitir(self):
+        """Aparta un lugar en la cola sin esperar: 503 si ya está llena."""
+        with self._lock:
+            m = self._metricas
+            if m["pendientes"] >= self.max_pendientes:
+                m["rechazadas"] += 1
+                lleno = True
+            else:
+                m["pendientes"] += 1
+                m["maximo_pendientes"] = max(m["maximo_pendientes"], m["pendientes"])
+                lleno = False
+        if lleno:
+            raise HTTPException(
+                status_code=503,
+                detail="Hay demasiados inicios de sesión al mismo tiempo, intenta de nuevo en unos segundos",
+                headers={"Retry-After": str(self.reintentar)},
+            )
+
+    async def ejecutar(self, funcion, *args):
+        self._admitir()
+        inicio = time.monotonic()
+        exito = False
+        try:
+            resultado = await self._correr(funcion, *args)
+            exito = True
+            return resultado
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._lock:
+                m = self._metricas
+                m["pendientes"] -= 1
+                if exito:
+                    m["completadas"] += 1
+                    m["segundos_total"] += duracion
+                    m["segundos_maximo"] = max(m["segundos_maximo"], duracion)
+                else:
+                    m["errores"] += 1
+
+    async def hashear(self, password):
+        return await self.ejecutar(_hashear, password)
+
+    async def verificar(self, password, password_hash):
+        """(es_valida, hash_nuevo) como auth.verify_and_update."""
+        return await self.ejecutar(_verificar, password, password_hash)
+
+    def metricas(self):
+        with self._lock:
+            m = dict(self._metricas)
+        return {
+            "procesos": self.procesos,
+            "bcrypt_rounds": auth.BCRYPT_ROUNDS,
+            "max_pendientes": self.max_pendientes,
+            "pendientes": m["pendientes"],
+            "maximo_pendientes": m["maximo_pendientes"],
+            "completadas": m["completadas"],
+            "rechazadas": m["rechazadas"],
+            "errores": m["errores"],
+            "promedio_ms": round(m["segundos_total"] / m["completadas"] * 1000, 1) if m["completadas"] else 0.0,
+            "maximo_ms": round(m["segundos_maximo"] * 1000, 1),
+        }
+
+    def cerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+pool_hashing = PoolHashing()
@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal, engine
 from models import Base, Usuario, Configuracion, EstadoOrden, Categoria, MetodoPago
+from migraciones import aplicar_migraciones
 from passlib.context import CryptContext
 
 # Configuración de hash para passwords
@@ -16,8 +17,8 @@ def iniciar_base_de_datos():
     try:
         print("🚀 [INICIO] Arrancando script maestro de base de datos...")
         
-        # 1. CREAR TABLAS (Si no existen)
-        Base.metadata.create_all(bind=engine)
+        # 1. CREAR TABLAS (Si no existen) Y APLICAR MIGRACIONES PENDIENTES
+        aplicar_migraciones()
         print("✅ Tablas verificadas.")
 
         # ==========================================
@@ -1,38 +1,45 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from database import get_db, engine
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel 
-from datetime import datetime 
+from datetime import datetime, timedelta 
 import models, schemas, auth
 import traceback 
 from logger import guardar_error_log 
 from sqlalchemy import func
-
-# --- GOOGLE SHEETS SETUP ---
-try:
-    import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
-    print("✅ Librerías de Google cargadas correctamente.")
-except ImportError:
-    gspread = None
-    print("⚠️ Advertencia: gspread no está instalado.")
-
-# VERIFICACIÓN DE CREDENCIALES
-if os.path.exists("credentials.json"):
-    print("✅ SE ENCONTRÓ EL ARCHIVO 'credentials.json' (Caja Fuerte activa).")
-else:
-    print("⚠️ NO se encontró 'credentials.json'. Asegúrate de haberlo subido a Secret Files en Render.")
-
-models.Base.metadata.create_all(bind=engine)
+import sheets
+from sheets_outbox import despachador, encolar_fila_maestra
+from migraciones import aplicar_migraciones
+from consultas import cargar_expediente, query_ordenes
+from operaciones import PERMISOS_OPERACION, cambiar_estado_detalle, cambiar_precio_detalle, editar_servicio, ejecutar_lote, mover_orden
+from presupuestos import aplicar_cambios, insertar_lineas, linea_nota, linea_refaccion, lineas_de_fallas
+from caja import cerrar_movimientos, descontar_cerrados, ordenes_en_cierre, resumen_mensual, grupos_caja, totales_acumulados, totales_de_grupos, verificar_acumulados
+from busqueda import buscar, normalizar_telefono
+from revisiones import etag_para, inicializar_revisiones, NoModificado
+from cache_catalogos import catalogos
+from eventos import broker, notificar_orden, formato_sse
+from totales_orden import verificador_totales
+from hashing import pool_hashing
+from seguridad import Principal, get_current_user, principales, requerir_permiso, revisar_permiso
+from sincronizacion import calcular_cambios, ESTADOS_FUERA_TABLERO
+from exportaciones import stream_movimientos, TIPOS_CONTENIDO
+from resumenes import calcular_series, registrar_orden_cobrada, GRANULARIDADES
+import motor_reportes
+import exportacion_parquet
+from paginacion import paginar, rango_fechas, ENCABEZADO_CURSOR, LIMITE_MAXIMO
+
+aplicar_migraciones()
+inicializar_revisiones()
 
 app = FastAPI()
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
 # --- CORS ---
 origenes_permitidos = [
     "http://localhost:5173",
@@ -47,80 +54,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ENCABEZADO_CURSOR, "ETag"],
 )
 
-# ---------------------------------------------------------
-# 🤖 NUEVA LÓGICA DE GOOGLE SHEETS (FILA ÚNICA CRM)
-# ---------------------------------------------------------
-
-def guardar_fila_maestra_sheets(orden, cliente, vehiculo, inspeccion):
-    """
-    Junta TODA la información (Cliente, Auto, Golpes, Checklist) en una sola fila.
-    Se ejecuta al final del proceso.
-    """
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-        client_sheets = gspread.authorize(creds)
-        
-        # ID DE TU HOJA DE CÁLCULO
-        SHEET_ID = "1y6nW9C8diwITs_lqpH6fjNlVuH90E4oiS5NTXfRm6kc" 
-        
-        doc = client_sheets.open_by_key(SHEET_ID)
-        
-        # --- LÓGICA DE DETECCIÓN DE PESTAÑA ---
-        # Intenta encontrar "Hoja 1", luego "Hoja1", y si falla, agarra la primera (índice 0)
-        try:
-            sheet = doc.worksheet("Hoja 1")
-        except:
-            try:
-                sheet = doc.worksheet("Hoja1")
-            except:
-                sheet = doc.get_worksheet(0)
-
-        print(f"📄 Escribiendo datos en la hoja: '{sheet.title}'")
-
-        # --- PREPARAMOS LA "MEGA FILA" ---
-        fila_maestra = [
-            # 1. IDENTIFICACIÓN
-            orden.folio_visual,           # Col A
-            str(orden.creado_en.date()),  # Col B
-            orden.estado,                 # Col C
-            orden.mecanico_asignado,      # Col D
-
-            # 2. CLIENTE
-            cliente.nombre_completo,      # Col E
-            cliente.telefono,             # Col F
-            cliente.email,                # Col G
-
-            # 3. VEHÍCULO
-            vehiculo.placas,              # Col H
-            f"{vehiculo.marca} {vehiculo.modelo}", # Col I
-            vehiculo.anio,                # Col J
-            vehiculo.color,               # Col K
-            
-            # 4. DATOS INICIALES Y GOLPES (DEL MAPA)
-            orden.kilometraje,            # Col L
-            f"{orden.nivel_gasolina}%",   # Col M
-            orden.lista_daños,            # Col N (🔴 GOLPES)
-            orden.notas_golpes,           # Col O (📝 NOTAS DE GOLPES)
-
-            # 5. RESULTADOS DEL CHECKLIST (INSPECCIÓN)
-            inspeccion.int_tablero_alertas, # Col P
-            inspeccion.mec_niveles_aceite,  # Col Q
-            inspeccion.ext_llantas,         # Col R
-            inspeccion.ext_pintura,         # Col S
-            inspeccion.observaciones        # Col T (Observaciones finales)
-        ]
-        
-        sheet.append_row(fila_maestra)
-        print(f"✅ ¡ÉXITO! Fila Maestra guardada correctamente en Sheets.")
-        
-    except Exception as e:
-        print(f"⚠️ ERROR CRÍTICO AL GUARDAR EN SHEETS: {e}")
-        traceback.print_exc()
-
-# ---------------------------------------------------------
+@app.exception_handler(NoModificado)
+def responder_no_modificado(request: Request, exc: NoModificado):
+    return Response(status_code=304, headers={"ETag": exc.etag, "Cache-Control": "no-cache"})
+
+# --- TAREAS EN SEGUNDO PLANO ---
+@app.on_event("startup")
+def iniciar_tareas_fondo():
+    # Sin gspread las filas se quedan en el outbox hasta que se instale
+    if sheets.gspread is not None and os.getenv("SHEETS_DESPACHADOR", "1") == "1":
+        despachador.iniciar()
+    broker.iniciar()
+    verificador_totales.iniciar()
+
+@app.on_event("shutdown")
+def detener_tareas_fondo():
+    despachador.detener()
+    broker.detener()
+    verificador_totales.detener()
+    pool_hashing.cerrar()
 
 @app.get("/")
 def read_root():
@@ -129,9 +84,7 @@ def read_root():
 # --- 1. CLIENTES ---
 @app.post("/clientes/", response_model=schemas.ClienteResponse)
 def crear_cliente(cliente: schemas.ClienteCreate, db: Session = Depends(get_db)):
-    telefono_limpio = "".join(filter(str.isdigit, cliente.telefono))
-    if len(telefono_limpio) == 10:
-        telefono_limpio = "52" + telefono_limpio
+    telefono_limpio = normalizar_telefono(cliente.telefono)
     
     nuevo_cliente = models.Cliente(
         nombre_completo=cliente.nombre_completo,
@@ -145,9 +98,27 @@ def crear_cliente(cliente: schemas.ClienteCreate, db: Session = Depends(get_db))
     db.refresh(nuevo_cliente)
     return nuevo_cliente
 
-@app.get("/clientes/", response_model=List[schemas.ClienteResponse])
-def leer_clientes(db: Session = Depends(get_db)):
-    return db.query(models.Cliente).all()
+@app.get("/clientes/", response_model=List[schemas.ClienteResponse], dependencies=[Depends(etag_para("clientes"))])
+def leer_clientes(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return paginar(db.query(models.Cliente), models.Cliente.id, response, limit, after)
+
+@app.get("/clientes/{cliente_id}", response_model=schemas.ClienteResponse)
+def leer_cliente(cliente_id: int, db: Session = Depends(get_db)):
+    cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
+    if not cliente:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return cliente
+
+@app.get("/buscar", response_model=schemas.BusquedaResponse)
+def buscar_clientes_vehiculos(q: str = Query(..., min_length=2), limite: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """Búsqueda para recepción: nombre parcial, teléfono, placas o VIN."""
+    clientes, vehiculos = buscar(db, q, limite)
+    return {"clientes": clientes, "vehiculos": vehiculos}
 
 # --- 2. VEHÍCULOS ---
 @app.post("/vehiculos/", response_model=schemas.VehiculoResponse)
@@ -165,16 +136,25 @@ def crear_vehiculo(vehiculo: schemas.VehiculoCreate, db: Session = Depends(get_d
     db.refresh(nuevo_vehiculo)
     return nuevo_vehiculo
 
-@app.get("/vehiculos/", response_model=List[schemas.VehiculoResponse])
-def leer_vehiculos(db: Session = Depends(get_db)):
-    return db.query(models.Vehiculo).all()
+@app.get("/vehiculos/", response_model=List[schemas.VehiculoResponse], dependencies=[Depends(etag_para("vehiculos"))])
+def leer_vehiculos(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    cliente_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Vehiculo)
+    if cliente_id is not None:
+        query = query.filter(models.Vehiculo.cliente_id == cliente_id)
+    return paginar(query, models.Vehiculo.id, response, limit, after)
 
 # --- SERVICIOS ---
 @app.get("/servicios/", response_model=list[schemas.Servicio])
-def obtener_servicios(db: Session = Depends(get_db)):
-    return db.query(models.Servicio).all()
+def obtener_servicios(request: Request):
+    return catalogos.respuesta("servicios", request)
 
-@app.post("/servicios/", response_model=schemas.Servicio)
+@app.post("/servicios/", response_model=schemas.Servicio, dependencies=[Depends(requerir_permiso("ver_config"))])
 def crear_servicio(servicio: schemas.ServicioCreate, db: Session = Depends(get_db)):
     nuevo_servicio = models.Servicio(
         nombre=servicio.nombre,
@@ -186,19 +166,14 @@ def crear_servicio(servicio: schemas.ServicioCreate, db: Session = Depends(get_d
     db.refresh(nuevo_servicio)
     return nuevo_servicio
 
-@app.put("/servicios/{servicio_id}", response_model=schemas.Servicio)
+@app.put("/servicios/{servicio_id}", response_model=schemas.Servicio, dependencies=[Depends(requerir_permiso("ver_config"))])
 def actualizar_servicio(servicio_id: int, servicio_actualizado: schemas.ServicioCreate, db: Session = Depends(get_db)):
-    servicio = db.query(models.Servicio).filter(models.Servicio.id == servicio_id).first()
-    if not servicio:
-        raise HTTPException(status_code=404, detail="Servicio no encontrado")
-    servicio.nombre = servicio_actualizado.nombre
-    servicio.precio_sugerido = servicio_actualizado.precio_sugerido
-    servicio.es_favorito = servicio_actualizado.es_favorito 
+    servicio = editar_servicio(db, servicio_id, servicio_actualizado)
     db.commit()
     db.refresh(servicio)
     return servicio
 
-@app.delete("/servicios/{servicio_id}")
+@app.delete("/servicios/{servicio_id}", dependencies=[Depends(requerir_permiso("ver_config"))])
 def eliminar_servicio(servicio_id: int, db: Session = Depends(get_db)):
     servicio = db.query(models.Servicio).filter(models.Servicio.id == servicio_id).first()
     if not servicio:
@@ -237,6 +212,7 @@ def crear_orden(orden: schemas.OrdenCreate, db: Session = Depends(get_db)):
     # Generar folio visual
     folio = f"OS-2025-{str(nueva_orden.id).zfill(6)}"
     nueva_orden.folio_visual = folio
+    notificar_orden(db, nueva_orden, "creada")
     db.commit()
 
     # 🛑 AQUÍ QUITAMOS EL ENVÍO A SHEETS. 
@@ -245,10 +221,31 @@ def crear_orden(orden: schemas.OrdenCreate, db: Session = Depends(get_db)):
     return nueva_orden
 
 @app.get("/ordenes/", response_model=List[schemas.OrdenResponse])
-def leer_ordenes(db: Session = Depends(get_db)):
-    return db.query(models.Orden).all()
-
-@app.put("/ordenes/{orden_id}/estado")
+def leer_ordenes(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    estado: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    sucursal_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # Con limit/after se pagina de la más nueva a la más vieja
+    query = query_ordenes(db)
+    if estado:
+        query = query.filter(models.Orden.estado.in_(estado.split(",")))
+    if sucursal_id is not None:
+        query = query.filter(models.Orden.sucursal_id == sucursal_id)
+    query = query.filter(*rango_fechas(models.Orden.creado_en, desde, hasta))
+    return paginar(query, models.Orden.id, response, limit, after, descendente=True)
+
+@app.get("/ordenes/cambios", response_model=schemas.CambiosOrdenesResponse)
+def cambios_ordenes(token: Optional[str] = None, db: Session = Depends(get_db)):
+    """Solo las órdenes creadas o modificadas desde `token` (sin token: todas)."""
+    return calcular_cambios(db, query_ordenes(db), token)
+
+@app.put("/ordenes/{orden_id}/estado", dependencies=[Depends(requerir_permiso("ver_taller", "ver_recepcion"))])
 def actualizar_estado_orden(orden_id: int, nuevo_estado: str, db: Session = Depends(get_db)):
     orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
     if not orden:
@@ -262,6 +259,7 @@ def actualizar_estado_orden(orden_id: int, nuevo_estado: str, db: Session = Depe
         raise HTTPException(status_code=400, detail="Debes asignar un mecánico antes de pasar a reparación.")
 
     orden.estado = nuevo_estado
+    notificar_orden(db, orden, "estado")
     db.commit()
     db.refresh(orden)
     return {"mensaje": "Estado actualizado", "nuevo_estado": orden.estado}
@@ -273,7 +271,7 @@ class CobroSchema(BaseModel):
     referencia: str = None 
     usuario_id: int = 1    
 
-@app.put("/ordenes/{orden_id}/cobrar")
+@app.put("/ordenes/{orden_id}/cobrar", dependencies=[Depends(requerir_permiso("ver_caja"))])
 def cobrar_orden(orden_id: int, cobro: CobroSchema, db: Session = Depends(get_db)):
     orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
     if not orden:
@@ -305,6 +303,8 @@ def cobrar_orden(orden_id: int, cobro: CobroSchema, db: Session = Depends(get_db
         ip_origen="Caja" 
     )
     db.add(nueva_auditoria)
+    registrar_orden_cobrada(db, orden)
+    notificar_orden(db, orden, "cobrada")
 
     try:
         db.commit()
@@ -317,10 +317,22 @@ def cobrar_orden(orden_id: int, cobro: CobroSchema, db: Session = Depends(get_db
 
 # --- 4. CONFIGURACIÓN (CATÁLOGOS) ---
 @app.get("/config/fallas-comunes")
-def obtener_catalogo_fallas(db: Session = Depends(get_db)):
-    return db.query(models.CatFalla).filter(models.CatFalla.activo == True).all()
+def obtener_catalogo_fallas(request: Request):
+    return catalogos.respuesta("fallas_comunes", request)
 
-@app.post("/config/fallas-comunes")
+@app.get("/config/sistemas")
+def obtener_catalogo_sistemas(request: Request):
+    return catalogos.respuesta("sistemas", request)
+
+@app.get("/config/metodos-pago")
+def obtener_metodos_pago(request: Request):
+    return catalogos.respuesta("metodos_pago", request)
+
+@app.get("/config/estados-orden")
+def obtener_estados_orden(request: Request):
+    return catalogos.respuesta("estados_orden", request)
+
+@app.post("/config/fallas-comunes", dependencies=[Depends(requerir_permiso("ver_config"))])
 def crear_falla(falla: schemas.FallaCreate, db: Session = Depends(get_db)):
     try:
         nueva_falla = models.CatFalla(
@@ -338,7 +350,7 @@ def crear_falla(falla: schemas.FallaCreate, db: Session = Depends(get_db)):
         guardar_error_log("Crear Falla Común", error_completo)
         raise HTTPException(status_code=500, detail="Error al guardar. Revisa logs.")
 
-@app.put("/config/fallas-comunes/{id}")
+@app.put("/config/fallas-comunes/{id}", dependencies=[Depends(requerir_permiso("ver_config"))])
 def actualizar_falla(id: int, falla: schemas.FallaCreate, db: Session = Depends(get_db)):
     falla_db = db.query(models.CatFalla).filter(models.CatFalla.id == id).first()
     if not falla_db:
@@ -348,7 +360,7 @@ def actualizar_falla(id: int, falla: schemas.FallaCreate, db: Session = Depends(
     db.commit()
     return {"mensaje": "Falla actualizada correctamente"}
 
-@app.delete("/config/fallas-comunes/{id}")
+@app.delete("/config/fallas-comunes/{id}", dependencies=[Depends(requerir_permiso("ver_config"))])
 def borrar_falla(id: int, db: Session = Depends(get_db)):
     falla = db.query(models.CatFalla).filter(models.CatFalla.id == id).first()
     if not falla:
@@ -358,7 +370,7 @@ def borrar_falla(id: int, db: Session = Depends(get_db)):
     return {"mensaje": "Falla eliminada"}
 
 # --- 5. DIAGNÓSTICO Y REFACCIONES ---
-@app.post("/ordenes/{orden_id}/diagnostico")
+@app.post("/ordenes/{orden_id}/diagnostico", dependencies=[Depends(requerir_permiso("ver_taller"))])
 def guardar_diagnostico(orden_id: int, diagnostico: schemas.DetalleDiagnosticoCreate, db: Session = Depends(get_db)):
     orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
     if not orden:
@@ -367,104 +379,130 @@ def guardar_diagnostico(orden_id: int, diagnostico: schemas.DetalleDiagnosticoCr
     if orden.estado == "recibido":
         orden.estado = "diagnostico"
 
-    contador = 0
-    for falla_id in diagnostico.fallas_ids:
-        falla_info = db.query(models.CatFalla).filter(models.CatFalla.id == falla_id).first()
-        if falla_info:
-            nuevo_detalle = models.OrdenDetalle(
-                orden_id=orden_id,
-                sistema_origen="Diagnóstico Rápido",
-                falla_detectada=falla_info.nombre_falla,
-                precio=falla_info.precio_sugerido,
-                tipo="falla",
-                estado="pendiente" 
-            )
-            db.add(nuevo_detalle)
-            contador += 1
-            
+    lineas = lineas_de_fallas(db, orden_id, diagnostico.fallas_ids)
+    contador = len(lineas)
     if diagnostico.nota_libre and diagnostico.nota_libre.strip():
-        nota_detalle = models.OrdenDetalle(
-            orden_id=orden_id,
-            sistema_origen="Nota General",
-            falla_detectada=diagnostico.nota_libre,
-            precio=0.0,
-            tipo="nota",
-            estado="informativo"
-        )
-        db.add(nota_detalle)
-    
+        lineas.append(linea_nota(orden_id, diagnostico.nota_libre))
+    insertar_lineas(db, orden_id, lineas)
+
     db.commit()
     return {"mensaje": "Diagnóstico guardado", "items_agregados": contador}
 
-@app.post("/ordenes/{orden_id}/refacciones")
+@app.post("/ordenes/{orden_id}/refacciones", dependencies=[Depends(requerir_permiso("ver_taller"))])
 def agregar_refaccion(orden_id: int, refaccion: schemas.RefaccionCreate, db: Session = Depends(get_db)):
     orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
-    precio_final = refaccion.precio_unitario
-    if refaccion.traido_por_cliente:
-        precio_final = 0.0
-
-    nueva_refaccion = models.OrdenDetalle(
-        orden_id=orden_id,
-        sistema_origen="Refacciones",
-        falla_detectada=refaccion.nombre_pieza,
-        precio=precio_final,
-        tipo="refaccion",
-        estado="pendiente",
-        es_refaccion_cliente=refaccion.traido_por_cliente
-    )
-    db.add(nueva_refaccion)
+    insertar_lineas(db, orden_id, [linea_refaccion(orden_id, refaccion)])
     db.commit()
     return {"mensaje": "Refacción agregada"}
 
+@app.post("/ordenes/{orden_id}/presupuesto", dependencies=[Depends(requerir_permiso("ver_taller"))])
+def guardar_presupuesto(orden_id: int, presupuesto: schemas.PresupuestoLote, db: Session = Depends(get_db)):
+    """Fallas del catálogo, refacciones, nota y cambios de precio/estado en una sola llamada y una sola transacción."""
+    orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
+    if not orden:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+
+    # Primero los cambios: si alguno apunta a un detalle ajeno, no se agrega nada
+    actualizados = aplicar_cambios(db, orden_id, presupuesto.cambios)
+
+    lineas = lineas_de_fallas(db, orden_id, presupuesto.fallas_ids)
+    fallas = len(lineas)
+    lineas += [linea_refaccion(orden_id, r) for r in presupuesto.refacciones]
+    if presupuesto.nota_libre and presupuesto.nota_libre.strip():
+        lineas.append(linea_nota(orden_id, presupuesto.nota_libre))
+    if lineas and orden.estado == "recibido":
+        orden.estado = "diagnostico"
+    insertar_lineas(db, orden_id, lineas)
+
+    db.commit()
+    return {
+        "mensaje": "Presupuesto guardado",
+        "items_agregados": fallas,
+        "refacciones_agregadas": len(presupuesto.refacciones),
+        "detalles_actualizados": actualizados,
+    }
+
 @app.get("/ordenes/{orden_id}/detalles", response_model=List[schemas.OrdenDetalleResponse])
 def ver_detalles_orden(orden_id: int, db: Session = Depends(get_db)):
     detalles = db.query(models.OrdenDetalle).filter(models.OrdenDetalle.orden_id == orden_id).order_by(models.OrdenDetalle.id.asc()).all()
     return detalles
 
-@app.put("/ordenes/detalles/{detalle_id}")
+@app.get("/ordenes/{orden_id}/expediente", response_model=schemas.ExpedienteOrdenResponse)
+def ver_expediente_orden(orden_id: int, db: Session = Depends(get_db)):
+    """Todo lo que Caja y Diagnóstico necesitan de una orden en una sola llamada."""
+    expediente = cargar_expediente(db, orden_id)
+    if not expediente:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+    return expediente
+
+@app.put("/ordenes/detalles/{detalle_id}", dependencies=[Depends(requerir_permiso("ver_taller", "ver_caja"))])
 def actualizar_precio_detalle(detalle_id: int, datos: schemas.DetallePrecioUpdate, db: Session = Depends(get_db)):
-    detalle = db.query(models.OrdenDetalle).filter(models.OrdenDetalle.id == detalle_id).first()
-    if not detalle:
-        raise HTTPException(status_code=404, detail="Detalle no encontrado")
-    detalle.precio = datos.nuevo_precio
+    resultado = cambiar_precio_detalle(db, detalle_id, datos.nuevo_precio)
     db.commit()
-    return {"mensaje": "Precio actualizado"}
+    return resultado
 
-@app.put("/ordenes/detalles/{detalle_id}/estado")
+@app.put("/ordenes/detalles/{detalle_id}/estado", dependencies=[Depends(requerir_permiso("ver_taller"))])
 def actualizar_estado_detalle(detalle_id: int, datos: schemas.EstadoDetalleUpdate, db: Session = Depends(get_db)):
-    detalle = db.query(models.OrdenDetalle).filter(models.OrdenDetalle.id == detalle_id).first()
-    if not detalle:
-        raise HTTPException(status_code=404, detail="Detalle no encontrado")
-    
-    detalle.estado = datos.estado
+    resultado = cambiar_estado_detalle(db, detalle_id, datos.estado)
     db.commit()
-    return {"mensaje": "Estado actualizado", "nuevo_estado": detalle.estado}
+    return resultado
+
+@app.post("/batch")
+def ejecutar_operaciones(lote: schemas.LoteOperaciones, db: Session = Depends(get_db), usuario: Optional[Principal] = Depends(get_current_user)):
+    """Varias operaciones (estado/precio de detalles, mover órdenes, editar servicios) en un viaje y un commit."""
+    # Se revisa todo el lote antes de correr nada
+    for op in lote.operaciones:
+        revisar_permiso(usuario, *PERMISOS_OPERACION[op.tipo])
+    return ejecutar_lote(db, lote.operaciones, lote.atomico)
 
 # --- 6. ZONA DE SEGURIDAD ---
 
+# Estos endpoints son async: mientras bcrypt corre en el pool de procesos no
+# ocupan un hilo del threadpool. Lo que toca la BD sí va al threadpool.
+
+def _buscar_usuario(db, **filtro):
+    """Busca y suelta la transacción: bcrypt tarda y no debe quedar abierta mientras tanto."""
+    usuario = db.query(models.Usuario).filter_by(**filtro).first()
+    if usuario is not None:
+        db.expunge(usuario)
+    db.rollback()
+    return usuario
+
+def _guardar_hash(db, usuario_id, password_hash):
+    db.query(models.Usuario).filter(models.Usuario.id == usuario_id).update(
+        {"password_hash": password_hash}, synchronize_session=False
+    )
+    db.commit()
+
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    usuario = db.query(models.Usuario).filter(models.Usuario.username == form_data.username).first()
-    if not usuario or not auth.verify_password(form_data.password, usuario.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    usuario = await run_in_threadpool(_buscar_usuario, db, username=form_data.username)
+    if not usuario:
+        raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
+    valida, hash_nuevo = await pool_hashing.verificar(form_data.password, usuario.password_hash)
+    if not valida:
         raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
     if not usuario.activo:
          raise HTTPException(status_code=400, detail="Usuario inactivo")
 
-    access_token = auth.create_access_token(data={"sub": usuario.username})
-    return {
-        "access_token": access_token, 
+    respuesta = {
+        "access_token": auth.create_access_token(data={"sub": usuario.username}),
         "token_type": "bearer",
         "username": usuario.username,
         "rol": usuario.rol,
         "permisos": usuario.permisos
     }
-
-@app.post("/usuarios/", response_model=schemas.UsuarioResponse)
-def crear_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.Usuario).filter(models.Usuario.username == usuario.username).first()
+    if hash_nuevo:
+        # Cambió BCRYPT_ROUNDS: aprovechamos que tenemos la contraseña para rehacer el hash
+        await run_in_threadpool(_guardar_hash, db, usuario.id, hash_nuevo)
+    return respuesta
+
+@app.post("/usuarios/", response_model=schemas.UsuarioResponse, dependencies=[Depends(requerir_permiso("admin_usuarios"))])
+async def crear_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_buscar_usuario, db, username=usuario.username)
     if db_user:
         raise HTTPException(status_code=400, detail="El nombre de usuario ya existe")
     
@@ -473,7 +511,7 @@ def crear_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db))
     else:
         permisos_str = str(usuario.permisos)
 
-    hashed_password = auth.get_password_hash(usuario.password)
+    hashed_password = await pool_hashing.hashear(usuario.password)
     nuevo_usuario = models.Usuario(
         nombre=usuario.nombre,
         username=usuario.username,
@@ -484,15 +522,28 @@ def crear_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db))
         activo=True
     )
     db.add(nuevo_usuario)
-    db.commit()
-    db.refresh(nuevo_usuario)
+    await run_in_threadpool(db.commit)
+    await run_in_threadpool(db.refresh, nuevo_usuario)
     return nuevo_usuario
 
-@app.get("/usuarios/", response_model=List[schemas.UsuarioResponse])
-def leer_usuarios(db: Session = Depends(get_db)):
-    return db.query(models.Usuario).filter(models.Usuario.activo == True).all()
-
-@app.put("/usuarios/{user_id}")
+# Sin permiso especial: recepción y el tablero la usan para elegir mecánico
+@app.get("/usuarios/", response_model=List[schemas.UsuarioResponse], dependencies=[Depends(etag_para("usuarios"))])
+def leer_usuarios(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Usuario).filter(models.Usuario.activo == True)
+    return paginar(query, models.Usuario.id, response, limit, after)
+
+@app.get("/usuarios/me")
+def usuario_actual(usuario: Optional[Principal] = Depends(get_current_user)):
+    if usuario is None:
+        raise HTTPException(status_code=401, detail="Falta iniciar sesión", headers={"WWW-Authenticate": "Bearer"})
+    return usuario.como_dict()
+
+@app.put("/usuarios/{user_id}", dependencies=[Depends(requerir_permiso("admin_usuarios"))])
 def editar_usuario(user_id: int, datos: schemas.UsuarioUpdate, db: Session = Depends(get_db)):
     usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
     if not usuario:
@@ -504,9 +555,10 @@ def editar_usuario(user_id: int, datos: schemas.UsuarioUpdate, db: Session = Dep
     usuario.permisos = ",".join(datos.permisos)
     
     db.commit()
+    principales.invalidar_usuario(usuario.username)
     return {"mensaje": "Usuario actualizado"}
 
-@app.delete("/usuarios/{user_id}")
+@app.delete("/usuarios/{user_id}", dependencies=[Depends(requerir_permiso("admin_usuarios"))])
 def eliminar_usuario(user_id: int, db: Session = Depends(get_db)):
     usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
     if not usuario:
@@ -514,18 +566,24 @@ def eliminar_usuario(user_id: int, db: Session = Depends(get_db)):
     
     usuario.activo = False
     db.commit()
+    principales.invalidar_usuario(usuario.username)
     return {"mensaje": "Usuario eliminado correctamente"}
 
-@app.put("/usuarios/{user_id}/reset-password")
-def reset_password(user_id: int, nueva_pass: str, db: Session = Depends(get_db)):
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+@app.put("/usuarios/{user_id}/reset-password", dependencies=[Depends(requerir_permiso("admin_usuarios"))])
+async def reset_password(user_id: int, nueva_pass: str, db: Session = Depends(get_db)):
+    usuario = await run_in_threadpool(_buscar_usuario, db, id=user_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    usuario.password_hash = auth.get_password_hash(nueva_pass)
-    db.commit()
+    await run_in_threadpool(_guardar_hash, db, usuario.id, await pool_hashing.hashear(nueva_pass))
+    principales.invalidar_usuario(usuario.username)
     return {"mensaje": "Contraseña actualizada correctamente"}
 
+@app.get("/seguridad/hashing", dependencies=[Depends(requerir_permiso("ver_config"))])
+def metricas_hashing():
+    """Cola del pool de bcrypt: pendientes, rechazadas (503) y tiempos."""
+    return pool_hashing.metricas()
+
 # --- RUTAS INSPECCIÓN (AQUÍ ES DONDE AHORA SE ENVÍA A SHEETS) ---
 @app.post("/inspeccion/", response_model=schemas.InspeccionResponse)
 def crear_inspeccion(inspeccion: schemas.InspeccionCreate, db: Session = Depends(get_db)):
@@ -534,22 +592,26 @@ def crear_inspeccion(inspeccion: schemas.InspeccionCreate, db: Session = Depends
         raise HTTPException(status_code=404, detail="La orden para esta inspección no existe")
     
     nueva_inspeccion = models.InspeccionRecepcion(**inspeccion.model_dump())
-    
     db.add(nueva_inspeccion)
-    db.commit()
-    db.refresh(nueva_inspeccion)
-    
-    # 🚀 DISPARAMOS EL ENVÍO MAESTRO A SHEETS (CRM COMPLETO)
-    # Buscamos los datos completos necesarios
+
+    # 📬 LA FILA MAESTRA PARA SHEETS (CRM COMPLETO) VA AL OUTBOX
+    # Se guarda en la misma transacción que la inspección; el despachador la manda después.
     cliente = db.query(models.Cliente).filter(models.Cliente.id == orden.cliente_id).first()
     vehiculo = db.query(models.Vehiculo).filter(models.Vehiculo.id == orden.vehiculo_id).first()
 
+    en_outbox = False
     if cliente and vehiculo:
-        print(f"🚀 Iniciando envío a Google Sheets para la orden: {orden.folio_visual}")
-        guardar_fila_maestra_sheets(orden, cliente, vehiculo, nueva_inspeccion)
+        encolar_fila_maestra(db, orden, cliente, vehiculo, nueva_inspeccion)
+        en_outbox = True
     else:
         print("⚠️ No se pudo enviar a Sheets: Datos de cliente o vehículo incompletos.")
-    
+
+    db.commit()
+    db.refresh(nueva_inspeccion)
+
+    if en_outbox:
+        despachador.despertar()
+
     return nueva_inspeccion
 
 @app.get("/inspeccion/{orden_id}", response_model=schemas.InspeccionResponse)
@@ -565,56 +627,56 @@ def obtener_inspeccion(orden_id: int, db: Session = Depends(get_db)):
 from sqlalchemy import func
 
 # 1. PREVISUALIZAR CIERRE
-@app.get("/cierres/hoy")
-def previsualizar_cierre(db: Session = Depends(get_db)):
-    movimientos = db.query(models.MovimientoCaja).filter(
-        models.MovimientoCaja.cierre_diario_id == None
-    ).all()
-
-    total_efectivo = sum(m.monto for m in movimientos if m.metodo_pago == "Efectivo" and m.tipo == "INGRESO")
-    total_tarjeta = sum(m.monto for m in movimientos if m.metodo_pago == "Tarjeta" and m.tipo == "INGRESO")
-    total_transfer = sum(m.monto for m in movimientos if m.metodo_pago == "Transferencia" and m.tipo == "INGRESO")
-    total_gastos = sum(m.monto for m in movimientos if m.tipo == "EGRESO")
+@app.get("/cierres/hoy", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def previsualizar_cierre(verificar: bool = False, db: Session = Depends(get_db)):
+    # Se lee de caja_acumulados; con ?verificar=true además se recalcula desde los movimientos
+    totales = totales_acumulados(db)
 
-    return {
+    respuesta = {
         "fecha": datetime.now(),
-        "total_efectivo": total_efectivo,
-        "total_tarjeta": total_tarjeta,
-        "total_transferencia": total_transfer,
-        "total_ingresos": total_efectivo + total_tarjeta + total_transfer,
-        "total_gastos": total_gastos,
-        "movimientos_pendientes": len(movimientos)
+        "total_efectivo": totales["total_efectivo"],
+        "total_tarjeta": totales["total_tarjeta"],
+        "total_transferencia": totales["total_transferencia"],
+        "total_ingresos": totales["total_ingresos"],
+        "total_gastos": totales["total_gastos"],
+        "movimientos_pendientes": totales["movimientos"]
     }
+    if verificar:
+        diferencias = verificar_acumulados(db)
+        respuesta["cuadra"] = not diferencias
+        respuesta["diferencias"] = diferencias
+    return respuesta
 
 # 2. EJECUTAR CIERRE DIARIO
-@app.post("/cierres/diario")
+@app.post("/cierres/diario", dependencies=[Depends(requerir_permiso("ver_caja"))])
 def ejecutar_cierre_diario(usuario_id: int = 1, db: Session = Depends(get_db)):
-    movimientos = db.query(models.MovimientoCaja).filter(
-        models.MovimientoCaja.cierre_diario_id == None
-    ).all()
+    grupos = grupos_caja(db, models.MovimientoCaja.cierre_diario_id == None)
+    totales = totales_de_grupos(grupos)
 
-    if not movimientos:
+    if not totales["movimientos"]:
         raise HTTPException(status_code=400, detail="No hay movimientos pendientes para cerrar.")
 
-    efectivo = sum(m.monto for m in movimientos if m.metodo_pago == "Efectivo" and m.tipo == "INGRESO")
-    tarjeta = sum(m.monto for m in movimientos if m.metodo_pago == "Tarjeta" and m.tipo == "INGRESO")
-    transfer = sum(m.monto for m in movimientos if m.metodo_pago == "Transferencia" and m.tipo == "INGRESO")
-    gastos = sum(m.monto for m in movimientos if m.tipo == "EGRESO")
-
     nuevo_cierre = models.CierreDiario(
-        total_efectivo=efectivo,
-        total_tarjeta=tarjeta,
-        total_transferencia=transfer,
-        total_ingresos=(efectivo + tarjeta + transfer),
-        total_gastos=gastos,
-        saldo_final=(efectivo + tarjeta + transfer) - gastos,
+        total_efectivo=totales["total_efectivo"],
+        total_tarjeta=totales["total_tarjeta"],
+        total_transferencia=totales["total_transferencia"],
+        total_ingresos=totales["total_ingresos"],
+        total_gastos=totales["total_gastos"],
+        saldo_final=totales["saldo_final"],
         usuario_responsable_id=usuario_id
     )
     db.add(nuevo_cierre)
     db.flush()
 
-    for mov in movimientos:
-        mov.cierre_diario_id = nuevo_cierre.id
+    marcados = cerrar_movimientos(db, nuevo_cierre.id, totales["max_id"])
+    if marcados != totales["movimientos"]:
+        # Se coló un cobro de otra transacción con id menor: el cierre refleja lo que realmente marcó
+        grupos = grupos_caja(db, models.MovimientoCaja.cierre_diario_id == nuevo_cierre.id)
+        totales = totales_de_grupos(grupos)
+        for campo in ("total_efectivo", "total_tarjeta", "total_transferencia", "total_ingresos", "total_gastos", "saldo_final"):
+            setattr(nuevo_cierre, campo, totales[campo])
+    descontar_cerrados(db, grupos)
+    nuevo_cierre.ordenes_cobradas = ordenes_en_cierre(db, nuevo_cierre.id)
     
     auditoria = models.Auditoria(
         usuario_id=usuario_id,
@@ -631,11 +693,10 @@ def ejecutar_cierre_diario(usuario_id: int = 1, db: Session = Depends(get_db)):
 # 📅 CIERRE MENSUAL
 # ==========================================
 
-@app.get("/cierres/mensual/estado")
+@app.get("/cierres/mensual/estado", dependencies=[Depends(requerir_permiso("ver_caja"))])
 def verificar_estado_mensual(db: Session = Depends(get_db)):
     hoy = datetime.now()
-    config_corte = db.query(models.Configuracion).filter(models.Configuracion.clave == "DIA_CORTE_MENSUAL").first()
-    dia_corte = int(config_corte.valor) if config_corte else 28
+    dia_corte = int(catalogos.valor_configuracion("DIA_CORTE_MENSUAL") or 28)
 
     cierre_existente = db.query(models.CierreMensual).filter(
         models.CierreMensual.mes == hoy.month,
@@ -657,7 +718,7 @@ def verificar_estado_mensual(db: Session = Depends(get_db)):
 
     return {"estado": "DISPONIBLE", "mensaje": "Listo para generar el Cierre Mensual."}
 
-@app.post("/cierres/mensual")
+@app.post("/cierres/mensual", dependencies=[Depends(requerir_permiso("ver_caja"))])
 def ejecutar_cierre_mensual(usuario_id: int = 1, db: Session = Depends(get_db)):
     estado = verificar_estado_mensual(db)
     if estado["estado"] != "DISPONIBLE":
@@ -668,7 +729,8 @@ def ejecutar_cierre_mensual(usuario_id: int = 1, db: Session = Depends(get_db)):
         mes=hoy.month,
         anio=hoy.year,
         usuario_responsable_id=usuario_id,
-        estado="cerrado"
+        estado="cerrado",
+        **resumen_mensual(db, hoy.year, hoy.month)
     )
     db.add(nuevo_mensual)
     
@@ -688,10 +750,10 @@ def ejecutar_cierre_mensual(usuario_id: int = 1, db: Session = Depends(get_db)):
 # ==========================================
 
 @app.get("/config/", response_model=list[schemas.Configuracion])
-def obtener_configuraciones(db: Session = Depends(get_db)):
-    return db.query(models.Configuracion).all()
+def obtener_configuraciones(request: Request):
+    return catalogos.respuesta("configuracion", request)
 
-@app.post("/config/")
+@app.post("/config/", dependencies=[Depends(requerir_permiso("ver_config"))])
 def guardar_configuracion(config: schemas.ConfigCreate, db: Session = Depends(get_db)):
     existente = db.query(models.Configuracion).filter(models.Configuracion.clave == config.clave).first()
     
@@ -711,24 +773,126 @@ def guardar_configuracion(config: schemas.ConfigCreate, db: Session = Depends(ge
 # 📊 MÓDULO DE REPORTES AVANZADOS
 # ==========================================
 
-@app.get("/reportes/financiero")
-def reporte_financiero(fecha_inicio: str = None, fecha_fin: str = None, db: Session = Depends(get_db)):
-    query = db.query(models.MovimientoCaja)
-    
+@app.get("/reportes/financiero", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def reporte_financiero(
+    fecha_inicio: str = None,
+    fecha_fin: str = None,
+    formato: Optional[str] = Query(None, alias="format", pattern="^(json|csv|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    filtros = []
     if fecha_inicio and fecha_fin:
         inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d")
         fin = datetime.strptime(fecha_fin, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
-        query = query.filter(models.MovimientoCaja.fecha >= inicio, models.MovimientoCaja.fecha <= fin)
-    
-    movimientos = query.order_by(models.MovimientoCaja.fecha.desc()).all()
+        filtros = [models.MovimientoCaja.fecha >= inicio, models.MovimientoCaja.fecha <= fin]
+
+    # 📤 Exportación grande (contador): se manda en streaming, fila por fila
+    if formato in TIPOS_CONTENIDO:
+        nombre = f"movimientos_{fecha_inicio or 'todo'}_{fecha_fin or 'todo'}.{formato}"
+        return StreamingResponse(
+            stream_movimientos(filtros, formato),
+            media_type=TIPOS_CONTENIDO[formato],
+            headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+        )
+
+    movimientos = db.query(models.MovimientoCaja).filter(*filtros).order_by(models.MovimientoCaja.fecha.desc()).all()
     return movimientos
 
-@app.get("/reportes/auditoria")
+@app.get("/reportes/tendencias-mensuales", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def reporte_tendencias_mensuales(desde_anio: Optional[int] = None, hasta_anio: Optional[int] = None, db: Session = Depends(get_db)):
+    """Serie mes a mes (varios años) leída solo de los cierres mensuales, sin tocar movimientos."""
+    C = models.CierreMensual
+    query = db.query(C)
+    if desde_anio:
+        query = query.filter(C.anio >= desde_anio)
+    if hasta_anio:
+        query = query.filter(C.anio <= hasta_anio)
+
+    return [
+        {
+            "anio": c.anio,
+            "mes": c.mes,
+            "total_efectivo": c.total_efectivo or 0.0,
+            "total_tarjeta": c.total_tarjeta or 0.0,
+            "total_transferencia": c.total_transferencia or 0.0,
+            "total_ingresos": c.total_ingresos or 0.0,
+            "total_gastos": c.total_gastos or 0.0,
+            "saldo_final": c.saldo_final or 0.0,
+            "ordenes_cobradas": c.ordenes_cobradas or 0,
+            "ticket_promedio": c.ticket_promedio or 0.0,
+        }
+        for c in query.order_by(C.anio.asc(), C.mes.asc())
+    ]
+
+@app.get("/reportes/series", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def reporte_series(
+    granularidad: str = Query("dia", pattern="^(" + "|".join(GRANULARIDADES) + ")$"),
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Ingresos, gastos, entregas, métodos de pago, mecánicos y tipos de trabajo por día/semana/mes."""
+    return calcular_series(db, granularidad, desde, hasta)
+
+@app.get("/reportes/analisis", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def reporte_analisis(
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    agrupar_por: str = Query("metodo_pago", pattern="^(" + "|".join(motor_reportes.AGRUPACIONES) + ")$"),
+    granularidad: str = Query("dia", pattern="^(" + "|".join(motor_reportes.GRANULARIDADES) + ")$"),
+    db: Session = Depends(get_db)
+):
+    """Análisis financiero vectorizado (sumas por grupo, percentiles, contra el periodo anterior). Por defecto: últimos 30 días."""
+    if not motor_reportes.disponible():
+        raise HTTPException(status_code=503, detail="El análisis requiere numpy instalado en el servidor")
+    try:
+        fecha_hasta = datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else datetime.now().date()
+        fecha_desde = datetime.strptime(desde, "%Y-%m-%d").date() if desde else fecha_hasta - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido, usa YYYY-MM-DD")
+    if fecha_desde > fecha_hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+    return motor_reportes.analizar(db.connection(), fecha_desde, fecha_hasta, agrupar_por, granularidad)
+
+# 🧱 Exportación a Parquet por día (para el contador / BI): corre en segundo plano y es incremental
+@app.post("/exportaciones/parquet", status_code=202, dependencies=[Depends(requerir_permiso("ver_caja"))])
+def iniciar_exportacion_parquet(background_tasks: BackgroundTasks, completo: bool = False):
+    if not exportacion_parquet.disponible():
+        raise HTTPException(status_code=503, detail="La exportación a Parquet requiere pyarrow instalado en el servidor")
+    if exportacion_parquet.en_curso():
+        raise HTTPException(status_code=409, detail="Ya hay una exportación en curso")
+    background_tasks.add_task(exportacion_parquet.exportar_en_fondo, completo)
+    return {"mensaje": "Exportación iniciada", "completo": completo}
+
+@app.get("/exportaciones/parquet", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def estado_exportacion_parquet():
+    return {
+        "disponible": exportacion_parquet.disponible(),
+        "en_curso": exportacion_parquet.en_curso(),
+        "ultima_corrida": exportacion_parquet.ultima_corrida or None,
+        "tablas": exportacion_parquet.particiones(),
+    }
+
+@app.get("/exportaciones/parquet/{tabla}/{fecha}", dependencies=[Depends(requerir_permiso("ver_caja"))])
+def descargar_particion_parquet(tabla: str, fecha: str):
+    if tabla not in exportacion_parquet.FUENTES:
+        raise HTTPException(status_code=404, detail="Tabla no exportable")
+    try:
+        datetime.strptime(fecha, "%Y-%m-%d")
+    except ValueError:
+        if fecha != exportacion_parquet.SIN_FECHA:
+            raise HTTPException(status_code=400, detail="Formato de fecha inválido, usa YYYY-MM-DD")
+    ruta = exportacion_parquet.ruta_particion(tabla, fecha)
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Esa partición no se ha exportado")
+    return FileResponse(ruta, media_type="application/vnd.apache.parquet", filename=f"{tabla}_{fecha}.parquet")
+
+@app.get("/reportes/auditoria", dependencies=[Depends(requerir_permiso("ver_config"))])
 def reporte_auditoria(limit: int = 100, db: Session = Depends(get_db)):
     logs = db.query(models.Auditoria).order_by(models.Auditoria.fecha.desc()).limit(limit).all()
     return logs
 
-@app.get("/reportes/estadisticas")
+@app.get("/reportes/estadisticas", dependencies=[Depends(requerir_permiso("ver_caja"))])
 def reporte_estadisticas(db: Session = Depends(get_db)):
     total_ventas = db.query(models.Orden).filter(models.Orden.estado == 'entregado').count()
     total_ingresos = db.query(func.sum(models.Orden.total_cobrado)).scalar() or 0
@@ -744,20 +908,42 @@ def reporte_estadisticas(db: Session = Depends(get_db)):
 
 @app.get("/taller/tablero", response_model=List[schemas.OrdenResponse]) 
 def tablero_kanban(db: Session = Depends(get_db)):
-    return db.query(models.Orden).filter(
-        models.Orden.estado.notin_(['entregado', 'cancelado'])
+    return query_ordenes(db).filter(
+        models.Orden.estado.notin_(ESTADOS_FUERA_TABLERO)
     ).all()
 
-@app.put("/taller/mover/{orden_id}")
-def mover_rapido(orden_id: int, nuevo_estado: str, db: Session = Depends(get_db)):
-    orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
-    if not orden:
-        raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
-    estados_validos = ['recibido', 'revisión', 'reparacion', 'espera_refacciones', 'listo', 'entregado']
-    if nuevo_estado not in estados_validos:
-        raise HTTPException(status_code=400, detail="Estado no válido")
+@app.get("/taller/tablero/cambios", response_model=schemas.CambiosOrdenesResponse)
+def tablero_cambios(token: Optional[str] = None, db: Session = Depends(get_db)):
+    """Delta del tablero: órdenes nuevas/movidas y las que salieron (bajas)."""
+    query = query_ordenes(db)
+    if not token:
+        query = query.filter(models.Orden.estado.notin_(ESTADOS_FUERA_TABLERO))
+    return calcular_cambios(db, query, token, solo_tablero=True)
 
-    orden.estado = nuevo_estado
+@app.get("/taller/eventos")
+async def tablero_eventos(request: Request):
+    """
+    Server-Sent Events: cada cambio de estado de una orden llega al instante.
+    El frontend se conecta con `new EventSource('/taller/eventos')`.
+    """
+    async def stream():
+        suscripcion = broker.suscribir()
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=15)
+                    yield formato_sse(evento)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # Mantiene viva la conexión a través de proxies
+        finally:
+            broker.cancelar(suscripcion)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.put("/taller/mover/{orden_id}", dependencies=[Depends(requerir_permiso("ver_taller"))])
+def mover_rapido(orden_id: int, nuevo_estado: str, db: Session = Depends(get_db)):
+    resultado = mover_orden(db, orden_id, nuevo_estado)
     db.commit()
-    return {"mensaje": f"Orden movida a {nuevo_estado}"}
\ No newline at end of file
+    return resultado
\ No newline at end of file
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+# Aseguramos que Python encuentre los módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from database import engine
+import models
+
+# ---------------------------------------------------------
+# 🧱 MIGRACIONES VERSIONADAS
+# create_all solo crea tablas nuevas: no agrega columnas ni índices a tablas
+# que ya existen. Cada migración corre UNA vez (queda anotada en
+# schema_migraciones) y además está escrita para poder repetirse sin romper.
+# Funcionan igual en SQLite (local) y Postgres (Render).
+# Cada una es SQL propio, congelado en su versión: no llama a caja.py,
+# resumenes.py ni a los modelos, para que siga corriendo igual aunque
+# el código de la app cambie después.
+#
+#   python migraciones.py   -> aplica lo pendiente y muestra el estado
+# ---------------------------------------------------------
+
+def columnas_de(conexion, tabla):
+    return {c["name"] for c in inspect(conexion).get_columns(tabla)}
+
+def agregar_columna(conexion, tabla, columna, tipo_sql, relleno_sql=None):
+    """ALTER TABLE ... ADD COLUMN solo si no existe; opcionalmente rellena las filas viejas."""
+    if columna in columnas_de(conexion, tabla):
+        return
+    conexion.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo_sql}"))
+    if relleno_sql:
+        conexion.execute(text(f"UPDATE {tabla} SET {columna} = {relleno_sql} WHERE {columna} IS NULL"))
+
+def crear_indice(conexion, nombre, tabla, columnas, where=None):
+    sql = f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"
+    if where:
+        sql += f" WHERE {where}"
+    conexion.execute(text(sql))
+
+# --- MIGRACIONES ---
+
+def m001_actualizado_en_ordenes(conexion, dialecto):
+    agregar_columna(conexion, "ordenes", "actualizado_en", "TIMESTAMP", relleno_sql="creado_en")
+    crear_indice(conexion, "ix_ordenes_actualizado_en", "ordenes", "actualizado_en")
+
+def m002_indices_consultas_frecuentes(conexion, dialecto):
+    crear_indice(conexion, "ix_ordenes_estado", "ordenes", "estado")
+    crear_indice(conexion, "ix_ordenes_cliente_id", "ordenes", "cliente_id")
+    crear_indice(conexion, "ix_ordenes_vehiculo_id", "ordenes", "vehiculo_id")
+    crear_indice(conexion, "ix_orden_detalles_orden_id", "orden_detalles", "orden_id")
+    crear_indice(conexion, "ix_movimientos_caja_cierre_diario_id", "movimientos_caja", "cierre_diario_id")
+    crear_indice(conexion, "ix_movimientos_caja_fecha", "movimientos_caja", "fecha")
+    crear_indice(conexion, "ix_auditoria_fecha", "auditoria", "fecha")
+    crear_indice(conexion, "ix_inspecciones_recepcion_orden_id", "inspecciones_recepcion", "orden_id")
+
+def m003_indices_parciales(conexion, dialecto):
+    # Índices chiquitos que solo contienen lo que las pantallas consultan
+    crear_indice(conexion, "ix_cat_fallas_activas", "cat_fallas_comunes", "id", where="activo = TRUE")
+    crear_indice(conexion, "ix_cat_sistemas_activos", "cat_sistemas", "id", where="activo = TRUE")
+    crear_indice(conexion, "ix_metodos_pago_activos", "metodos_pago_catalogo", "id", where="activo = TRUE")
+    crear_indice(conexion, "ix_usuarios_activos", "usuarios", "id", where="activo = TRUE")
+    crear_indice(conexion, "ix_movimientos_caja_abiertos", "movimientos_caja", "id", where="cierre_diario_id IS NULL")
+
+def _sqlite_soporta_trigram():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.Error:
+        return False
+
+# rowid = id*2 para clientes e id*2+1 para vehículos (así se borran por rowid sin escanear)
+TEXTO_CLIENTE_FTS = "coalesce({r}.nombre_completo, '') || ' ' || coalesce({r}.telefono, '') || ' ' || coalesce({r}.email, '')"
+TEXTO_VEHICULO_FTS = ("coalesce({r}.placas, '') || ' ' || replace(replace(coalesce({r}.placas, ''), '-', ''), ' ', '')"
+                      " || ' ' || coalesce({r}.vin, '') || ' ' || coalesce({r}.marca, '') || ' ' || coalesce({r}.modelo, '')")
+
+def m004_busqueda_clientes_vehiculos(conexion, dialecto):
+    if dialecto == "postgresql":
+        # pg_trgm permite que LIKE '%texto%' use índice; si no hay permiso para la extensión, seguimos sin ella
+        try:
+            with conexion.begin_nested():
+                conexion.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            print(f"⚠️ No se pudo activar pg_trgm, la búsqueda usará LIKE sin índice: {e}")
+            return
+        for nombre, tabla, expresion in [
+            ("ix_clientes_nombre_trgm", "clientes", "lower(nombre_completo) gin_trgm_ops"),
+            ("ix_clientes_telefono_trgm", "clientes", "telefono gin_trgm_ops"),
+            ("ix_vehiculos_placas_trgm", "vehiculos", "upper(placas) gin_trgm_ops"),
+            ("ix_vehiculos_placas_compactas_trgm", "vehiculos", "upper(replace(placas, '-', '')) gin_trgm_ops"),
+            ("ix_vehiculos_vin_trgm", "vehiculos", "upper(vin) gin_trgm_ops"),
+        ]:
+            conexion.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin ({expresion})"))
+
+    elif dialecto == "sqlite":
+        if not _sqlite_soporta_trigram():
+            print("⚠️ Este SQLite no trae FTS5 trigram, la búsqueda usará LIKE.")
+            return
+        conexion.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5(texto, tokenize='trigram')"))
+
+        for tabla, texto, rowid in [
+            ("clientes", TEXTO_CLIENTE_FTS, "{r}.id * 2"),
+            ("vehiculos", TEXTO_VEHICULO_FTS, "{r}.id * 2 + 1"),
+        ]:
+            insertar = f"INSERT INTO busqueda_fts(rowid, texto) VALUES ({rowid.format(r='new')}, {texto.format(r='new')});"
+            borrar = f"DELETE FROM busqueda_fts WHERE rowid = {rowid.format(r='old')};"
+            conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END"))
+            conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_au AFTER UPDATE ON {tabla} BEGIN {borrar} {insertar} END"))
+            conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END"))
+
+        # Llenado inicial con lo que ya existe
+        conexion.execute(text("DELETE FROM busqueda_fts"))
+        conexion.execute(text(f"INSERT INTO busqueda_fts(rowid, texto) SELECT c.id * 2, {TEXTO_CLIENTE_FTS.format(r='c')} FROM clientes c"))
+        conexion.execute(text(f"INSERT INTO busqueda_fts(rowid, texto) SELECT v.id * 2 + 1, {TEXTO_VEHICULO_FTS.format(r='v')} FROM vehiculos v"))
+
+def m005_acumulados_caja(conexion, dialecto):
+    # La tabla ya la creó create_all; aquí se llena con lo que está abierto
+    conexion.execute(text("DELETE FROM caja_acumulados"))
+    conexion.execute(text(
+        "INSERT INTO caja_acumulados (tipo, metodo_pago, monto, movimientos)"
+        " SELECT tipo, coalesce(metodo_pago, ''), coalesce(sum(monto), 0), count(id)"
+        " FROM movimientos_caja WHERE cierre_diario_id IS NULL"
+        " GROUP BY tipo, coalesce(metodo_pago, '')"
+    ))
+
+def m006_totales_cierres(conexion, dialecto):
+    agregar_columna(conexion, "cierres_diarios", "ordenes_cobradas", "INTEGER", relleno_sql=(
+        "(SELECT count(DISTINCT m.orden_id) FROM movimientos_caja m"
+        " WHERE m.cierre_diario_id = cierres_diarios.id AND m.tipo = 'INGRESO')"
+    ))
+    for columna, tipo_sql in [
+        ("total_efectivo", "FLOAT"), ("total_tarjeta", "FLOAT"), ("total_transferencia", "FLOAT"),
+        ("total_ingresos", "FLOAT"), ("total_gastos", "FLOAT"), ("saldo_final", "FLOAT"),
+        ("ordenes_cobradas", "INTEGER"), ("ticket_promedio", "FLOAT"), ("cierres_diarios", "INTEGER"),
+    ]:
+        agregar_columna(conexion, "cierres_mensuales", columna, tipo_sql)
+
+    # Los meses que ya estaban cerrados se rellenan desde sus cierres diarios
+    if dialecto == "postgresql":
+        del_mes = ("EXTRACT(YEAR FROM d.fecha_cierre) = cierres_mensuales.anio"
+                   " AND EXTRACT(MONTH FROM d.fecha_cierre) = cierres_mensuales.mes")
+    else:
+        del_mes = ("CAST(strftime('%Y', d.fecha_cierre) AS INTEGER) = cierres_mensuales.anio"
+                   " AND CAST(strftime('%m', d.fecha_cierre) AS INTEGER) = cierres_mensuales.mes")
+    suma = "(SELECT coalesce(sum(d.{c}), 0) FROM cierres_diarios d WHERE " + del_mes + ")"
+    asignaciones = [f"{c} = {suma.format(c=c)}" for c in (
+        "total_efectivo", "total_tarjeta", "total_transferencia", "total_ingresos",
+        "total_gastos", "saldo_final", "ordenes_cobradas",
+    )]
+    asignaciones.append(f"cierres_diarios = (SELECT count(d.id) FROM cierres_diarios d WHERE {del_mes})")
+    asignaciones.append(
+        "ticket_promedio = (SELECT CASE WHEN coalesce(sum(d.ordenes_cobradas), 0) > 0"
+        " THEN round(CAST(sum(d.total_ingresos) / sum(d.ordenes_cobradas) AS NUMERIC), 2) ELSE 0 END"
+        f" FROM cierres_diarios d WHERE {del_mes})"
+    )
+    conexion.execute(text(f"UPDATE cierres_mensuales SET {', '.join(asignaciones)} WHERE total_ingresos IS NULL"))
+
+def m007_resumen_diario(conexion, dialecto):
+    # La tabla ya la creó create_all; se llena con todo el histórico.
+    # Orden cobrada = tiene su INGRESO en caja y fecha de cierre (igual que resumenes.ORDEN_COBRADA)
+    cobrada = ("EXISTS (SELECT 1 FROM movimientos_caja m WHERE m.orden_id = o.id AND m.tipo = 'INGRESO')"
+               " AND o.fecha_cierre IS NOT NULL")
+    conexion.execute(text("DELETE FROM resumen_diario"))
+    for consulta in [
+        "SELECT date(fecha), 'ingresos', '', sum(monto), count(id) FROM movimientos_caja"
+        " WHERE tipo = 'INGRESO' GROUP BY date(fecha)",
+        "SELECT date(fecha), 'gastos', '', sum(monto), count(id) FROM movimientos_caja"
+        " WHERE tipo = 'EGRESO' GROUP BY date(fecha)",
+        "SELECT date(fecha), 'metodo_pago', coalesce(metodo_pago, ''), sum(monto), count(id) FROM movimientos_caja"
+        " WHERE tipo = 'INGRESO' GROUP BY date(fecha), coalesce(metodo_pago, '')",
+        "SELECT date(o.fecha_cierre), 'entregadas', '', coalesce(sum(o.total_cobrado), 0), count(o.id) FROM ordenes o"
+        f" WHERE {cobrada} GROUP BY date(o.fecha_cierre)",
+        "SELECT date(o.fecha_cierre), 'mecanico', coalesce(o.mecanico_asignado, 'Sin Asignar'),"
+        " coalesce(sum(o.total_cobrado), 0), count(o.id) FROM ordenes o"
+        f" WHERE {cobrada} GROUP BY date(o.fecha_cierre), coalesce(o.mecanico_asignado, 'Sin Asignar')",
+        "SELECT date(o.fecha_cierre), 'tipo_detalle', coalesce(d.tipo, ''), coalesce(sum(d.precio), 0), count(d.id)"
+        " FROM orden_detalles d JOIN ordenes o ON d.orden_id = o.id"
+        f" WHERE {cobrada} GROUP BY date(o.fecha_cierre), coalesce(d.tipo, '')",
+    ]:
+        conexion.execute(text(f"INSERT INTO resumen_diario (fecha, dimension, clave, monto, cantidad) {consulta}"))
+
+# Reglas de los subtotales tal como quedaron en esta versión (ver totales_orden.REGLAS)
+TOTALES_M008 = {
+    "subtotal_mano_obra": "coalesce(d.tipo, '') NOT IN ('refaccion', 'nota')",
+    "subtotal_refacciones": "coalesce(d.tipo, '') IN ('refaccion')",
+    "subtotal_aprobado": None,
+    "subtotal_pendiente": "coalesce(d.tipo, '') NOT IN ('nota') AND coalesce(d.estado, '') NOT IN ('terminado')",
+    "total_detalles": None,
+}
+
+def m008_totales_ordenes(conexion, dialecto):
+    for columna in TOTALES_M008:
+        agregar_columna(conexion, "ordenes", columna, "FLOAT", relleno_sql="0")
+    # Subtotales y saldo_pendiente de todas las órdenes desde sus detalles.
+    # UPDATE en SQL directo: no toca actualizado_en (la sincronización por deltas y
+    # las huellas del Parquet no deben ver todas las órdenes como recién cambiadas)
+    sumas = {
+        columna: "(SELECT coalesce(sum({e}), 0) FROM orden_detalles d WHERE d.orden_id = ordenes.id)".format(
+            e=f"CASE WHEN {condicion} THEN coalesce(d.precio, 0) ELSE 0 END" if condicion else "coalesce(d.precio, 0)"
+        )
+        for columna, condicion in TOTALES_M008.items()
+    }
+    asignaciones = [f"{columna} = {suma}" for columna, suma in sumas.items()]
+    asignaciones.append(
+        "saldo_pendiente = CASE WHEN estado = 'entregado' THEN 0"
+        f" ELSE {sumas['subtotal_aprobado']} - coalesce(total_cobrado, 0) END"
+    )
+    conexion.execute(text(f"UPDATE ordenes SET {', '.join(asignaciones)}"))
+
+MIGRACIONES = [
+    (1, "actualizado_en en ordenes", m001_actualizado_en_ordenes),
+    (2, "índices de consultas frecuentes", m002_indices_consultas_frecuentes),
+    (3, "índices parciales de catálogos activos y caja abierta", m003_indices_parciales),
+    (4, "búsqueda de clientes y vehículos (FTS5 / pg_trgm)", m004_busqueda_clientes_vehiculos),
+    (5, "acumulados de la caja abierta", m005_acumulados_caja),
+    (6, "totales en cierres diarios y mensuales", m006_totales_cierres),
+    (7, "resumen diario para reportes", m007_resumen_diario),
+    (8, "subtotales y saldo pendiente en ordenes", m008_totales_ordenes),
+]
+
+def aplicar_migraciones(motor=engine):
+    """Crea las tablas que falten y corre las migraciones pendientes, cada una en su transacción."""
+    # escritura: en SQLite el BEGIN IMMEDIATE forma a los workers que arrancan a la vez
+    motor = motor.execution_options(escritura=True)
+    models.Base.metadata.create_all(bind=motor)
+    dialecto = motor.dialect.name
+    tabla = models.SchemaMigracion.__table__
+
+    for version, nombre, migracion in MIGRACIONES:
+        with motor.begin() as conexion:
+            if dialecto == "postgresql":
+                # Si arrancan varios workers a la vez, solo uno migra; los demás esperan aquí
+                conexion.execute(text("SELECT pg_advisory_xact_lock(748201)"))
+            ya_aplicada = conexion.execute(
+                tabla.select().where(tabla.c.version == version)
+            ).first()
+            if ya_aplicada:
+                continue
+            migracion(conexion, dialecto)
+            conexion.execute(tabla.insert().values(version=version, nombre=nombre, aplicada_en=datetime.utcnow()))
+            print(f"🧱 Migración {version:03d} aplicada: {nombre}")
+
+def estado_migraciones(motor=engine):
+    tabla = models.SchemaMigracion.__table__
+    with motor.connect() as conexion:
+        aplicadas = {fila.version: fila.aplicada_en for fila in conexion.execute(tabla.select())}
+    return [
+        {"version": version, "nombre": nombre, "aplicada_en": aplicadas.get(version)}
+        for version, nombre, _ in MIGRACIONES
+    ]
+
+if __name__ == "__main__":
+    aplicar_migraciones()
+    for m in estado_migraciones():
+        marca = "✅" if m["aplicada_en"] else "⏳"
+        print(f"{marca} {m['version']:03d} {m['nombre']} ({m['aplicada_en'] or 'pendiente'})")
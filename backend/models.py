@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Float, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -114,8 +114,8 @@ class Orden(Base):
     sucursal_id = Column(Integer, default=1)
     
     # Llaves foráneas
-    cliente_id = Column(Integer, ForeignKey("clientes.id"))
-    vehiculo_id = Column(Integer, ForeignKey("vehiculos.id"))
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), index=True)
+    vehiculo_id = Column(Integer, ForeignKey("vehiculos.id"), index=True)
     
     # Relaciones
     cliente = relationship("Cliente")
@@ -123,16 +123,25 @@ class Orden(Base):
     inspeccion = relationship("InspeccionRecepcion", back_populates="orden", uselist=False)
     
     # Estado y Datos
-    estado = Column(String, default='Pendiente') 
+    estado = Column(String, default='Pendiente', index=True)
     kilometraje = Column(Integer)
     nivel_gasolina = Column(Integer)
     mecanico_asignado = Column(String, default="Sin Asignar")
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
+    # Se mueve en cada cambio de la orden (o de sus detalles) para la sincronización por deltas
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # ✅ NUEVOS CAMPOS PARA EL MAPA DE DAÑOS
     lista_daños = Column(Text, nullable=True) # Guardará: "puerta, cofre, vidrio"
     notas_golpes = Column(Text, nullable=True) # Guardará: "Rayón profundo..."
 
+    # Totales de las líneas (los mantiene totales_orden.py, no se editan a mano)
+    subtotal_mano_obra = Column(Float, default=0.0)
+    subtotal_refacciones = Column(Float, default=0.0)
+    subtotal_aprobado = Column(Float, default=0.0)
+    subtotal_pendiente = Column(Float, default=0.0) # Lo que falta por terminar
+    total_detalles = Column(Float, default=0.0)
+
     # Cobro
     saldo_pendiente = Column(Float, default=0.0)
     total_cobrado = Column(Float, default=0.0)
@@ -142,7 +151,7 @@ class Orden(Base):
 class OrdenDetalle(Base):
     __tablename__ = "orden_detalles"
     id = Column(Integer, primary_key=True, index=True)
-    orden_id = Column(Integer, ForeignKey("ordenes.id"))
+    orden_id = Column(Integer, ForeignKey("ordenes.id"), index=True)
     sistema_origen = Column(String) 
     falla_detectada = Column(String) 
     tipo = Column(String)
@@ -156,7 +165,7 @@ class InspeccionRecepcion(Base):
     __tablename__ = "inspecciones_recepcion"
     
     id = Column(Integer, primary_key=True, index=True)
-    orden_id = Column(Integer, ForeignKey("ordenes.id"))
+    orden_id = Column(Integer, ForeignKey("ordenes.id"), index=True)
     
     # Datos Generales
     version = Column(String)
@@ -207,7 +216,7 @@ class Auditoria(Base):
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
     accion = Column(String)
     detalle = Column(String)
-    fecha = Column(DateTime, default=datetime.now)
+    fecha = Column(DateTime, default=datetime.now, index=True)
     ip_origen = Column(String, nullable=True)
     usuario = relationship("Usuario")
 
@@ -223,6 +232,7 @@ class CierreDiario(Base):
     saldo_final = Column(Float, default=0.0)
     usuario_responsable_id = Column(Integer, ForeignKey("usuarios.id"))
     comentarios = Column(String, nullable=True)
+    ordenes_cobradas = Column(Integer, default=0)
     usuario = relationship("Usuario")
 
 class CierreMensual(Base):
@@ -233,6 +243,17 @@ class CierreMensual(Base):
     fecha_ejecucion = Column(DateTime, default=datetime.now)
     usuario_responsable_id = Column(Integer, ForeignKey("usuarios.id"))
     estado = Column(String, default="cerrado")
+
+    # 📊 Totales del mes, sumados de sus cierres diarios al momento de cerrar
+    total_efectivo = Column(Float, default=0.0)
+    total_tarjeta = Column(Float, default=0.0)
+    total_transferencia = Column(Float, default=0.0)
+    total_ingresos = Column(Float, default=0.0)
+    total_gastos = Column(Float, default=0.0)
+    saldo_final = Column(Float, default=0.0)
+    ordenes_cobradas = Column(Integer, default=0)
+    ticket_promedio = Column(Float, default=0.0)
+    cierres_diarios = Column(Integer, default=0)
     usuario = relationship("Usuario")
 
 class MovimientoCaja(Base):
@@ -243,12 +264,74 @@ class MovimientoCaja(Base):
     metodo_pago = Column(String)
     referencia = Column(String, nullable=True)
     descripcion = Column(String)
-    fecha = Column(DateTime, default=datetime.now)
+    fecha = Column(DateTime, default=datetime.now, index=True)
     
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
     orden_id = Column(Integer, ForeignKey("ordenes.id"), nullable=True)
-    cierre_diario_id = Column(Integer, ForeignKey("cierres_diarios.id"), nullable=True)
+    cierre_diario_id = Column(Integer, ForeignKey("cierres_diarios.id"), nullable=True, index=True)
 
     usuario = relationship("Usuario")
     orden = relationship("Orden")
-    cierre = relationship("CierreDiario")
\ No newline at end of file
+    cierre = relationship("CierreDiario")
+
+# ==========================================
+# 📬 OUTBOX DE INTEGRACIONES (GOOGLE SHEETS)
+# ==========================================
+
+class SheetsOutbox(Base):
+    __tablename__ = "sheets_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    orden_id = Column(Integer, ForeignKey("ordenes.id"))
+    folio = Column(String, nullable=True)
+    fila = Column(Text) # La "Fila Maestra" ya armada, en JSON
+    estado = Column(String, default="pendiente", index=True) # pendiente / enviado / fallido
+    intentos = Column(Integer, default=0)
+    proximo_intento = Column(DateTime, default=datetime.utcnow)
+    ultimo_error = Column(Text, nullable=True)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+    enviado_en = Column(DateTime, nullable=True)
+
+# ==========================================
+# 🏷️ REVISIONES POR TABLA (ETag / CACHÉ)
+# ==========================================
+
+class RevisionTabla(Base):
+    __tablename__ = "revisiones_tabla"
+    tabla = Column(String, primary_key=True)
+    revision = Column(Integer, default=0)
+
+
+# ==========================================
+# 🧱 CONTROL DE MIGRACIONES
+# ==========================================
+
+class SchemaMigracion(Base):
+    __tablename__ = "schema_migraciones"
+    version = Column(Integer, primary_key=True)
+    nombre = Column(String)
+    aplicada_en = Column(DateTime, default=datetime.utcnow)
+
+
+# ==========================================
+# 💵 ACUMULADOS DE LA CAJA ABIERTA
+# ==========================================
+class CajaAcumulado(Base):
+    """Lo que lleva la caja desde el último cierre diario, por tipo y método de pago."""
+    __tablename__ = "caja_acumulados"
+    tipo = Column(String, primary_key=True) # INGRESO / EGRESO
+    metodo_pago = Column(String, primary_key=True)
+    monto = Column(Float, default=0.0)
+    movimientos = Column(Integer, default=0)
+
+
+# ==========================================
+# 📈 RESUMEN DIARIO PARA REPORTES
+# ==========================================
+class ResumenDiario(Base):
+    """Acumulado por día de cada dimensión (ingresos, método de pago, mecánico...). Ver resumenes.py"""
+    __tablename__ = "resumen_diario"
+    fecha = Column(Date, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    clave = Column(String, primary_key=True, default="")
+    monto = Column(Float, default=0.0)
+    cantidad = Column(Integer, default=0)
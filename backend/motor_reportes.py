@@ -0,0 +1,284 @@
+import re
+from datetime import datetime, timedelta
+
+# --- NUMPY (OPCIONAL) ---
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    print("⚠️ Advertencia: numpy no está instalado (el análisis de reportes no estará disponible).")
+
+# ---------------------------------------------------------
+# 🧮 MOTOR DE REPORTES EN COLUMNAS (NUMPY)
+# Para análisis sobre muchos movimientos: la BD regresa solo números (el día,
+# textos ya convertidos a códigos con un CASE, montos) y np.fromiter
+# los pasa del cursor a arreglos sin armar listas ni objetos en Python. Todas
+# las cuentas (sumas por grupo, percentiles, comparación contra el periodo
+# anterior) se hacen vectorizadas.
+#
+#   python benchmark_reportes.py --filas 1000000   -> compara contra /reportes/financiero
+# ---------------------------------------------------------
+
+GRANULARIDADES = ("dia", "semana", "mes")
+PERCENTILES = (50, 90, 99)
+
+def disponible():
+    return np is not None
+
+# --- LECTURA A COLUMNAS ---
+
+def _parametro_fecha(conexion, fecha):
+    # En SQLite las fechas se guardan como texto 'YYYY-MM-DD HH:MM:SS.ffffff'
+    return str(fecha) if conexion.dialect.name == "sqlite" else fecha
+
+def _cursor(conexion, sql, inicio, fin, parametros):
+    if conexion.dialect.name == "postgresql":
+        sql = re.sub(r":(\w+)", r"%(\1)s", sql)  # psycopg2 usa %(nombre)s
+    cursor = conexion.connection.cursor()
+    cursor.execute(sql, {
+        "inicio": _parametro_fecha(conexion, inicio),
+        "fin": _parametro_fecha(conexion, fin),
+        **parametros,
+    })
+    return cursor
+
+def leer_filas(conexion, sql, inicio, fin, **parametros):
+    """
+    SQL crudo con :inicio/:fin directo al cursor del driver: sin objetos del ORM
+    y sin el Row de SQLAlchemy. Para resultados chicos (ya agrupados por la BD).
+    """
+    cursor = _cursor(conexion, sql, inicio, fin, parametros)
+    try:
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def leer_columnas(conexion, sql, inicio, fin, columnas, **parametros):
+    """
+    Como leer_filas, pero las filas van del cursor a un arreglo estructurado
+    (una columna NumPy por campo de `columnas`) sin pasar por una lista.
+    El SQL debe regresar solo números.
+    """
+    cursor = _cursor(conexion, sql, inicio, fin, parametros)
+    try:
+        return np.fromiter(cursor, dtype=columnas)
+    finally:
+        cursor.close()
+
+def dia_sql(conexion, columna):
+    """El día de la fecha como entero (días desde 1970-01-01), calculado por la BD."""
+    if conexion.dialect.name == "postgresql":
+        return f"(CAST({columna} AS DATE) - DATE '1970-01-01')"
+    return f"CAST(julianday({columna}) - 2440587.5 AS INTEGER)"
+
+def _caso(expresion, categorias):
+    """CASE que convierte cada texto de `categorias` en su posición (-1 si no está)."""
+    parametros = {f"categoria_{n}": valor for n, valor in enumerate(categorias)}
+    casos = " ".join(f"WHEN :categoria_{n} THEN {n}" for n in range(len(categorias)))
+    return (f"CASE {expresion} {casos} ELSE -1 END" if categorias else "-1"), parametros
+
+def leer_codificado(conexion, sql, expresion, origen, inicio, fin, columnas, conocidas=()):
+    """
+    leer_columnas de `sql`, donde {codigo} es el texto `expresion` ya convertido
+    a entero por la BD. Las categorías salen de `conocidas` (las del periodo
+    anterior, que ya se consultaron); solo si aparece un texto nuevo se sacan con
+    un SELECT DISTINCT y se vuelve a leer. Regresa (datos, categorias).
+    """
+    categorias = sorted(conocidas)
+    while True:
+        codigo, parametros = _caso(expresion, categorias)
+        datos = leer_columnas(conexion, sql.format(codigo=codigo), inicio, fin, columnas, **parametros)
+        if not (datos["grupo"] < 0).any():
+            return datos, categorias
+        categorias = [v for (v,) in leer_filas(conexion, f"SELECT DISTINCT {expresion} FROM {origen} ORDER BY 1", inicio, fin)]
+
+def _dias(dias):
+    return dias.astype("datetime64[D]")
+
+def _sumas_por_grupo(codigos, valores, n_grupos):
+    return np.bincount(codigos, weights=valores, minlength=n_grupos)
+
+def _percentiles(valores):
+    if valores.size == 0:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(valores, PERCENTILES))}
+
+def _inicio_periodo(dias, granularidad):
+    """dias: datetime64[D]. Regresa el primer día del periodo de cada uno."""
+    if granularidad == "semana":
+        # 1970-01-01 fue jueves: se recorre para que la semana empiece en lunes
+        return ((dias.astype(np.int64) + 3) // 7 * 7 - 3).astype("datetime64[D]")
+    if granularidad == "mes":
+        return dias.astype("datetime64[M]").astype("datetime64[D]")
+    return dias
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return None
+    return round((actual - anterior) / anterior * 100, 2)
+
+# --- FUENTES ---
+# Cada fuente: (fecha, grupo, monto, FROM ... WHERE con :inicio/:fin).
+# Del rango pedido se bajan las filas crudas a arreglos; del periodo anterior
+# solo hace falta la suma por grupo, así que esa la resuelve la BD con GROUP BY.
+
+TIPO_MOVIMIENTO = "CASE tipo WHEN 'INGRESO' THEN 1 WHEN 'EGRESO' THEN 2 ELSE 0 END"
+ORIGEN_MOVIMIENTOS = "movimientos_caja WHERE fecha >= :inicio AND fecha < :fin"
+
+FUENTES_GRUPO = {
+    "mecanico": (
+        "o.fecha_cierre", "COALESCE(o.mecanico_asignado, 'Sin Asignar')", "COALESCE(o.total_cobrado, 0)",
+        "ordenes o WHERE o.estado = 'entregado' AND o.fecha_cierre >= :inicio AND o.fecha_cierre < :fin",
+    ),
+    "tipo_detalle": (
+        "o.fecha_cierre", "COALESCE(d.tipo, '')", "COALESCE(d.precio, 0)",
+        "orden_detalles d JOIN ordenes o ON o.id = d.orden_id "
+        "WHERE o.estado = 'entregado' AND o.fecha_cierre >= :inicio AND o.fecha_cierre < :fin",
+    ),
+}
+AGRUPACIONES = ("metodo_pago",) + tuple(FUENTES_GRUPO)
+
+COLUMNAS_MOVIMIENTOS = [("dia", np.int64), ("tipo", np.int8), ("grupo", np.int32), ("monto", np.float64)] if np else None
+COLUMNAS_GRUPO = [("dia", np.int64), ("grupo", np.int32), ("monto", np.float64)] if np else None
+
+def cargar_movimientos(conexion, inicio, fin, metodos_conocidos=()):
+    metodo = "COALESCE(metodo_pago, '')"
+    datos, metodos = leer_codificado(conexion, (
+        f"SELECT {dia_sql(conexion, 'fecha')}, {TIPO_MOVIMIENTO}, {{codigo}}, COALESCE(monto, 0) FROM {ORIGEN_MOVIMIENTOS}"
+    ), metodo, ORIGEN_MOVIMIENTOS, inicio, fin, COLUMNAS_MOVIMIENTOS, metodos_conocidos)
+    if not datos.size:
+        return None
+    return {
+        "dia": _dias(datos["dia"]),
+        "es_ingreso": datos["tipo"] == 1,
+        "es_gasto": datos["tipo"] == 2,
+        "metodo_pago": (datos["grupo"], metodos),
+        "monto": datos["monto"],
+    }
+
+def sumar_movimientos(conexion, inicio, fin):
+    """Periodo anterior: (tipo, metodo_pago, suma, cantidad) ya agrupado por la BD."""
+    return leer_filas(conexion, (
+        f"SELECT {TIPO_MOVIMIENTO}, COALESCE(metodo_pago, ''), SUM(COALESCE(monto, 0)), COUNT(*) "
+        f"FROM {ORIGEN_MOVIMIENTOS} GROUP BY 1, 2"
+    ), inicio, fin)
+
+def cargar_grupo(conexion, agrupar_por, inicio, fin, conocidos=()):
+    fecha, grupo, monto, origen = FUENTES_GRUPO[agrupar_por]
+    datos, nombres = leer_codificado(
+        conexion, f"SELECT {dia_sql(conexion, fecha)}, {{codigo}}, {monto} FROM {origen}",
+        grupo, origen, inicio, fin, COLUMNAS_GRUPO, conocidos,
+    )
+    if not datos.size:
+        return None
+    return {"dia": _dias(datos["dia"]), "grupo": (datos["grupo"], nombres), "monto": datos["monto"]}
+
+def sumar_grupo(conexion, agrupar_por, inicio, fin):
+    _, grupo, monto, origen = FUENTES_GRUPO[agrupar_por]
+    filas = leer_filas(conexion, f"SELECT {grupo}, SUM({monto}) FROM {origen} GROUP BY 1", inicio, fin)
+    return {nombre: suma or 0.0 for nombre, suma in filas}
+
+# --- ANÁLISIS ---
+
+def _resumen_movimientos(mov):
+    montos = mov["monto"]
+    ingresos = montos[mov["es_ingreso"]]
+    return {
+        "ingresos": round(float(ingresos.sum()), 2),
+        "gastos": round(float(montos[mov["es_gasto"]].sum()), 2),
+        "movimientos": int(montos.size),
+        "promedio_ingreso": round(float(ingresos.mean()), 2) if ingresos.size else 0.0,
+        "percentiles_ingreso": _percentiles(ingresos),
+    }
+
+def _resumen_agrupado(filas):
+    ingresos = float(sum(suma or 0.0 for tipo, _, suma, _ in filas if tipo == 1))
+    cantidad_ingresos = sum(cantidad for tipo, _, _, cantidad in filas if tipo == 1)
+    return {
+        "ingresos": round(ingresos, 2),
+        "gastos": round(float(sum(suma or 0.0 for tipo, _, suma, _ in filas if tipo == 2)), 2),
+        "movimientos": sum(cantidad for *_, cantidad in filas),
+        "promedio_ingreso": round(ingresos / cantidad_ingresos, 2) if cantidad_ingresos else 0.0,
+    }
+
+def _tabla_grupos(codigos, nombres, montos, anteriores):
+    """Suma y cuenta por grupo del rango pedido, contra las sumas del periodo anterior."""
+    n = len(nombres)
+    sumas = _sumas_por_grupo(codigos, montos, n)
+    conteos = np.bincount(codigos, minlength=n)
+    filas = {
+        nombres[i]: {"grupo": nombres[i], "monto": round(float(sumas[i]), 2), "cantidad": int(conteos[i])}
+        for i in range(n)
+    }
+    for nombre in anteriores:
+        filas.setdefault(nombre, {"grupo": nombre, "monto": 0.0, "cantidad": 0})
+    for fila in filas.values():
+        anterior = round(anteriores.get(fila["grupo"], 0.0), 2)
+        fila["monto_periodo_anterior"] = anterior
+        fila["variacion"] = _variacion(fila["monto"], anterior)
+    return sorted(filas.values(), key=lambda f: f["monto"], reverse=True)
+
+def analizar(conexion, desde, hasta, agrupar_por="metodo_pago", granularidad="dia"):
+    """
+    Analiza [desde, hasta] (fechas, 'hasta' incluido) y lo compara contra
+    el periodo anterior de la misma duración.
+    """
+    inicio = datetime.combine(desde, datetime.min.time())
+    fin = datetime.combine(hasta, datetime.min.time()) + timedelta(days=1)
+    inicio_anterior = inicio - (fin - inicio)
+
+    anteriores = sumar_movimientos(conexion, inicio_anterior, inicio)
+    resultado = {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "resumen": _resumen_vacio(),
+        "periodo_anterior": _resumen_agrupado(anteriores),
+        "variacion": {},
+        "por_grupo": [],
+        "por_periodo": [],
+    }
+
+    mov = cargar_movimientos(conexion, inicio, fin, {metodo for _, metodo, _, _ in anteriores})
+    if mov is not None:
+        resultado["resumen"] = _resumen_movimientos(mov)
+
+        # Serie por periodo
+        dias = _inicio_periodo(mov["dia"], granularidad)
+        periodos, indice = np.unique(dias, return_inverse=True)
+        ingresos = _sumas_por_grupo(indice, np.where(mov["es_ingreso"], mov["monto"], 0.0), len(periodos))
+        gastos = _sumas_por_grupo(indice, np.where(mov["es_gasto"], mov["monto"], 0.0), len(periodos))
+        resultado["por_periodo"] = [
+            {"periodo": str(p), "ingresos": round(float(i), 2), "gastos": round(float(g), 2)}
+            for p, i, g in zip(periodos, ingresos, gastos)
+        ]
+
+        if agrupar_por == "metodo_pago":
+            # Solo ingresos: los gastos no son cobros
+            codigos, nombres = mov["metodo_pago"]
+            ingreso = mov["es_ingreso"]
+            anteriores_metodo = {metodo: suma or 0.0 for tipo, metodo, suma, _ in anteriores if tipo == 1}
+            resultado["por_grupo"] = _tabla_grupos(codigos[ingreso], nombres, mov["monto"][ingreso], anteriores_metodo)
+
+    if agrupar_por in FUENTES_GRUPO:
+        anteriores_grupo = sumar_grupo(conexion, agrupar_por, inicio_anterior, inicio)
+        datos = cargar_grupo(conexion, agrupar_por, inicio, fin, anteriores_grupo)
+        if datos is not None:
+            codigos, nombres = datos["grupo"]
+            resultado["por_grupo"] = _tabla_grupos(codigos, nombres, datos["monto"], anteriores_grupo)
+        else:
+            resultado["por_grupo"] = _tabla_grupos(np.zeros(0, dtype=np.int32), [], np.zeros(0), anteriores_grupo)
+
+    resultado["variacion"] = {
+        campo: _variacion(resultado["resumen"][campo], resultado["periodo_anterior"][campo])
+        for campo in ("ingresos", "gastos")
+    }
+    return resultado
+
+def _resumen_vacio():
+    return {
+        "ingresos": 0.0,
+        "gastos": 0.0,
+        "movimientos": 0,
+        "promedio_ingreso": 0.0,
+        "percentiles_ingreso": {f"p{p}": 0.0 for p in PERCENTILES},
+    }
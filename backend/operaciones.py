@@ -0,0 +1,119 @@
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+
+from eventos import notificar_orden
+from logger import guardar_error_log
+import models, schemas
+
+# ---------------------------------------------------------
+# 📦 OPERACIONES SIN COMMIT + LOTE TRANSACCIONAL (/batch)
+# Cada función hace el cambio y sus validaciones pero NO hace commit: el
+# endpoint individual hace commit al terminar y /batch hace uno solo para todo
+# el lote. Así una pantalla con mala señal manda una ráfaga de cambios en un
+# solo viaje.
+#
+# Cada operación del lote corre en su propio SAVEPOINT: si una falla se
+# deshace solo lo suyo (y sus eventos pendientes), y se reporta por separado.
+# ---------------------------------------------------------
+
+LIMITE_OPERACIONES = 200
+ESTADOS_TABLERO = ['recibido', 'revisión', 'reparacion', 'espera_refacciones', 'listo', 'entregado']
+
+def cambiar_estado_detalle(db, detalle_id, estado):
+    detalle = db.query(models.OrdenDetalle).filter(models.OrdenDetalle.id == detalle_id).first()
+    if not detalle:
+        raise HTTPException(status_code=404, detail="Detalle no encontrado")
+    detalle.estado = estado
+    return {"mensaje": "Estado actualizado", "nuevo_estado": detalle.estado}
+
+def cambiar_precio_detalle(db, detalle_id, nuevo_precio):
+    detalle = db.query(models.OrdenDetalle).filter(models.OrdenDetalle.id == detalle_id).first()
+    if not detalle:
+        raise HTTPException(status_code=404, detail="Detalle no encontrado")
+    detalle.precio = nuevo_precio
+    return {"mensaje": "Precio actualizado"}
+
+def mover_orden(db, orden_id, nuevo_estado):
+    orden = db.query(models.Orden).filter(models.Orden.id == orden_id).first()
+    if not orden:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+    if nuevo_estado not in ESTADOS_TABLERO:
+        raise HTTPException(status_code=400, detail="Estado no válido")
+    orden.estado = nuevo_estado
+    notificar_orden(db, orden, "movida")
+    return {"mensaje": f"Orden movida a {nuevo_estado}"}
+
+def editar_servicio(db, servicio_id, datos):
+    servicio = db.query(models.Servicio).filter(models.Servicio.id == servicio_id).first()
+    if not servicio:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    servicio.nombre = datos.nombre
+    servicio.precio_sugerido = datos.precio_sugerido
+    servicio.es_favorito = datos.es_favorito
+    return servicio
+
+# --- LOTE ---
+
+def _servicio_editado(db, op):
+    servicio = editar_servicio(db, op.servicio_id, op.servicio)
+    db.flush()
+    return schemas.Servicio.model_validate(servicio).model_dump()
+
+EJECUTORES = {
+    "estado_detalle": lambda db, op: cambiar_estado_detalle(db, op.detalle_id, op.estado),
+    "precio_detalle": lambda db, op: cambiar_precio_detalle(db, op.detalle_id, op.nuevo_precio),
+    "mover_orden": lambda db, op: mover_orden(db, op.orden_id, op.nuevo_estado),
+    "actualizar_servicio": _servicio_editado,
+}
+
+# Cada operación pide el mismo permiso que su endpoint suelto (cualquiera de la lista)
+PERMISOS_OPERACION = {
+    "estado_detalle": ("ver_taller",),
+    "precio_detalle": ("ver_taller", "ver_caja"),
+    "mover_orden": ("ver_taller",),
+    "actualizar_servicio": ("ver_config",),
+}
+
+def ejecutar_lote(db, operaciones, atomico=True):
+    """
+    Corre las operaciones en orden dentro de la transacción de `db` y hace UN commit.
+    atomico=True: a la primera falla se deshace todo el lote y lo demás ya no corre.
+    atomico=False: las que fallan se deshacen solas y el resto se confirma.
+    """
+    if len(operaciones) > LIMITE_OPERACIONES:
+        raise HTTPException(status_code=400, detail=f"Máximo {LIMITE_OPERACIONES} operaciones por lote")
+
+    resultados = []
+    hubo_error = False
+    for indice, op in enumerate(operaciones):
+        resultado = {"indice": indice, "tipo": op.tipo}
+        resultados.append(resultado)
+        if hubo_error and atomico:
+            resultado.update(ok=False, estado="no_ejecutada")
+            continue
+
+        eventos_previos = len(db.info.get("eventos_pendientes", []))
+        try:
+            with db.begin_nested():
+                resultado["resultado"] = EJECUTORES[op.tipo](db, op)
+            resultado.update(ok=True, estado="aplicada")
+        except (HTTPException, SQLAlchemyError) as e:
+            # El SAVEPOINT ya se deshizo; los eventos de esta operación tampoco deben salir
+            del db.info.get("eventos_pendientes", [])[eventos_previos:]
+            if isinstance(e, HTTPException):
+                resultado.update(ok=False, estado="fallida", status=e.status_code, error=e.detail)
+            else:
+                guardar_error_log("Lote de operaciones", f"{op.tipo} #{indice}: {e}")
+                resultado.update(ok=False, estado="fallida", status=500, error="Error al guardar en la base de datos")
+            hubo_error = True
+
+    if hubo_error and atomico:
+        db.rollback()
+        for resultado in resultados:
+            if resultado["ok"]:
+                resultado.pop("resultado", None)
+                resultado.update(ok=False, estado="revertida")
+        return {"confirmado": False, "resultados": resultados}
+
+    db.commit()
+    return {"confirmado": True, "resultados": resultados}
@@ -0,0 +1,69 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+# ---------------------------------------------------------
+# 📄 PAGINACIÓN POR CURSOR (KEYSET)
+# En vez de OFFSET usamos "dame los que siguen después del id X",
+# así la página 1 y la página 500 cuestan lo mismo.
+# El cursor siguiente viaja en el encabezado X-Siguiente-Cursor.
+#
+# Sin `limit` se regresa una página de LIMITE_POR_DEFECTO. Solo para la
+# transición con un frontend viejo que espera la tabla completa:
+#   PAGINACION_OBLIGATORIA=0  -> sin limit ni after regresa todo
+# ---------------------------------------------------------
+
+ENCABEZADO_CURSOR = "X-Siguiente-Cursor"
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 500
+PAGINACION_OBLIGATORIA = os.getenv("PAGINACION_OBLIGATORIA", "1") != "0"
+
+def codificar_cursor(datos):
+    texto = json.dumps(datos, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode())
+        int(datos["id"])
+        return datos
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+def rango_fechas(columna, desde=None, hasta=None):
+    """Filtros de fecha (YYYY-MM-DD). 'hasta' incluye todo ese día."""
+    filtros = []
+    try:
+        if desde:
+            filtros.append(columna >= datetime.strptime(desde, "%Y-%m-%d"))
+        if hasta:
+            filtros.append(columna < datetime.strptime(hasta, "%Y-%m-%d") + timedelta(days=1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido, usa YYYY-MM-DD")
+    return filtros
+
+def paginar(query, columna_id, response, limit=None, after=None, descendente=False):
+    """
+    Aplica el keyset sobre `columna_id`.
+    Sin `limit` ni `after` regresa la primera página (o todo si PAGINACION_OBLIGATORIA=0).
+    """
+    if limit is None and after is None and not PAGINACION_OBLIGATORIA:
+        return query.all()
+
+    if after:
+        ultimo_id = int(decodificar_cursor(after)["id"])
+        query = query.filter(columna_id < ultimo_id if descendente else columna_id > ultimo_id)
+
+    limite = limit or LIMITE_POR_DEFECTO
+    query = query.order_by(columna_id.desc() if descendente else columna_id.asc())
+
+    # Pedimos uno de más para saber si hay otra página sin hacer un COUNT
+    filas = query.limit(limite + 1).all()
+    if len(filas) > limite:
+        filas = filas[:limite]
+        response.headers[ENCABEZADO_CURSOR] = codificar_cursor({"id": filas[-1].id})
+    return filas
@@ -0,0 +1,98 @@
+from fastapi import HTTPException
+from sqlalchemy import insert, update
+
+from sincronizacion import marcar_ordenes_actualizadas
+from totales_orden import recalcular_totales
+import models
+
+# ---------------------------------------------------------
+# 🧾 PRESUPUESTO EN LOTE (DIAGNÓSTICO + REFACCIONES + CAMBIOS)
+# Un presupuesto de 30 líneas antes eran 30+ requests (y un SELECT por falla).
+# Aquí: un SELECT ... IN para las fallas del catálogo, un INSERT de varias filas
+# para todas las líneas nuevas y un UPDATE por llave primaria para los cambios,
+# todo en la transacción del endpoint.
+#
+# Los INSERT/UPDATE masivos no pasan por el flush, así que la marca de
+# "orden modificada" (sincronización por deltas) y los totales de la orden
+# (totales_orden.py) se actualizan aquí a mano.
+# ---------------------------------------------------------
+
+def lineas_de_fallas(db, orden_id, fallas_ids):
+    """Una línea por id pedido (en el mismo orden, repetidos incluidos). Los ids que no existen se ignoran."""
+    if not fallas_ids:
+        return []
+    catalogo = {
+        falla.id: falla
+        for falla in db.query(models.CatFalla).filter(models.CatFalla.id.in_(set(fallas_ids)))
+    }
+    return [
+        {
+            "orden_id": orden_id,
+            "sistema_origen": "Diagnóstico Rápido",
+            "falla_detectada": catalogo[falla_id].nombre_falla,
+            "precio": catalogo[falla_id].precio_sugerido,
+            "tipo": "falla",
+            "estado": "pendiente",
+        }
+        for falla_id in fallas_ids if falla_id in catalogo
+    ]
+
+def linea_refaccion(orden_id, refaccion):
+    return {
+        "orden_id": orden_id,
+        "sistema_origen": "Refacciones",
+        "falla_detectada": refaccion.nombre_pieza,
+        "precio": 0.0 if refaccion.traido_por_cliente else refaccion.precio_unitario,
+        "tipo": "refaccion",
+        "estado": "pendiente",
+        "es_refaccion_cliente": refaccion.traido_por_cliente,
+    }
+
+def linea_nota(orden_id, texto):
+    return {
+        "orden_id": orden_id,
+        "sistema_origen": "Nota General",
+        "falla_detectada": texto,
+        "precio": 0.0,
+        "tipo": "nota",
+        "estado": "informativo",
+    }
+
+def insertar_lineas(db, orden_id, lineas):
+    """Todas las líneas en un solo INSERT de varias filas (sin armar objetos del ORM)."""
+    if not lineas:
+        return 0
+    # Mismas columnas en todas las filas para que salga una sola sentencia
+    columnas = {"es_refaccion_cliente": False, "aprobado_cliente": False}
+    db.execute(insert(models.OrdenDetalle), [{**columnas, **linea} for linea in lineas])
+    marcar_ordenes_actualizadas(db.connection(), [orden_id])
+    recalcular_totales(db.connection(), [orden_id])
+    return len(lineas)
+
+def aplicar_cambios(db, orden_id, cambios):
+    """
+    Cambios de precio/estado a detalles de ESTA orden, en un UPDATE por llave primaria.
+    Si algún detalle no existe o es de otra orden, no se aplica nada (404).
+    """
+    cambios = [c for c in cambios if c.nuevo_precio is not None or c.estado is not None]
+    if not cambios:
+        return 0
+    D = models.OrdenDetalle
+    pedidos = {c.detalle_id for c in cambios}
+    encontrados = {i for (i,) in db.query(D.id).filter(D.orden_id == orden_id, D.id.in_(pedidos))}
+    faltantes = sorted(pedidos - encontrados)
+    if faltantes:
+        raise HTTPException(status_code=404, detail=f"Detalles no encontrados en la orden: {faltantes}")
+
+    filas = []
+    for cambio in cambios:
+        fila = {"id": cambio.detalle_id}
+        if cambio.nuevo_precio is not None:
+            fila["precio"] = cambio.nuevo_precio
+        if cambio.estado is not None:
+            fila["estado"] = cambio.estado
+        filas.append(fila)
+    db.execute(update(D), filas)
+    marcar_ordenes_actualizadas(db.connection(), [orden_id])
+    recalcular_totales(db.connection(), [orden_id])
+    return len(filas)
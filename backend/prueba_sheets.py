@@ -2,6 +2,8 @@ import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import json
 import os
+import sys
+import time
 
 def probar_conexion():
     print("\n--- 🕵️ INICIANDO DIAGNÓSTICO DE GOOGLE SHEETS ---")
@@ -53,5 +55,84 @@ def probar_conexion():
         print("\n❌ FALLÓ LA CONEXIÓN. Aquí está el error exacto:")
         print(e)
 
+def _revisar(fallas, condicion, mensaje):
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    if not condicion:
+        fallas.append(mensaje)
+
+def probar_lotes_offline(total_filas=50, latencia_seg=0.05):
+    """
+    Prueba SIN internet usando el backend falso (sheets_fake.py): cuántas llamadas
+    cuesta un lote, orden y errores por fila, Google caído y reconexión.
+    Regresa la lista de revisiones que fallaron (vacía si todo salió bien).
+    """
+    import sheets
+    import sheets_fake
+
+    print("\n--- 🧪 PRUEBA DE LOTES CON GOOGLE FALSO ---")
+    fallas = []
+    filas = [[f"OS-PRUEBA-{i:06d}"] + [""] * (sheets.TOTAL_COLUMNAS - 1) for i in range(total_filas)]
+
+    # 1. FILA POR FILA (como se hacía antes)
+    falso_uno = sheets_fake.ClienteFalso(latencia_seg=latencia_seg)
+    sesion_uno = sheets.SesionSheets(fabrica_cliente=lambda: falso_uno)
+    inicio = time.perf_counter()
+    for fila in filas:
+        sheets.enviar_filas_maestras([fila], sesion=sesion_uno)
+    tiempo_uno = time.perf_counter() - inicio
+
+    # 2. UN SOLO LOTE (con una fila inválida en medio para ver el reporte por fila)
+    falso_lote = sheets_fake.ClienteFalso(latencia_seg=latencia_seg)
+    sesion_lote = sheets.SesionSheets(fabrica_cliente=lambda: falso_lote)
+    rota = min(10, total_filas // 2)
+    con_error = filas[:rota] + [["FILA ROTA"]] + filas[rota:]
+    inicio = time.perf_counter()
+    resultados = sheets.enviar_filas_maestras(con_error, sesion=sesion_lote)
+    tiempo_lote = time.perf_counter() - inicio
+
+    print(f"📤 Fila por fila: {falso_uno.llamadas.get('append_rows', 0)} llamadas, {tiempo_uno:.2f}s")
+    print(f"📦 En lote:       {falso_lote.llamadas.get('append_rows', 0)} llamada(s), {tiempo_lote:.2f}s")
+    _revisar(fallas, falso_uno.llamadas.get("append_rows") == total_filas, "Fila por fila cuesta una llamada por fila")
+    _revisar(fallas, falso_lote.llamadas.get("append_rows") == 1, "El lote completo se manda en UNA llamada append_rows")
+    _revisar(fallas, falso_lote.llamadas.get("open_by_key") == 1, "La sesión abre el documento una sola vez")
+    hoja = sesion_lote.hoja()
+    _revisar(fallas, [f[0] for f in hoja.filas] == [f[0] for f in filas], "Orden de filas respetado")
+    errores = [i for i, r in enumerate(resultados) if r]
+    _revisar(fallas, len(resultados) == len(con_error) and errores == [rota], f"Error reportado solo para la fila inválida: {errores}")
+
+    # 3. GOOGLE CAÍDO: todas las filas válidas del lote reportan el error y no se reintenta
+    falso_caido = sheets_fake.ClienteFalso()
+    sesion_caida = sheets.SesionSheets(fabrica_cliente=lambda: falso_caido)
+    sesion_caida.hoja()  # Conectamos primero para que falle el append y no la conexión
+    falso_caido.fallar_siguientes = 1
+    resultados = sheets.enviar_filas_maestras(filas[:5], sesion=sesion_caida)
+    _revisar(fallas, len(resultados) == 5 and all(resultados), "Con Google caído se reporta error en cada fila del lote")
+    _revisar(fallas, falso_caido.llamadas.get("append_rows") == 1 and not falso_caido.documento.hojas[0].filas,
+             "Un error de red no se reintenta aquí (lo reintenta el outbox) y no escribe nada")
+
+    # 4. PESTAÑA BORRADA/RENOMBRADA: se invalida la sesión, se reconecta y se reintenta UNA vez
+    falso_perdido = sheets_fake.ClienteFalso(error=sheets.gspread.exceptions.WorksheetNotFound)
+    sesion_perdida = sheets.SesionSheets(fabrica_cliente=lambda: falso_perdido)
+    sesion_perdida.hoja()
+    falso_perdido.fallar_siguientes = 1
+    resultados = sheets.enviar_filas_maestras(filas[:3], sesion=sesion_perdida)
+    _revisar(fallas, resultados == [None, None, None], "Tras reconectar, el lote se guarda completo")
+    _revisar(fallas, falso_perdido.llamadas.get("open_by_key") == 2 and falso_perdido.llamadas.get("append_rows") == 2,
+             "La reconexión vuelve a abrir el documento y reintenta una sola vez")
+    _revisar(fallas, len(falso_perdido.documento.hojas[0].filas) == 3, "Las filas quedan escritas una sola vez")
+
+    # 5. SI EL REINTENTO TAMBIÉN FALLA: error por fila, sin ciclos
+    llamadas_antes = falso_perdido.total_llamadas
+    falso_perdido.fallar_siguientes = 2  # El append y la reconexión
+    resultados = sheets.enviar_filas_maestras(filas[:2], sesion=sesion_perdida)
+    _revisar(fallas, len(resultados) == 2 and all(resultados), "Si la reconexión también falla se reporta el error de cada fila")
+    _revisar(fallas, falso_perdido.total_llamadas - llamadas_antes == 2, "Y no se queda reintentando")
+
+    print(f"\n{'✅ Todo bien' if not fallas else f'❌ {len(fallas)} revisiones fallaron'}")
+    return fallas
+
 if __name__ == "__main__":
-    probar_conexion()
\ No newline at end of file
+    if "--offline" in sys.argv:
+        sys.exit(1 if probar_lotes_offline() else 0)
+    else:
+        probar_conexion()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import argparse
+import os
+import sys
+
+# Aseguramos que Python encuentre los módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import Bundle
+
+from database import SessionLocal
+import models
+import sheets
+
+# ---------------------------------------------------------
+# 🔁 RECONCILIACIÓN DEL CRM EN GOOGLE SHEETS
+# Lee la columna de folios de la hoja en UNA sola lectura, la compara contra las
+# órdenes que ya tienen inspección y vuelve a escribir las que faltan en lotes grandes.
+#
+#   python reconciliar_sheets.py              -> revisa y rellena
+#   python reconciliar_sheets.py --solo-revisar -> solo dice cuántas faltan
+# ---------------------------------------------------------
+
+LOTE_CONSULTA = 500     # Órdenes que se arman por consulta a la BD
+LOTE_ESCRITURA = 2000   # Filas por cada append_rows
+
+def leer_folios_hoja(sesion):
+    """Una sola lectura de rango (columna A completa) y regresa el set de folios."""
+    valores = sesion.ejecutar(lambda hoja: hoja.batch_get(["A:A"]))[0]
+    return {fila[0].strip() for fila in valores if fila and fila[0]}
+
+def folios_faltantes(db, folios_hoja):
+    """
+    Recorre las órdenes con inspección trayendo SOLO (id, folio), en bloques,
+    y regresa los ids de las que no están en la hoja.
+    Las que todavía tienen una fila pendiente en el outbox se saltan: el despachador las va a mandar.
+    """
+    en_outbox = db.query(models.SheetsOutbox.orden_id).filter(models.SheetsOutbox.estado == "pendiente")
+
+    consulta = db.query(models.Orden.id, models.Orden.folio_visual).filter(
+        models.Orden.folio_visual != None,
+        models.Orden.id.in_(db.query(models.InspeccionRecepcion.orden_id)),
+        models.Orden.id.notin_(en_outbox)
+    ).order_by(models.Orden.id.asc()).yield_per(5000)
+
+    return [orden_id for orden_id, folio in consulta if folio not in folios_hoja]
+
+def construir_filas(db, ids_ordenes):
+    """
+    Arma las filas maestras de un bloque de órdenes con una sola consulta de columnas
+    (Bundles), sin cargar objetos ORM completos ni sus relaciones.
+    """
+    orden = Bundle("orden",
+        models.Orden.id, models.Orden.folio_visual, models.Orden.creado_en, models.Orden.estado,
+        models.Orden.mecanico_asignado, models.Orden.kilometraje, models.Orden.nivel_gasolina,
+        models.Orden.lista_daños, models.Orden.notas_golpes)
+    cliente = Bundle("cliente",
+        models.Cliente.nombre_completo, models.Cliente.telefono, models.Cliente.email)
+    vehiculo = Bundle("vehiculo",
+        models.Vehiculo.placas, models.Vehiculo.marca, models.Vehiculo.modelo,
+        models.Vehiculo.anio, models.Vehiculo.color)
+    inspeccion = Bundle("inspeccion",
+        models.InspeccionRecepcion.int_tablero_alertas, models.InspeccionRecepcion.mec_niveles_aceite,
+        models.InspeccionRecepcion.ext_llantas, models.InspeccionRecepcion.ext_pintura,
+        models.InspeccionRecepcion.observaciones)
+
+    registros = db.query(orden, cliente, vehiculo, inspeccion) \
+        .join(models.Cliente, models.Cliente.id == models.Orden.cliente_id) \
+        .join(models.Vehiculo, models.Vehiculo.id == models.Orden.vehiculo_id) \
+        .join(models.InspeccionRecepcion, models.InspeccionRecepcion.orden_id == models.Orden.id) \
+        .filter(models.Orden.id.in_(ids_ordenes)) \
+        .order_by(models.Orden.id.asc(), models.InspeccionRecepcion.id.asc())
+
+    filas = []
+    vistos = set()
+    for o, c, v, i in registros:
+        if o.id in vistos:
+            continue  # Si una orden tiene dos inspecciones usamos la primera
+        vistos.add(o.id)
+        filas.append((o.id, sheets.construir_fila_maestra(o, c, v, i)))
+    return filas
+
+def reconciliar(solo_revisar=False, sesion=None):
+    sesion = sesion or sheets.sesion_sheets
+    db = SessionLocal()
+    try:
+        print("\n--- 🔁 RECONCILIANDO ÓRDENES CONTRA GOOGLE SHEETS ---")
+        folios_hoja = leer_folios_hoja(sesion)
+        print(f"📄 Folios en la hoja: {len(folios_hoja)}")
+
+        faltantes = folios_faltantes(db, folios_hoja)
+        print(f"🔎 Órdenes con inspección que NO están en la hoja: {len(faltantes)}")
+        if solo_revisar or not faltantes:
+            return {"faltantes": len(faltantes), "escritas": 0, "errores": 0}
+
+        escritas = 0
+        errores = 0
+        pendientes = []
+        for inicio in range(0, len(faltantes), LOTE_CONSULTA):
+            pendientes.extend(construir_filas(db, faltantes[inicio:inicio + LOTE_CONSULTA]))
+            # Escribimos cuando ya se juntó un lote grande (o al final)
+            if len(pendientes) >= LOTE_ESCRITURA or inicio + LOTE_CONSULTA >= len(faltantes):
+                db.commit()  # No dejamos la transacción abierta mientras se habla con Google
+                resultados = sheets.enviar_filas_maestras([fila for _, fila in pendientes], sesion=sesion)
+                ok_ids = [orden_id for (orden_id, _), error in zip(pendientes, resultados) if error is None]
+                for (orden_id, fila), error in zip(pendientes, resultados):
+                    if error:
+                        print(f"⚠️ No se pudo rellenar {fila[0]}: {error}")
+                errores += len(pendientes) - len(ok_ids)
+                escritas += len(ok_ids)
+
+                # Las filas que el outbox dio por perdidas ya quedaron en la hoja
+                if ok_ids:
+                    db.query(models.SheetsOutbox).filter(
+                        models.SheetsOutbox.orden_id.in_(ok_ids),
+                        models.SheetsOutbox.estado == "fallido"
+                    ).update({"estado": "enviado", "ultimo_error": "Rellenada por reconciliación"}, synchronize_session=False)
+                    db.commit()
+                pendientes = []
+
+        print(f"✅ Filas rellenadas: {escritas} | ❌ Con error: {errores}")
+        return {"faltantes": len(faltantes), "escritas": escritas, "errores": errores}
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rellena en Google Sheets las órdenes que faltan en el CRM.")
+    parser.add_argument("--solo-revisar", action="store_true", help="Solo cuenta las faltantes, no escribe nada.")
+    args = parser.parse_args()
+    reconciliar(solo_revisar=args.solo_revisar)
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, event, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+# ---------------------------------------------------------
+# 📈 RESUMEN DIARIO PARA REPORTES
+# Una fila por (fecha, dimensión, clave) que se va sumando conforme pasan las cosas:
+#   - cada MovimientoCaja nuevo (listener)       -> ingresos / gastos / metodo_pago
+#   - cada orden cobrada (cobrar_orden)          -> entregadas / mecanico / tipo_detalle
+#     (solo el cobro cuenta: moverla a "entregado" sin cobrar no suma)
+# Las series por día, semana o mes se arman leyendo SOLO estas filas.
+# ---------------------------------------------------------
+
+DIM_INGRESOS = "ingresos"          # monto = ingresos del día
+DIM_GASTOS = "gastos"              # monto = egresos del día
+DIM_ENTREGADAS = "entregadas"      # cantidad = órdenes cobradas/entregadas
+DIM_METODO_PAGO = "metodo_pago"    # clave = método, monto = ingresos
+DIM_MECANICO = "mecanico"          # clave = mecánico, monto = lo cobrado de sus órdenes
+DIM_TIPO_DETALLE = "tipo_detalle"  # clave = falla/refaccion/nota, cantidad = líneas, monto = precio
+
+GRANULARIDADES = ("dia", "semana", "mes")
+
+def _insertar(conexion):
+    return postgresql.insert if conexion.dialect.name == "postgresql" else sqlite.insert
+
+def _sumar_si_existe(tabla, sentencia, llaves, sumas):
+    return sentencia.on_conflict_do_update(
+        index_elements=[tabla.c[llave] for llave in llaves],
+        set_={columna: tabla.c[columna] + sentencia.excluded[columna] for columna in sumas},
+    )
+
+def insertar_o_sumar(conexion, tabla, llaves, sumas):
+    """INSERT ... ON CONFLICT DO UPDATE columna = columna + valor (atómico, sin leer antes)."""
+    sentencia = _insertar(conexion)(tabla).values(**llaves, **sumas)
+    conexion.execute(_sumar_si_existe(tabla, sentencia, llaves, sumas))
+
+def sumar_resumen(conexion, fecha, dimension, clave="", monto=0.0, cantidad=0):
+    insertar_o_sumar(
+        conexion, models.ResumenDiario.__table__,
+        {"fecha": fecha, "dimension": dimension, "clave": clave or ""},
+        {"monto": monto, "cantidad": cantidad},
+    )
+
+def sumar_consulta(conexion, consulta):
+    """Suma al resumen las filas (fecha, dimension, clave, monto, cantidad) de `consulta`, en SQL."""
+    R = models.ResumenDiario.__table__
+    llaves, sumas = ("fecha", "dimension", "clave"), ("monto", "cantidad")
+    sentencia = _insertar(conexion)(R).from_select([R.c[c] for c in llaves + sumas], consulta)
+    conexion.execute(_sumar_si_existe(R, sentencia, llaves, sumas))
+
+@event.listens_for(Session, "after_flush")
+def _resumir_movimientos_nuevos(session, contexto):
+    grupos = defaultdict(lambda: [0.0, 0])
+    for obj in session.new:
+        if not isinstance(obj, models.MovimientoCaja):
+            continue
+        fecha = (obj.fecha or datetime.now()).date()
+        if obj.tipo == "INGRESO":
+            llaves = [(fecha, DIM_INGRESOS, ""), (fecha, DIM_METODO_PAGO, obj.metodo_pago or "")]
+        elif obj.tipo == "EGRESO":
+            llaves = [(fecha, DIM_GASTOS, "")]
+        else:
+            continue
+        for llave in llaves:
+            grupos[llave][0] += obj.monto or 0.0
+            grupos[llave][1] += 1
+    for (fecha, dimension, clave), (monto, cantidad) in grupos.items():
+        sumar_resumen(session.connection(), fecha, dimension, clave, monto, cantidad)
+
+# --- ÓRDENES COBRADAS (una sola definición para el cobro y la reconstrucción) ---
+
+M = models.MovimientoCaja.__table__
+O = models.Orden.__table__
+D = models.OrdenDetalle.__table__
+
+# Cobrada = pasó por cobrar_orden: tiene su INGRESO en caja y fecha de cierre.
+# Entregarla desde el tablero o /batch sin cobrar no cuenta.
+ORDEN_COBRADA = select(M.c.id).where((M.c.orden_id == O.c.id) & (M.c.tipo == "INGRESO")).exists() & (O.c.fecha_cierre != None)
+
+def consultas_ordenes_cobradas(*filtros):
+    """Filas de resumen (entregadas, mecánico, tipo de detalle) de las órdenes cobradas que cumplan `filtros`."""
+    dia = func.date(O.c.fecha_cierre)
+    mecanico = func.coalesce(O.c.mecanico_asignado, "Sin Asignar")
+    tipo = func.coalesce(D.c.tipo, "")
+    condicion = and_(ORDEN_COBRADA, *filtros)
+    return [
+        select(dia, literal(DIM_ENTREGADAS), literal(""), func.coalesce(func.sum(O.c.total_cobrado), 0), func.count(O.c.id))
+            .where(condicion).group_by(dia),
+        select(dia, literal(DIM_MECANICO), mecanico, func.coalesce(func.sum(O.c.total_cobrado), 0), func.count(O.c.id))
+            .where(condicion).group_by(dia, mecanico),
+        select(dia, literal(DIM_TIPO_DETALLE), tipo, func.coalesce(func.sum(D.c.precio), 0), func.count(D.c.id))
+            .select_from(D.join(O, D.c.orden_id == O.c.id))
+            .where(condicion).group_by(dia, tipo),
+    ]
+
+def registrar_orden_cobrada(db, orden):
+    """Llamar dentro de la transacción del cobro: suma la orden entregada, su mecánico y sus detalles."""
+    db.flush()  # El INGRESO y la fecha de cierre tienen que estar en la BD para la consulta
+    for consulta in consultas_ordenes_cobradas(O.c.id == orden.id):
+        sumar_consulta(db.connection(), consulta)
+
+# --- RECONSTRUCCIÓN (reparación) ---
+
+def reconstruir_resumenes(conexion):
+    """Vuelve a llenar resumen_diario desde el histórico completo."""
+    dia = func.date(M.c.fecha)
+    metodo = func.coalesce(M.c.metodo_pago, "")
+    consultas = [
+        select(dia, literal(DIM_INGRESOS), literal(""), func.sum(M.c.monto), func.count(M.c.id))
+            .where(M.c.tipo == "INGRESO").group_by(dia),
+        select(dia, literal(DIM_GASTOS), literal(""), func.sum(M.c.monto), func.count(M.c.id))
+            .where(M.c.tipo == "EGRESO").group_by(dia),
+        select(dia, literal(DIM_METODO_PAGO), metodo, func.sum(M.c.monto), func.count(M.c.id))
+            .where(M.c.tipo == "INGRESO").group_by(dia, metodo),
+    ] + consultas_ordenes_cobradas()
+    conexion.execute(delete(models.ResumenDiario.__table__))
+    for consulta in consultas:
+        sumar_consulta(conexion, consulta)
+
+# --- LECTURA DE SERIES ---
+
+def inicio_periodo(fecha, granularidad):
+    if granularidad == "semana":
+        return fecha - timedelta(days=fecha.weekday())  # Lunes
+    if granularidad == "mes":
+        return fecha.replace(day=1)
+    return fecha
+
+def _leer_fecha(texto):
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido, usa YYYY-MM-DD")
+
+def calcular_series(db, granularidad="dia", desde=None, hasta=None):
+    R = models.ResumenDiario
+    query = db.query(R.fecha, R.dimension, R.clave, R.monto, R.cantidad)
+    if desde:
+        query = query.filter(R.fecha >= _leer_fecha(desde))
+    if hasta:
+        query = query.filter(R.fecha <= _leer_fecha(hasta))
+
+    periodos = {}
+    for fecha, dimension, clave, monto, cantidad in query.order_by(R.fecha.asc()):
+        inicio = inicio_periodo(fecha, granularidad)
+        periodo = periodos.get(inicio)
+        if periodo is None:
+            periodo = periodos[inicio] = {
+                "periodo": inicio.isoformat(),
+                "ingresos": 0.0,
+                "gastos": 0.0,
+                "ordenes_entregadas": 0,
+                "por_metodo_pago": defaultdict(float),
+                "por_mecanico": defaultdict(float),
+                "detalles_por_tipo": defaultdict(int),
+            }
+        if dimension == DIM_INGRESOS:
+            periodo["ingresos"] += monto or 0.0
+        elif dimension == DIM_GASTOS:
+            periodo["gastos"] += monto or 0.0
+        elif dimension == DIM_ENTREGADAS:
+            periodo["ordenes_entregadas"] += cantidad or 0
+        elif dimension == DIM_METODO_PAGO:
+            periodo["por_metodo_pago"][clave] += monto or 0.0
+        elif dimension == DIM_MECANICO:
+            periodo["por_mecanico"][clave] += monto or 0.0
+        elif dimension == DIM_TIPO_DETALLE:
+            periodo["detalles_por_tipo"][clave] += cantidad or 0
+    return list(periodos.values())
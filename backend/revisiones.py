@@ -0,0 +1,98 @@
+import hashlib
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from database import SessionEscritura, get_db
+import models
+
+# ---------------------------------------------------------
+# 🏷️ REVISIÓN POR TABLA + ETag
+# Cada escritura a una tabla versionada sube su contador en la MISMA transacción.
+# Los GET calculan el ETag con ese contador (una lectura por llave primaria)
+# y si el cliente ya tiene esa versión responden 304 sin correr la consulta.
+# ---------------------------------------------------------
+
+# Solo catálogos y listas que cambian poco; las órdenes no (su fila sería un cuello de botella)
+TABLAS_VERSIONADAS = {
+    "servicios",
+    "configuracion",
+    "cat_fallas_comunes",
+    "cat_sistemas",
+    "usuarios",
+    "clientes",
+    "vehiculos",
+    "metodos_pago_catalogo",
+    "estados_orden",
+}
+
+class NoModificado(Exception):
+    def __init__(self, etag):
+        self.etag = etag
+
+def inicializar_revisiones():
+    """Crea la fila de cada tabla versionada para que después solo haga falta UPDATE."""
+    db = SessionEscritura()
+    try:
+        existentes = {t for (t,) in db.query(models.RevisionTabla.tabla)}
+        for tabla in TABLAS_VERSIONADAS - existentes:
+            db.add(models.RevisionTabla(tabla=tabla, revision=0))
+        db.commit()
+    finally:
+        db.close()
+
+def tocar_tablas(conexion, tablas):
+    """Sube la revisión de las tablas indicadas (también sirve para escrituras hechas con Core)."""
+    tablas = set(tablas) & TABLAS_VERSIONADAS
+    if tablas:
+        tabla = models.RevisionTabla.__table__
+        conexion.execute(
+            update(tabla).where(tabla.c.tabla.in_(tablas)).values(revision=tabla.c.revision + 1)
+        )
+
+@event.listens_for(Session, "after_flush")
+def _tocar_por_flush(session, contexto):
+    tablas = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__table__") and (obj not in session.dirty or session.is_modified(obj))
+    }
+    tocar_tablas(session.connection(), tablas)
+
+@event.listens_for(Session, "do_orm_execute")
+def _tocar_por_update_masivo(estado):
+    # query.update() / query.delete() / insert() no pasan por el flush
+    if (estado.is_update or estado.is_delete or estado.is_insert) and estado.bind_mapper is not None:
+        tocar_tablas(estado.session.connection(), {estado.bind_mapper.local_table.name})
+
+def revisiones_actuales(db, tablas):
+    filas = dict(db.query(models.RevisionTabla.tabla, models.RevisionTabla.revision)
+                 .filter(models.RevisionTabla.tabla.in_(tablas)))
+    return [filas.get(t, 0) for t in tablas]
+
+def calcular_etag(db, tablas, extra=""):
+    firma = f"{'|'.join(tablas)}:{revisiones_actuales(db, tablas)}:{extra}"
+    return 'W/"' + hashlib.sha1(firma.encode()).hexdigest()[:20] + '"'
+
+def coincide_etag(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidatos = [e.strip() for e in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
+
+def etag_para(*tablas):
+    """
+    Dependencia para GETs: si el If-None-Match del cliente coincide con la revisión
+    actual de `tablas`, corta el request con 304 antes de consultar o serializar.
+    """
+    tablas = sorted(tablas)
+
+    def dependencia(request: Request, response: Response, db: Session = Depends(get_db)):
+        etag = calcular_etag(db, tablas, str(request.url.query))
+        if coincide_etag(request.headers.get("if-none-match"), etag):
+            raise NoModificado(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"  # El navegador guarda, pero siempre pregunta
+
+    return dependencia
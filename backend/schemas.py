@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Any
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Any, Union
 from datetime import datetime
 
 # --- USUARIOS ---
@@ -98,7 +98,16 @@ class OrdenResponse(BaseModel):
 
     total_cobrado: float = 0.0
     metodo_pago: Optional[str] = None
+
+    # Totales que mantiene el servidor (no hace falta sumar los detalles en pantalla)
+    subtotal_mano_obra: float = 0.0
+    subtotal_refacciones: float = 0.0
+    subtotal_aprobado: float = 0.0
+    subtotal_pendiente: float = 0.0
+    total_detalles: float = 0.0
+    saldo_pendiente: float = 0.0
     creado_en: datetime
+    actualizado_en: Optional[datetime] = None
 
     # Objetos anidados para el Frontend
     cliente: Optional[ClienteResponse] = None
@@ -123,6 +132,17 @@ class DetallePrecioUpdate(BaseModel):
 class EstadoDetalleUpdate(BaseModel):
     estado: str
 
+class CambioDetalle(BaseModel):
+    detalle_id: int
+    nuevo_precio: Optional[float] = None
+    estado: Optional[str] = None
+
+class PresupuestoLote(BaseModel):
+    fallas_ids: List[int] = []
+    nota_libre: Optional[str] = None
+    refacciones: List[RefaccionCreate] = []
+    cambios: List[CambioDetalle] = []
+
 class OrdenDetalleResponse(BaseModel):
     id: int
     orden_id: int
@@ -195,4 +215,64 @@ class ConfigCreate(ConfigBase):
 class Configuracion(ConfigBase):
     id: int
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- SINCRONIZACIÓN POR DELTAS ---
+class CambiosOrdenesResponse(BaseModel):
+    token: Optional[str] = None
+    ordenes: List[OrdenResponse] = []
+    bajas: List[int] = [] # Órdenes que salieron del tablero (entregadas/canceladas)
+
+
+# --- BÚSQUEDA RÁPIDA (RECEPCIÓN) ---
+class BusquedaResponse(BaseModel):
+    clientes: List[ClienteResponse] = []
+    vehiculos: List[VehiculoResponse] = []
+
+
+# --- EXPEDIENTE DE ORDEN (CAJA / DIAGNÓSTICO) ---
+class SubtotalesOrden(BaseModel):
+    mano_obra: float = 0.0
+    refacciones: float = 0.0
+    aprobado: float = 0.0 # Lo que se cobra (igual que la suma de Caja)
+    total: float = 0.0
+    refacciones_cliente: int = 0 # Piezas que trajo el cliente (van en $0)
+    tareas_pendientes: int = 0
+
+class ExpedienteOrdenResponse(BaseModel):
+    orden: OrdenResponse
+    cliente: Optional[ClienteResponse] = None
+    vehiculo: Optional[VehiculoResponse] = None
+    inspeccion: Optional[InspeccionResponse] = None
+    detalles: List[OrdenDetalleResponse] = []
+    subtotales: SubtotalesOrden
+
+# --- LOTE DE OPERACIONES (/batch) ---
+class OperacionEstadoDetalle(BaseModel):
+    tipo: Literal["estado_detalle"]
+    detalle_id: int
+    estado: str
+
+class OperacionPrecioDetalle(BaseModel):
+    tipo: Literal["precio_detalle"]
+    detalle_id: int
+    nuevo_precio: float
+
+class OperacionMoverOrden(BaseModel):
+    tipo: Literal["mover_orden"]
+    orden_id: int
+    nuevo_estado: str
+
+class OperacionServicio(BaseModel):
+    tipo: Literal["actualizar_servicio"]
+    servicio_id: int
+    servicio: ServicioCreate
+
+Operacion = Annotated[
+    Union[OperacionEstadoDetalle, OperacionPrecioDetalle, OperacionMoverOrden, OperacionServicio],
+    Field(discriminator="tipo"),
+]
+
+class LoteOperaciones(BaseModel):
+    operaciones: List[Operacion]
+    atomico: bool = True
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from database import SessionLocal
+import auth
+import models
+
+# ---------------------------------------------------------
+# 🪪 USUARIO ACTUAL (TOKEN -> PRINCIPAL) CON CACHÉ
+# get_current_user decodifica el JWT de /token y arma el "principal"
+# (usuario, rol y permisos ya convertidos a set). Lo resuelto se guarda por
+# token PRINCIPAL_TTL_SEG segundos: las llamadas siguientes no decodifican
+# ni consultan la BD. Editar, desactivar o cambiar la contraseña de un
+# usuario lo saca del caché de este worker al momento; en los demás
+# workers dura como mucho el TTL.
+#
+# Permisos: los de la pantalla de usuarios (ver_caja, ver_config,
+# admin_usuarios...) más los nombres viejos que todavía traen algunos
+# registros (caja, taller, admin_panel). El rol "admin" y "todo" /
+# "todo_acceso" pasan cualquier permiso.
+#
+# Qué pide cada ruta (requerir_permiso acepta varios: basta con uno):
+#   ver_caja    -> cobros, cierres, reportes financieros, exportaciones
+#   ver_taller  -> diagnóstico, refacciones, detalles, tablero (/batch: por operación)
+#   ver_config  -> servicios, catálogos, configuración, auditoría
+#   admin_usuarios -> alta/edición de usuarios
+# Las lecturas y el alta en recepción (clientes, vehículos, orden nueva,
+# inspección) no piden permiso: la pantalla de recepción es de todos los roles.
+#
+# Las rutas protegidas con requerir_permiso rechazan (401) las llamadas sin
+# token. Solo para la transición con un frontend viejo que no manda el token:
+#   AUTH_OBLIGATORIA=0  -> una llamada SIN token pasa como anónima
+# (una llamada CON token siempre se valida y se revisan sus permisos).
+# ---------------------------------------------------------
+
+AUTH_OBLIGATORIA = os.getenv("AUTH_OBLIGATORIA", "1") != "0"
+TTL_SEG = float(os.getenv("PRINCIPAL_TTL_SEG", "30"))
+MAX_PRINCIPALES = 1024
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+ROL_ADMIN = "admin"
+ACCESO_TOTAL = frozenset({"todo", "todo_acceso"})
+# permiso -> nombres viejos que también lo otorgan
+EQUIVALENTES = {
+    "ver_taller": frozenset({"taller"}),
+    "ver_caja": frozenset({"caja"}),
+    "ver_recepcion": frozenset({"caja"}),
+    "ver_config": frozenset({"admin_panel"}),
+    "admin_usuarios": frozenset({"admin_panel"}),
+}
+
+def parsear_permisos(texto):
+    """'ver_caja,ver_taller' (o "['ver_caja', 'ver_taller']" de registros viejos) -> frozenset."""
+    if not texto:
+        return frozenset()
+    limpio = str(texto).strip().strip("[]")
+    return frozenset(p.strip().strip("'\"") for p in limpio.split(",") if p.strip().strip("'\""))
+
+class Principal:
+    __slots__ = ("id", "username", "nombre", "rol", "permisos")
+
+    def __init__(self, usuario):
+        self.id = usuario.id
+        self.username = usuario.username
+        self.nombre = usuario.nombre
+        self.rol = usuario.rol
+        self.permisos = parsear_permisos(usuario.permisos)
+
+    def puede(self, permiso):
+        if self.rol == ROL_ADMIN or self.permisos & ACCESO_TOTAL:
+            return True
+        return permiso in self.permisos or bool(self.permisos & EQUIVALENTES.get(permiso, frozenset()))
+
+    def como_dict(self):
+        return {"id": self.id, "username": self.username, "nombre": self.nombre, "rol": self.rol, "permisos": sorted(self.permisos)}
+
+def _no_autorizado(detalle="Token inválido o vencido"):
+    return HTTPException(status_code=401, detail=detalle, headers={"WWW-Authenticate": "Bearer"})
+
+class CachePrincipales:
+    """token -> (vence, principal). LRU con tope de MAX_PRINCIPALES entradas."""
+
+    def __init__(self, ttl=TTL_SEG, maximo=MAX_PRINCIPALES):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolver(self, token):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(token)
+            if entrada is not None and entrada[0] > ahora:
+                self._datos.move_to_end(token)
+                return entrada[1]
+
+        try:
+            datos = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        except JWTError:
+            raise _no_autorizado()
+        username = datos.get("sub")
+        if not username:
+            raise _no_autorizado()
+
+        db = SessionLocal()
+        try:
+            usuario = db.query(models.Usuario).filter(models.Usuario.username == username).first()
+            if not usuario or not usuario.activo:
+                raise _no_autorizado("Usuario inexistente o inactivo")
+            principal = Principal(usuario)
+        finally:
+            db.close()
+
+        # No se guarda más allá de lo que le queda de vida al token
+        vida = min(self.ttl, datos.get("exp", 0) - time.time()) if "exp" in datos else self.ttl
+        with self._lock:
+            self._datos[token] = (ahora + vida, principal)
+            self._datos.move_to_end(token)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return principal
+
+    def invalidar_usuario(self, username):
+        with self._lock:
+            for token in [t for t, (_, p) in self._datos.items() if p.username == username]:
+                del self._datos[token]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+principales = CachePrincipales()
+
+# --- DEPENDENCIAS ---
+
+def get_current_user(token: Optional[str] = Depends(oauth2_scheme)):
+    """Principal del token, o None si no mandaron token y AUTH_OBLIGATORIA=0."""
+    if not token:
+        if AUTH_OBLIGATORIA:
+            raise _no_autorizado("Falta iniciar sesión")
+        return None
+    return principales.resolver(token)
+
+def revisar_permiso(usuario, *permisos):
+    """403 si el usuario no tiene NINGUNO de `permisos` (None = anónimo con AUTH_OBLIGATORIA=0)."""
+    if usuario is not None and not any(usuario.puede(p) for p in permisos):
+        raise HTTPException(status_code=403, detail=f"No tienes permiso para esto ({' o '.join(permisos)})")
+
+def requerir_permiso(*permisos):
+    """Dependencia para rutas: 403 si el usuario del token no tiene alguno de `permisos`."""
+    def dependencia(usuario: Optional[Principal] = Depends(get_current_user)):
+        revisar_permiso(usuario, *permisos)
+        return usuario
+    return dependencia
@@ -0,0 +1,204 @@
+import os
+import threading
+
+# --- GOOGLE SHEETS SETUP ---
+try:
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    print("✅ Librerías de Google cargadas correctamente.")
+except ImportError:
+    gspread = None
+    print("⚠️ Advertencia: gspread no está instalado.")
+
+# VERIFICACIÓN DE CREDENCIALES
+if os.path.exists("credentials.json"):
+    print("✅ SE ENCONTRÓ EL ARCHIVO 'credentials.json' (Caja Fuerte activa).")
+else:
+    print("⚠️ NO se encontró 'credentials.json'. Asegúrate de haberlo subido a Secret Files en Render.")
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# ID DE TU HOJA DE CÁLCULO
+SHEET_ID = "1y6nW9C8diwITs_lqpH6fjNlVuH90E4oiS5NTXfRm6kc"
+
+# ---------------------------------------------------------
+# 🤖 LÓGICA DE GOOGLE SHEETS (FILA ÚNICA CRM)
+# ---------------------------------------------------------
+
+def construir_fila_maestra(orden, cliente, vehiculo, inspeccion):
+    """
+    Junta TODA la información (Cliente, Auto, Golpes, Checklist) en una sola fila.
+    Devuelve una lista de valores simples (texto/números) lista para guardarse como JSON.
+    """
+    return [
+        # 1. IDENTIFICACIÓN
+        orden.folio_visual,           # Col A
+        str(orden.creado_en.date()) if orden.creado_en else None,  # Col B
+        orden.estado,                 # Col C
+        orden.mecanico_asignado,      # Col D
+
+        # 2. CLIENTE
+        cliente.nombre_completo,      # Col E
+        cliente.telefono,             # Col F
+        cliente.email,                # Col G
+
+        # 3. VEHÍCULO
+        vehiculo.placas,              # Col H
+        f"{vehiculo.marca} {vehiculo.modelo}", # Col I
+        vehiculo.anio,                # Col J
+        vehiculo.color,               # Col K
+
+        # 4. DATOS INICIALES Y GOLPES (DEL MAPA)
+        orden.kilometraje,            # Col L
+        f"{orden.nivel_gasolina}%",   # Col M
+        orden.lista_daños,            # Col N (🔴 GOLPES)
+        orden.notas_golpes,           # Col O (📝 NOTAS DE GOLPES)
+
+        # 5. RESULTADOS DEL CHECKLIST (INSPECCIÓN)
+        inspeccion.int_tablero_alertas, # Col P
+        inspeccion.mec_niveles_aceite,  # Col Q
+        inspeccion.ext_llantas,         # Col R
+        inspeccion.ext_pintura,         # Col S
+        inspeccion.observaciones        # Col T (Observaciones finales)
+    ]
+
+class SesionSheets:
+    """
+    Conexión a Sheets que vive todo el proceso.
+    Las credenciales se leen una sola vez y la pestaña encontrada se guarda,
+    así cada envío cuesta solo la llamada de escritura. El token lo renueva la
+    sesión de google-auth únicamente cuando ya expiró.
+    Si Google responde con error de permisos o "no encontrado", se reconstruye todo.
+    """
+
+    def __init__(self, archivo_credenciales="credentials.json", sheet_id=SHEET_ID, fabrica_cliente=None):
+        self.archivo_credenciales = archivo_credenciales
+        self.sheet_id = sheet_id
+        # Permite cambiar gspread por el backend falso (sheets_fake.py) para pruebas sin internet
+        self.fabrica_cliente = fabrica_cliente
+        self._lock = threading.Lock()
+        self._creds = None
+        self._cliente = None
+        self._hoja = None
+
+    def _credenciales(self):
+        if self._creds is None:
+            self._creds = ServiceAccountCredentials.from_json_keyfile_name(self.archivo_credenciales, SCOPE)
+        return self._creds
+
+    def _resolver_hoja(self, doc):
+        # Intenta encontrar "Hoja 1", luego "Hoja1", y si falla, agarra la primera (índice 0)
+        for nombre in ("Hoja 1", "Hoja1"):
+            try:
+                return doc.worksheet(nombre)
+            except gspread.exceptions.WorksheetNotFound:
+                continue
+        return doc.get_worksheet(0)
+
+    def hoja(self):
+        """Regresa la pestaña del CRM; solo toca la red la primera vez."""
+        if self._hoja is not None:
+            return self._hoja
+        if gspread is None:
+            raise RuntimeError("gspread no está instalado")
+
+        with self._lock:
+            if self._hoja is None:
+                if self._cliente is None:
+                    if self.fabrica_cliente:
+                        self._cliente = self.fabrica_cliente()
+                    else:
+                        self._cliente = gspread.authorize(self._credenciales())
+                doc = self._cliente.open_by_key(self.sheet_id)
+                self._hoja = self._resolver_hoja(doc)
+                print(f"📄 Conectado a la hoja: '{self._hoja.title}'")
+        return self._hoja
+
+    def invalidar(self, credenciales=False):
+        """Olvida la pestaña (y opcionalmente las credenciales) para reconectar en el siguiente uso."""
+        with self._lock:
+            self._hoja = None
+            if credenciales:
+                self._cliente = None
+                self._creds = None
+
+    def ejecutar(self, operacion):
+        """
+        Corre `operacion(hoja)`. Si falla por permisos o porque la hoja ya no existe,
+        reconstruye la sesión y lo intenta UNA vez más.
+        """
+        try:
+            return operacion(self.hoja())
+        except Exception as e:
+            motivo = error_de_sesion(e)
+            if motivo is None:
+                raise
+            print(f"🔄 Reconectando con Sheets ({motivo}): {e}")
+            self.invalidar(credenciales=(motivo == "auth"))
+            return operacion(self.hoja())
+
+def error_de_sesion(error):
+    """Clasifica los errores que ameritan reconstruir la sesión: 'auth', 'no_encontrado' o None."""
+    if gspread is None:
+        return None
+    if isinstance(error, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+        return "no_encontrado"
+    if isinstance(error, gspread.exceptions.APIError):
+        codigo = getattr(error, "code", None)
+        if codigo in (401, 403):
+            return "auth"
+        if codigo == 404:
+            return "no_encontrado"
+    return None
+
+def crear_sesion_por_defecto():
+    # SHEETS_BACKEND=falso escribe en memoria (útil en local o para medir lotes sin Google)
+    if os.getenv("SHEETS_BACKEND") == "falso":
+        import sheets_fake
+        return SesionSheets(fabrica_cliente=sheets_fake.ClienteFalso)
+    return SesionSheets()
+
+sesion_sheets = crear_sesion_por_defecto()
+
+TOTAL_COLUMNAS = 20  # Col A .. Col T de la Fila Maestra
+
+def validar_fila(fila):
+    """Regresa None si la fila se puede mandar, o el motivo por el que no."""
+    if not isinstance(fila, list):
+        return "La fila no es una lista"
+    if len(fila) != TOTAL_COLUMNAS:
+        return f"La fila tiene {len(fila)} columnas y se esperaban {TOTAL_COLUMNAS}"
+    for celda in fila:
+        if celda is not None and not isinstance(celda, (str, int, float, bool)):
+            return f"Valor no soportado en la fila: {celda!r}"
+    return None
+
+def enviar_filas_maestras(filas, sesion=None):
+    """
+    Manda varias filas con UNA sola llamada `append_rows`, respetando el orden.
+    Regresa una lista alineada con `filas`: None si esa fila se guardó, o el texto del error.
+    Las filas inválidas se reportan solas y no detienen al resto del lote.
+    """
+    sesion = sesion or sesion_sheets
+    resultados = [validar_fila(fila) for fila in filas]
+    validas = [fila for fila, error in zip(filas, resultados) if error is None]
+    if not validas:
+        return resultados
+
+    try:
+        sesion.ejecutar(lambda hoja: hoja.append_rows(validas))
+        print(f"✅ ¡ÉXITO! {len(validas)} Filas Maestras guardadas en Sheets en un solo lote.")
+    except Exception as e:
+        # append_rows es todo o nada: si Google falla, todas las filas válidas del lote fallan
+        error = str(e) or e.__class__.__name__
+        resultados = [error if r is None else r for r in resultados]
+    return resultados
+
+def enviar_fila_maestra(fila):
+    """
+    Escribe una fila ya construida en la hoja. Si Google falla, la excepción sube
+    para que el despachador del outbox decida si reintenta.
+    """
+    error = enviar_filas_maestras([fila])[0]
+    if error:
+        raise RuntimeError(error)
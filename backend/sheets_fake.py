@@ -0,0 +1,86 @@
+import threading
+import time
+
+from gspread.exceptions import WorksheetNotFound
+
+# ---------------------------------------------------------
+# 🧪 BACKEND FALSO DE GSPREAD (SIN INTERNET)
+# Imita lo poquito de gspread que usamos: open_by_key, worksheet,
+# get_worksheet, append_row(s), col_values y batch_get.
+# Guarda las filas en memoria y cuenta las llamadas "a Google".
+# ---------------------------------------------------------
+
+class HojaFalsa:
+    def __init__(self, cliente, title="Hoja 1"):
+        self.cliente = cliente
+        self.title = title
+        self.filas = []
+
+    def append_row(self, fila, **kwargs):
+        self.cliente._llamada("append_row")
+        self.filas.append(list(fila))
+
+    def append_rows(self, filas, **kwargs):
+        self.cliente._llamada("append_rows")
+        self.filas.extend(list(fila) for fila in filas)
+
+    def col_values(self, columna):
+        self.cliente._llamada("col_values")
+        return [fila[columna - 1] if len(fila) >= columna else "" for fila in self.filas]
+
+    def batch_get(self, rangos, **kwargs):
+        # Solo soportamos rangos de columna completa tipo "A:A" o "A2:A"
+        self.cliente._llamada("batch_get")
+        resultado = []
+        for rango in rangos:
+            letra = rango.split(":")[0].rstrip("0123456789")
+            columna = ord(letra.upper()) - ord("A")
+            resultado.append([[fila[columna]] for fila in self.filas if len(fila) > columna])
+        return resultado
+
+class DocumentoFalso:
+    def __init__(self, cliente, nombres_hojas=("Hoja 1",)):
+        self.hojas = [HojaFalsa(cliente, nombre) for nombre in nombres_hojas]
+
+    def worksheet(self, nombre):
+        for hoja in self.hojas:
+            if hoja.title == nombre:
+                return hoja
+        raise WorksheetNotFound(nombre)
+
+    def get_worksheet(self, indice):
+        return self.hojas[indice]
+
+class ClienteFalso:
+    """
+    latencia_seg: tiempo que "tarda Google" en cada llamada.
+    fallar_siguientes: cuántas llamadas seguidas van a tronar (para probar reintentos).
+    error: la excepción de esas fallas (p. ej. WorksheetNotFound para probar la reconexión).
+    """
+
+    def __init__(self, latencia_seg=0.0, fallar_siguientes=0, nombres_hojas=("Hoja 1",), error=ConnectionError):
+        self.latencia_seg = latencia_seg
+        self.fallar_siguientes = fallar_siguientes
+        self.error = error
+        self.llamadas = {}
+        self._lock = threading.Lock()
+        self.documento = DocumentoFalso(self, nombres_hojas)
+
+    def _llamada(self, nombre):
+        with self._lock:
+            self.llamadas[nombre] = self.llamadas.get(nombre, 0) + 1
+            fallar = self.fallar_siguientes > 0
+            if fallar:
+                self.fallar_siguientes -= 1
+        if self.latencia_seg:
+            time.sleep(self.latencia_seg)
+        if fallar:
+            raise self.error(f"Fallo simulado de Google en {nombre}")
+
+    def open_by_key(self, key):
+        self._llamada("open_by_key")
+        return self.documento
+
+    @property
+    def total_llamadas(self):
+        return sum(self.llamadas.values())
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from database import SessionEscritura
+from logger import guardar_error_log
+import models
+import sheets
+
+# ---------------------------------------------------------
+# 📬 OUTBOX DE GOOGLE SHEETS
+# La fila se guarda en la BD junto con la inspección (misma transacción)
+# y un hilo en segundo plano la manda a Sheets con reintentos.
+#
+# Varios despachadores (un hilo por worker de uvicorn) pueden correr a la vez:
+# cada uno "reclama" sus filas con un UPDATE condicional (solo gana quien lo
+# cambia) que les pone proximo_intento = ahora + RECLAMO_SEG. Si el worker se
+# muere a medio envío, la fila vuelve a estar disponible al vencer ese plazo.
+# ---------------------------------------------------------
+
+INTERVALO_SEG = float(os.getenv("SHEETS_INTERVALO_SEG", "5"))
+MAX_INTENTOS = int(os.getenv("SHEETS_MAX_INTENTOS", "8"))
+ESPERA_BASE_SEG = 30
+ESPERA_MAXIMA_SEG = 60 * 60  # Nunca esperamos más de 1 hora entre intentos
+RECLAMO_SEG = 5 * 60  # Lo que una fila reclamada queda apartada para su despachador
+
+# Ventana de lote: juntamos filas hasta LOTE_TAMANO o hasta que pasen LOTE_VENTANA_SEG
+# desde la primera, y las mandamos con un solo append_rows (cuida la cuota por minuto).
+LOTE_TAMANO = int(os.getenv("SHEETS_LOTE_TAMANO", "50"))
+LOTE_VENTANA_SEG = float(os.getenv("SHEETS_LOTE_VENTANA_SEG", "2"))
+
+def encolar_fila_maestra(db, orden, cliente, vehiculo, inspeccion):
+    """
+    Agrega la fila al outbox SIN hacer commit.
+    Quien llama hace el commit junto con la inspección, así nunca se pierde.
+    """
+    fila = sheets.construir_fila_maestra(orden, cliente, vehiculo, inspeccion)
+    registro = models.SheetsOutbox(
+        orden_id=orden.id,
+        folio=orden.folio_visual,
+        fila=json.dumps(fila, ensure_ascii=False, default=str),
+        estado="pendiente",
+        intentos=0,
+        proximo_intento=datetime.utcnow()
+    )
+    db.add(registro)
+    return registro
+
+def calcular_espera(intentos):
+    """Backoff exponencial: 30s, 1m, 2m, 4m... con tope de 1 hora."""
+    return timedelta(seconds=min(ESPERA_BASE_SEG * (2 ** (intentos - 1)), ESPERA_MAXIMA_SEG))
+
+def reclamar_pendientes(db, limite=LOTE_TAMANO):
+    """
+    Aparta para este despachador hasta `limite` filas que ya les toca, en orden de llegada.
+    Cada fila se reclama con un UPDATE condicional: si otro despachador la tomó
+    primero, el UPDATE no cambia nada (rowcount 0) y se la deja.
+    """
+    O = models.SheetsOutbox
+    ahora = datetime.utcnow()
+    candidatos = [i for (i,) in db.query(O.id).filter(
+        O.estado == "pendiente",
+        O.proximo_intento <= ahora
+    ).order_by(O.id.asc()).limit(limite)]
+
+    apartado_hasta = ahora + timedelta(seconds=RECLAMO_SEG)
+    reclamados = []
+    for outbox_id in candidatos:
+        resultado = db.execute(
+            update(O).where(O.id == outbox_id, O.estado == "pendiente", O.proximo_intento <= ahora)
+            .values(proximo_intento=apartado_hasta)
+        )
+        if resultado.rowcount == 1:
+            reclamados.append(outbox_id)
+    db.commit()
+    return reclamados
+
+def despachar_pendientes(limite=LOTE_TAMANO):
+    """
+    Reclama las filas pendientes que ya les toca y las manda a Sheets en un solo lote,
+    en orden de llegada. Cada fila se marca por separado según su resultado.
+    Regresa cuántas se enviaron con éxito.
+    """
+    # Sin expirar al hacer commit: los registros se siguen usando después del envío.
+    # Sesión de escritura: el reclamo lee los candidatos y luego los aparta
+    db = SessionEscritura(expire_on_commit=False)
+    enviadas = 0
+    try:
+        ids = reclamar_pendientes(db, limite)
+        if not ids:
+            return 0
+        registros = db.query(models.SheetsOutbox).filter(
+            models.SheetsOutbox.id.in_(ids)
+        ).order_by(models.SheetsOutbox.id.asc()).all()
+        db.commit()  # No dejamos una transacción abierta mientras se habla con Google
+
+        resultados = sheets.enviar_filas_maestras([json.loads(r.fila) for r in registros])
+
+        for registro, error in zip(registros, resultados):
+            if error is None:
+                registro.estado = "enviado"
+                registro.enviado_en = datetime.utcnow()
+                registro.ultimo_error = None
+                enviadas += 1
+            else:
+                registro.intentos += 1
+                registro.ultimo_error = error[:500]
+                if registro.intentos >= MAX_INTENTOS:
+                    registro.estado = "fallido"
+                    guardar_error_log("Outbox Sheets", f"Folio {registro.folio} descartado tras {registro.intentos} intentos: {error}")
+                else:
+                    registro.proximo_intento = datetime.utcnow() + calcular_espera(registro.intentos)
+                    print(f"⚠️ Sheets falló para {registro.folio} (intento {registro.intentos}): {error}")
+
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        guardar_error_log("Despachador Sheets", str(e))
+    finally:
+        db.close()
+    return enviadas
+
+class DespachadorSheets:
+    """
+    Hilo de fondo que vacía el outbox cada INTERVALO_SEG.
+    Cuando lo despiertan por una fila nueva, espera hasta LOTE_VENTANA_SEG (o a juntar
+    LOTE_TAMANO filas) para mandar todo el grupo de un jalón.
+    """
+
+    def __init__(self, intervalo=INTERVALO_SEG, tamano_lote=LOTE_TAMANO, ventana_lote=LOTE_VENTANA_SEG):
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+        self.ventana_lote = ventana_lote
+        self._lock = threading.Lock()
+        self._nuevas = 0
+        self._despertar = threading.Event()
+        self._lote_lleno = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="despachador-sheets", daemon=True)
+        self._hilo.start()
+        print("📬 Despachador de Sheets iniciado.")
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        self._lote_lleno.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+
+    def despertar(self):
+        """Avisa que hay una fila nueva; si ya se juntó un lote completo, se manda enseguida."""
+        with self._lock:
+            self._nuevas += 1
+            if self._nuevas >= self.tamano_lote:
+                self._lote_lleno.set()
+        self._despertar.set()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            despertado = self._despertar.wait(self.intervalo)
+            if despertado and not self._detener.is_set():
+                # Abrimos la ventana del lote: esperamos más filas o a que se llene
+                self._lote_lleno.wait(self.ventana_lote)
+            with self._lock:
+                self._nuevas = 0
+                self._despertar.clear()
+                self._lote_lleno.clear()
+            if self._detener.is_set():
+                break
+            while despachar_pendientes(self.tamano_lote) >= self.tamano_lote:
+                pass  # Quedaron más pendientes que un lote: seguimos vaciando
+
+despachador = DespachadorSheets()
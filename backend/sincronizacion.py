@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+import models
+
+# ---------------------------------------------------------
+# 🔄 SINCRONIZACIÓN POR DELTAS (updated_since)
+# El cliente guarda el token que le damos y en el siguiente poll solo recibe
+# las órdenes que cambiaron desde entonces. Sin cambios = una consulta al índice
+# de Orden.actualizado_en que regresa vacío.
+# ---------------------------------------------------------
+
+ESTADOS_FUERA_TABLERO = ["entregado", "cancelado"]
+
+# El token es la hora del servidor al momento de la consulta. Una transacción que
+# empezó antes pero hizo commit después puede traer una marca un poco anterior,
+# por eso repetimos una pequeña ventana: el cliente reemplaza por id, así que
+# una orden repetida no le afecta.
+SOLAPE = timedelta(seconds=2)
+
+def marcar_ordenes_actualizadas(conexion, ids_ordenes):
+    """Mueve actualizado_en de las órdenes indicadas (para cambios que no pasan por el ORM)."""
+    ids = [i for i in set(ids_ordenes) if i is not None]
+    if ids:
+        conexion.execute(
+            update(models.Orden.__table__)
+            .where(models.Orden.__table__.c.id.in_(ids))
+            .values(actualizado_en=datetime.utcnow())
+        )
+
+@event.listens_for(Session, "after_flush")
+def _tocar_orden_por_detalles(session, contexto):
+    """Si se agrega, cambia o borra un OrdenDetalle, la orden también cuenta como modificada."""
+    ids = [
+        obj.orden_id
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, models.OrdenDetalle)
+    ]
+    if ids:
+        marcar_ordenes_actualizadas(session.connection(), ids)
+
+def leer_token(token):
+    try:
+        return datetime.fromisoformat(token)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Token de sincronización inválido")
+
+def calcular_cambios(db, query, token=None, solo_tablero=False):
+    """
+    Sin token: foto completa + token actual.
+    Con token: solo lo que cambió desde ese momento. En modo tablero, las órdenes
+    que ya salieron del tablero llegan como "bajas" (solo el id).
+    """
+    nuevo_token = datetime.utcnow().isoformat()
+    if token:
+        desde = leer_token(token)
+        cambiadas = query.filter(models.Orden.actualizado_en > desde - SOLAPE).all()
+    else:
+        cambiadas = query.all()
+
+    ordenes, bajas = [], []
+    for orden in cambiadas:
+        if solo_tablero and orden.estado in ESTADOS_FUERA_TABLERO:
+            if token:
+                bajas.append(orden.id)
+        else:
+            ordenes.append(orden)
+
+    return {"token": nuevo_token, "ordenes": ordenes, "bajas": bajas}
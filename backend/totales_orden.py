@@ -0,0 +1,219 @@
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy import and_, case, event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from database import engine, engine_escritura
+from logger import guardar_error_log
+import models
+
+# ---------------------------------------------------------
+# 🧮 TOTALES DE LA ORDEN GUARDADOS EN LA ORDEN
+# Subtotales (mano de obra, refacciones, aprobado, pendiente), total de las
+# líneas y saldo_pendiente (lo que se cobra menos lo cobrado) viven en la fila
+# de la orden. Cada flush suma la DIFERENCIA de las líneas nuevas, editadas
+# o borradas (un UPDATE atómico por orden, sin releer sus detalles). Los INSERT/UPDATE masivos (presupuestos.py)
+# no pasan por el flush y llaman a recalcular_totales.
+#
+# Un hilo revisa cada VERIFICACION_SEG que los totales cuadren con los
+# detalles y reconstruye los que se hayan desviado.
+# ---------------------------------------------------------
+
+TOLERANCIA = 0.005  # Medio centavo, por el redondeo de Float
+VERIFICACION_SEG = float(os.getenv("TOTALES_VERIFICACION_SEG", "900"))
+LOTE_REPARACION = 500
+
+CAMPOS_TOTALES = ("subtotal_mano_obra", "subtotal_refacciones", "subtotal_aprobado", "subtotal_pendiente", "total_detalles")
+ATRIBUTOS_DETALLE = ("orden_id", "tipo", "estado", "precio")
+
+# --- REGLAS (ÚNICA DEFINICIÓN) ---
+# Qué líneas suman a cada total: {atributo: (operador, valores)}. Un NULL cuenta
+# como "". De aquí salen tanto el cálculo en Python (flush, expediente) como el
+# de SQL (reconstrucción, verificación).
+#   subtotal_aprobado = lo que Caja cobra: todas las líneas, igual que la suma
+#   de CajaOrden / ModalCobro (las piezas que trajo el cliente ya van en $0).
+#   Nadie marca aprobado_cliente todavía; cuando exista esa autorización, el
+#   filtro va aquí. saldo_pendiente sale de este subtotal.
+REGLAS = {
+    "subtotal_mano_obra": {"tipo": ("fuera_de", ("refaccion", "nota"))},
+    "subtotal_refacciones": {"tipo": ("en", ("refaccion",))},
+    "subtotal_aprobado": {},
+    "subtotal_pendiente": {"tipo": ("fuera_de", ("nota",)), "estado": ("fuera_de", ("terminado",))},
+    "total_detalles": {},
+}
+
+def cumple(regla, valores):
+    """¿La línea (dict o OrdenDetalle) entra en la regla?"""
+    for atributo, (operador, opciones) in regla.items():
+        valor = valores[atributo] if isinstance(valores, dict) else getattr(valores, atributo)
+        if valor is None:
+            valor = ""
+        if (valor in opciones) != (operador == "en"):
+            return False
+    return True
+
+def aporte(valores):
+    """Lo que suma UNA línea a cada total."""
+    precio = (valores["precio"] if isinstance(valores, dict) else valores.precio) or 0.0
+    return {campo: precio if cumple(regla, valores) else 0.0 for campo, regla in REGLAS.items()}
+
+# --- EN SQL (reconstrucción y verificación) ---
+
+D = models.OrdenDetalle.__table__
+O = models.Orden.__table__
+_precio = func.coalesce(D.c.precio, 0.0)
+
+def condicion_sql(regla):
+    condiciones = []
+    for atributo, (operador, opciones) in regla.items():
+        columna = func.coalesce(D.c[atributo], "")
+        condiciones.append(columna.in_(opciones) if operador == "en" else columna.notin_(opciones))
+    return and_(*condiciones)
+
+APORTES_SQL = {
+    campo: case((condicion_sql(regla), _precio), else_=0.0) if regla else _precio
+    for campo, regla in REGLAS.items()
+}
+
+def saldo_sql(cobrable):
+    """Lo que falta por cobrar: nada si ya se entregó."""
+    return case((O.c.estado == "entregado", 0.0), else_=cobrable - func.coalesce(O.c.total_cobrado, 0.0))
+
+def recalcular_totales(conexion, ids_ordenes=None):
+    """Vuelve a calcular los totales desde los detalles (todas las órdenes o solo las indicadas)."""
+    valores = {
+        campo: select(func.coalesce(func.sum(expresion), 0.0)).where(D.c.orden_id == O.c.id).scalar_subquery()
+        for campo, expresion in APORTES_SQL.items()
+    }
+    valores["saldo_pendiente"] = saldo_sql(valores["subtotal_aprobado"])
+    sentencia = update(O).values(**valores)
+    if ids_ordenes is not None:
+        ids = [i for i in set(ids_ordenes) if i is not None]
+        if not ids:
+            return
+        sentencia = sentencia.where(O.c.id.in_(ids))
+    conexion.execute(sentencia)
+
+def ordenes_descuadradas(conexion):
+    """Ids de las órdenes cuyos totales guardados no cuadran con sus detalles (una consulta)."""
+    reales = select(
+        D.c.orden_id, *[func.sum(expresion).label(campo) for campo, expresion in APORTES_SQL.items()]
+    ).group_by(D.c.orden_id).subquery()
+    real = {campo: func.coalesce(reales.c[campo], 0.0) for campo in CAMPOS_TOTALES}
+    diferencias = [func.abs(func.coalesce(O.c[campo], 0.0) - real[campo]) > TOLERANCIA for campo in CAMPOS_TOTALES]
+    diferencias.append(func.abs(func.coalesce(O.c.saldo_pendiente, 0.0) - saldo_sql(real["subtotal_aprobado"])) > TOLERANCIA)
+    consulta = select(O.c.id).select_from(O.outerjoin(reales, reales.c.orden_id == O.c.id)).where(or_(*diferencias))
+    return [i for (i,) in conexion.execute(consulta)]
+
+def verificar_totales():
+    """Reconstruye las órdenes descuadradas. Regresa cuántas eran."""
+    # La revisión solo lee; la reparación recalcula desde los detalles en su propia transacción
+    with engine.connect() as conexion:
+        ids = ordenes_descuadradas(conexion)
+    if ids:
+        guardar_error_log("Totales de órdenes", f"{len(ids)} órdenes descuadradas, se reconstruyen: {ids[:20]}")
+        with engine_escritura.begin() as conexion:
+            for inicio in range(0, len(ids), LOTE_REPARACION):
+                recalcular_totales(conexion, ids[inicio:inicio + LOTE_REPARACION])
+    return len(ids)
+
+# --- INCREMENTAL (FLUSH) ---
+
+# Sin esto, asignar un atributo que no se había cargado no guarda el valor anterior
+# y no habría contra qué sacar la diferencia
+for _atributo in ATRIBUTOS_DETALLE:
+    event.listen(getattr(models.OrdenDetalle, _atributo), "set", lambda *args: None, active_history=True)
+
+def _valores(detalle, anteriores=False):
+    if not anteriores:
+        return {nombre: getattr(detalle, nombre) for nombre in ATRIBUTOS_DETALLE}
+    estado = inspect(detalle)
+    valores = {}
+    for nombre in ATRIBUTOS_DETALLE:
+        historia = estado.attrs[nombre].history
+        previos = historia.deleted or historia.unchanged
+        valores[nombre] = previos[0] if previos else None
+    return valores
+
+def _sumar(deltas, valores, signo):
+    if valores["orden_id"] is None:
+        return
+    for campo, monto in aporte(valores).items():
+        deltas[valores["orden_id"]][campo] += signo * monto
+
+@event.listens_for(Session, "after_flush")
+def _acumular_totales(session, contexto):
+    deltas = defaultdict(lambda: dict.fromkeys(CAMPOS_TOTALES, 0.0))
+    ordenes_saldo = set()
+    for obj in session.new:
+        if isinstance(obj, models.OrdenDetalle):
+            _sumar(deltas, _valores(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, models.OrdenDetalle):
+            _sumar(deltas, _valores(obj, anteriores=True), -1)
+    for obj in session.dirty:
+        if isinstance(obj, models.OrdenDetalle) and session.is_modified(obj):
+            _sumar(deltas, _valores(obj, anteriores=True), -1)
+            _sumar(deltas, _valores(obj), 1)
+        elif isinstance(obj, models.Orden):
+            cambios = inspect(obj).attrs
+            if cambios.estado.history.has_changes() or cambios.total_cobrado.history.has_changes():
+                ordenes_saldo.add(obj.id)
+
+    conexion = session.connection()
+    for orden_id, delta in deltas.items():
+        if not any(abs(monto) > 1e-9 for monto in delta.values()):
+            continue
+        valores = {campo: func.coalesce(O.c[campo], 0.0) + delta[campo] for campo in CAMPOS_TOTALES}
+        valores["saldo_pendiente"] = saldo_sql(func.coalesce(O.c.subtotal_aprobado, 0.0) + delta["subtotal_aprobado"])
+        conexion.execute(update(O).where(O.c.id == orden_id).values(**valores))
+        ordenes_saldo.discard(orden_id)
+    if ordenes_saldo:
+        # Se cobró o cambió de estado: solo se recalcula el saldo con el total que ya tiene
+        conexion.execute(
+            update(O).where(O.c.id.in_(ordenes_saldo)).values(saldo_pendiente=saldo_sql(func.coalesce(O.c.subtotal_aprobado, 0.0)))
+        )
+    tocadas = set(deltas) | ordenes_saldo
+    if tocadas:
+        session.info.setdefault("totales_tocados", set()).update(tocadas)
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refrescar_ordenes(session, contexto):
+    # Las órdenes cargadas en la sesión tienen los totales viejos: que se relean al usarlas
+    for orden_id in session.info.pop("totales_tocados", ()):
+        orden = session.identity_map.get(session.identity_key(models.Orden, orden_id))
+        if orden is not None:
+            session.expire(orden, list(CAMPOS_TOTALES) + ["saldo_pendiente"])
+
+# --- VERIFICADOR EN SEGUNDO PLANO ---
+
+class VerificadorTotales:
+    """Hilo de fondo que cada `intervalo` segundos reconstruye los totales que no cuadren."""
+
+    def __init__(self, intervalo=VERIFICACION_SEG):
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self.intervalo <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="verificador-totales", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+
+    def _ciclo(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                verificar_totales()
+            except Exception as e:
+                guardar_error_log("Verificador de totales", str(e))
+
+verificador_totales = VerificadorTotales()
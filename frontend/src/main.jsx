@@ -1,9 +1,17 @@
 import React from 'react'
 import ReactDOM from 'react-dom/client'
 import { BrowserRouter } from 'react-router-dom' // Importamos el Router
+import axios from 'axios'
 import App from './App'
 import './index.css'
 
+// 🔒 Mandamos el token del login en TODAS las peticiones (rutas protegidas del backend)
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem("token")
+  if (token) config.headers.Authorization = `Bearer ${token}`
+  return config
+})
+
 ReactDOM.createRoot(document.getElementById('root')).render(
   <React.StrictMode>
     {/* Envolvemos la App para activar la navegación */}
@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react'
 import axios from 'axios'
+import { leerPaginas } from '../paginacion'
 import { useNavigate } from 'react-router-dom'
 
 function AdminUsuarios() {
@@ -38,8 +39,7 @@ function AdminUsuarios() {
   const cargarUsuarios = async () => {
     try {
         // CORREGIDO: Usamos localhost
-        const res = await axios.get(`${API_URL}/usuarios/`)
-        setUsuarios(res.data)
+        setUsuarios(await leerPaginas(`${API_URL}/usuarios/`))
     } catch (error) { console.error(error) }
   }
 
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import axios from 'axios'
 import { useNavigate } from 'react-router-dom'
+import { leerPaginas } from '../paginacion'
 
 // Ajuste de IP para Windows
 const API_URL = "https://api-taller-luis.onrender.com"
@@ -23,9 +24,8 @@ function Caja() {
 
   const cargarOrdenes = async () => {
     try {
-      const res = await axios.get(`${API_URL}/ordenes/`)
-      // FILTRO: Solo mostramos las que ya terminaron mecánica pero no han pagado
-      const listas = res.data.filter(o => o.estado === 'terminado')
+      // FILTRO (en el servidor): Solo las que ya terminaron mecánica pero no han pagado
+      const listas = await leerPaginas(`${API_URL}/ordenes/`, { estado: 'terminado' })
       setOrdenes(listas)
     } catch (error) {
       console.error("Error cargando órdenes", error)
@@ -31,24 +31,12 @@ function CajaOrden() {
 
   const cargarDatos = async () => {
     try {
-      // CORREGIDO: URL limpia sin comillas dobles
-      const resOrdenes = await axios.get('https://api-taller-luis.onrender.com/ordenes/')
-      const miOrden = resOrdenes.data.find(o => o.id == id)
-      setOrden(miOrden)
-
-      // CORREGIDO: Template string con backticks (`) correcto
-      const resDetalles = await axios.get(`https://api-taller-luis.onrender.com/ordenes/${id}/detalles`)
-      setDetalles(resDetalles.data)
-
-      if (miOrden) {
-        const resClientes = await axios.get('https://api-taller-luis.onrender.com/clientes/')
-        const miCliente = resClientes.data.find(c => c.id == miOrden.cliente_id)
-        setCliente(miCliente)
-
-        const resVehiculos = await axios.get('https://api-taller-luis.onrender.com/vehiculos/')
-        const miVehiculo = resVehiculos.data.find(v => v.id == miOrden.vehiculo_id)
-        setVehiculo(miVehiculo)
-      }
+      // Orden, detalles, cliente y vehículo en una sola llamada (sin bajar las listas completas)
+      const res = await axios.get(`https://api-taller-luis.onrender.com/ordenes/${id}/expediente`)
+      setOrden(res.data.orden)
+      setDetalles(res.data.detalles)
+      setCliente(res.data.cliente)
+      setVehiculo(res.data.vehiculo)
     } catch (error) {
       console.error(error)
     } finally {
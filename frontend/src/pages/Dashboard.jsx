@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from 'react'
-import axios from 'axios'
+import { leerPaginas } from '../paginacion'
 import { useNavigate } from 'react-router-dom'
 import OrdenCard from '../components/OrdenCard'
 
@@ -7,9 +7,7 @@ import OrdenCard from '../components/OrdenCard'
 function Dashboard({ abrirInspeccion }) {
   const [ordenes, setOrdenes] = useState([])
   
-  // Bases de datos auxiliares (Catalogos)
-  const [vehiculos, setVehiculos] = useState([])
-  const [clientes, setClientes] = useState([])
+  // Catálogo auxiliar (cliente y vehículo ya vienen dentro de cada orden)
   const [usuarios, setUsuarios] = useState([])
 
   const [cargando, setCargando] = useState(true)
@@ -45,18 +43,11 @@ function Dashboard({ abrirInspeccion }) {
     try {
       if(mostrarSpinner) setCargando(true)
       
-      // Hacemos 4 peticiones a LOCALHOST
-      const peticiones = [
-          axios.get(`${API_URL}/ordenes/`),
-          axios.get(`${API_URL}/vehiculos/`),
-          axios.get(`${API_URL}/clientes/`),
-          axios.get(`${API_URL}/usuarios/`)
-      ]
-
-      const [resOrdenes, resVehiculos, resClientes, resUsuarios] = await Promise.all(peticiones)
-
-      // FILTRO: Solo órdenes activas
-      const activas = resOrdenes.data.filter(o => o.estado !== 'terminado' && o.estado !== 'entregado')
+      // FILTRO (en el servidor): Solo órdenes activas
+      const [activas, listaUsuarios] = await Promise.all([
+          leerPaginas(`${API_URL}/ordenes/`, { estado: 'recibido,diagnostico,reparacion' }),
+          leerPaginas(`${API_URL}/usuarios/`)
+      ])
 
       // --- 🔔 LÓGICA DE NOTIFICACIÓN ---
       // Si hay MÁS órdenes activas que la última vez, suena la alarma
@@ -69,13 +60,11 @@ function Dashboard({ abrirInspeccion }) {
 
       // --- AQUÍ ESTÁ EL CAMBIO DE ORDEN (NUEVO ARRIBA) ---
       // Ordenamos por ID descendente (Mayor a menor)
-      const ordenadas = resOrdenes.data.sort((a, b) => b.id - a.id)
+      const ordenadas = activas.sort((a, b) => b.id - a.id)
       setOrdenes(ordenadas)
       // ----------------------------------------------------
 
-      setVehiculos(resVehiculos.data)
-      setClientes(resClientes.data)
-      setUsuarios(resUsuarios.data)
+      setUsuarios(listaUsuarios)
 
     } catch (error) {
       console.error("Error cargando el tablero", error)
@@ -105,8 +94,6 @@ function Dashboard({ abrirInspeccion }) {
   const ordenesActivas = ordenes.filter(o => o.estado !== 'terminado' && o.estado !== 'entregado')
 
   // --- FUNCIONES DE BÚSQUEDA ---
-  const encontrarVehiculo = (id) => vehiculos.find(v => v.id === id)
-  const encontrarCliente = (id) => clientes.find(c => c.id === id)
   const encontrarMecanico = (id) => {
       if (!id) return null
       // Buscamos por username (ej: juan_mecanico)
@@ -144,8 +131,8 @@ function Dashboard({ abrirInspeccion }) {
         <div style={{ display: 'grid', gap: '20px' }}>
           {ordenesActivas.map(orden => {
             
-            const vehiculo = encontrarVehiculo(orden.vehiculo_id)
-            const cliente = encontrarCliente(orden.cliente_id)
+            const vehiculo = orden.vehiculo
+            const cliente = orden.cliente
             const nombreMecanico = encontrarMecanico(orden.mecanico_asignado)
 
             return (
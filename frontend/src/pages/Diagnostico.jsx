@@ -27,9 +27,8 @@ function Diagnostico() {
   const cargarDatos = async () => {
     try {
       // 1. Cargar Orden
-      const resOrden = await axios.get(`${API_URL}/ordenes/`)
-      const encontrada = resOrden.data.find(o => o.id == id)
-      setOrden(encontrada)
+      const resOrden = await axios.get(`${API_URL}/ordenes/${id}/expediente`)
+      setOrden(resOrden.data.orden)
 
       // 2. Cargar Catálogo de Servicios (Para los botones)
       const resServicios = await axios.get(`${API_URL}/servicios/`)
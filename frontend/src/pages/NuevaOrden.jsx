@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
 import axios from 'axios'
+import { leerPaginas } from '../paginacion'
 import FormularioInspeccion from '../components/FormularioInspeccion' 
 import MapaCoche from '../components/MapaCoche'
 
@@ -18,8 +19,6 @@ function NuevaOrden() {
   const [notasGolpes, setNotasGolpes] = useState("")
 
   // --- CATALOGOS ---
-  const [listaClientes, setListaClientes] = useState([])
-  const [listaVehiculos, setListaVehiculos] = useState([])
   const [listaUsuarios, setListaUsuarios] = useState([]) 
 
   // --- ESTADOS DE CONTROL ---
@@ -34,22 +33,17 @@ function NuevaOrden() {
   useEffect(() => {
     async function cargarCatalogos() {
       try {
-        const resVehiculos = await axios.get(`${API_URL}/vehiculos/`)
-        const resClientes = await axios.get(`${API_URL}/clientes/`)
-        const resUsuarios = await axios.get(`${API_URL}/usuarios/`)
-        
-        setListaVehiculos(resVehiculos.data)
-        setListaClientes(resClientes.data)
+        const usuarios = await leerPaginas(`${API_URL}/usuarios/`)
         
         // FILTRO DE MECÁNICOS
-        const soloMecanicos = resUsuarios.data.filter(u => {
+        const soloMecanicos = usuarios.filter(u => {
             if (!u.rol) return false;
             const rolLimpio = u.rol.toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, "");
             return rolLimpio.includes('mecanic');
         });
 
         if (soloMecanicos.length === 0) {
-            setListaUsuarios(resUsuarios.data); 
+            setListaUsuarios(usuarios); 
         } else {
             setListaUsuarios(soloMecanicos);
         }
@@ -62,13 +56,26 @@ function NuevaOrden() {
   }, [])
 
   // 2. BUSCAR POR PLACA
-  const buscarPlaca = () => {
+  const buscarPlaca = async () => {
     const placaLimpia = placaBusqueda.trim().toUpperCase()
-    const vehiculoEncontrado = listaVehiculos.find(v => v.placas.toUpperCase() === placaLimpia)
+    // El servidor busca la placa (ya no bajamos todos los vehículos y clientes)
+    let vehiculoEncontrado = null
+    let clienteEncontrado = null
+    if (placaLimpia.length >= 2) {
+      try {
+        const res = await axios.get(`${API_URL}/buscar`, { params: { q: placaLimpia } })
+        vehiculoEncontrado = res.data.vehiculos.find(v => v.placas.toUpperCase() === placaLimpia)
+        if (vehiculoEncontrado) {
+          const resCliente = await axios.get(`${API_URL}/clientes/${vehiculoEncontrado.cliente_id}`)
+          clienteEncontrado = resCliente.data
+        }
+      } catch (error) {
+        console.error("Error buscando la placa", error)
+      }
+    }
 
     if (vehiculoEncontrado) {
       setVehiculo(vehiculoEncontrado)
-      const clienteEncontrado = listaClientes.find(c => c.id === vehiculoEncontrado.cliente_id)
       if (clienteEncontrado) {
         setCliente(clienteEncontrado)
         setCliente({
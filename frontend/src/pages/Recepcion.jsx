@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import axios from 'axios'
+import { leerPaginas } from '../paginacion'
 import ModalCobro from '../components/ModalCobro' 
 
 function Recepcion() {
@@ -22,11 +23,12 @@ function Recepcion() {
 
   const cargarOrdenes = async () => {
     try {
-        const res = await axios.get(`${API_URL}/ordenes/`)
-        setOrdenes(res.data)
+        // Las entregadas no salen en ninguna pestaña: ni se piden
+        const data = await leerPaginas(`${API_URL}/ordenes/`, { estado: 'recibido,diagnostico,reparacion,terminado' })
+        setOrdenes(data)
         // Dejamos el chivato para debuggear el Backend después
-        if(res.data.length > 0) {
-            console.log("🔍 DATOS:", res.data[0]);
+        if(data.length > 0) {
+            console.log("🔍 DATOS:", data[0]);
         }
     } catch (error) {
         console.error("Error al cargar ordenes", error)
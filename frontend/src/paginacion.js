@@ -0,0 +1,17 @@
+import axios from 'axios'
+
+// 📄 Las listas del backend vienen por páginas: si hay más, la respuesta trae
+// el cursor de la siguiente en el encabezado X-Siguiente-Cursor.
+export const LIMITE_PAGINA = 500
+
+// Junta todas las páginas de una lista (ya filtrada con `params` en el servidor)
+export async function leerPaginas(url, params = {}) {
+  const filas = []
+  let after = undefined
+  do {
+    const res = await axios.get(url, { params: { ...params, limit: LIMITE_PAGINA, after } })
+    filas.push(...res.data)
+    after = res.headers['x-siguiente-cursor']
+  } while (after)
+  return filas
+}